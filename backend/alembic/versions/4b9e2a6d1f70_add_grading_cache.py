@@ -0,0 +1,49 @@
+"""add_grading_cache
+
+Revision ID: 4b9e2a6d1f70
+Revises: 7c4e19b3d8a2
+Create Date: 2026-10-18 17:48:23.861402
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4b9e2a6d1f70'
+down_revision: Union[str, None] = '7c4e19b3d8a2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'grading_cache',
+        sa.Column('cache_key', sa.String(length=64), nullable=False),
+        sa.Column('assignment_id', sa.Integer(), nullable=False),
+        sa.Column('model', sa.String(length=100), nullable=False),
+        sa.Column('score', sa.Integer(), nullable=False),
+        sa.Column('feedback', sa.Text(), nullable=True),
+        sa.Column('status_verdict', sa.String(length=50), nullable=False),
+        sa.Column('hits', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+        sa.Column('last_hit_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['assignment_id'], ['assignments.assignment_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('cache_key')
+    )
+    op.create_index(op.f('ix_grading_cache_assignment_id'), 'grading_cache', ['assignment_id'], unique=False)
+    op.create_index(op.f('ix_grading_cache_expires_at'), 'grading_cache', ['expires_at'], unique=False)
+    op.add_column(
+        'ai_grading_logs',
+        sa.Column('cache_hit', sa.Boolean(), nullable=False, server_default=sa.false())
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('ai_grading_logs', 'cache_hit')
+    op.drop_index(op.f('ix_grading_cache_expires_at'), table_name='grading_cache')
+    op.drop_index(op.f('ix_grading_cache_assignment_id'), table_name='grading_cache')
+    op.drop_table('grading_cache')
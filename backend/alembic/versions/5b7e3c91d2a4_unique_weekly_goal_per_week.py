@@ -0,0 +1,50 @@
+"""unique_weekly_goal_per_week
+
+Revision ID: 5b7e3c91d2a4
+Revises: 8a672244c58e
+Create Date: 2026-10-17 09:12:40.118203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b7e3c91d2a4'
+down_revision: Union[str, None] = '8a672244c58e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Merge duplicate goals created by the old get-or-create race into the oldest row
+    op.execute("""
+        UPDATE weekly_goals AS keep
+        SET xp_earned = agg.xp_earned,
+            quests_completed = agg.quests_completed,
+            battles_won = agg.battles_won
+        FROM (
+            SELECT MIN(id) AS id,
+                   SUM(COALESCE(xp_earned, 0)) AS xp_earned,
+                   SUM(COALESCE(quests_completed, 0)) AS quests_completed,
+                   SUM(COALESCE(battles_won, 0)) AS battles_won
+            FROM weekly_goals
+            GROUP BY user_id, week_start
+            HAVING COUNT(*) > 1
+        ) AS agg
+        WHERE keep.id = agg.id
+    """)
+    op.execute("""
+        DELETE FROM weekly_goals AS dup
+        USING weekly_goals AS keep
+        WHERE dup.user_id = keep.user_id
+          AND dup.week_start = keep.week_start
+          AND dup.id > keep.id
+    """)
+    op.create_unique_constraint('uq_weekly_goal_user_week', 'weekly_goals', ['user_id', 'week_start'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_weekly_goal_user_week', 'weekly_goals', type_='unique')
@@ -0,0 +1,54 @@
+"""add_grading_jobs
+
+Revision ID: 7c4e19b3d8a2
+Revises: f58c2d7e0b46
+Create Date: 2026-10-18 17:05:52.108347
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c4e19b3d8a2'
+down_revision: Union[str, None] = 'f58c2d7e0b46'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'grading_jobs',
+        sa.Column('job_id', sa.Integer(), nullable=False),
+        sa.Column('submission_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False, server_default='queued'),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('run_after', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.Column('verdict', sa.String(length=50), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['submission_id'], ['submissions.submission_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('job_id')
+    )
+    op.create_index(op.f('ix_grading_jobs_job_id'), 'grading_jobs', ['job_id'], unique=False)
+    op.create_index(op.f('ix_grading_jobs_submission_id'), 'grading_jobs', ['submission_id'], unique=False)
+    op.create_index(
+        'ix_grading_jobs_queued', 'grading_jobs', ['run_after', 'job_id'], unique=False,
+        postgresql_where=sa.text("status = 'queued'")
+    )
+    op.create_index(
+        'uq_grading_jobs_active_submission', 'grading_jobs', ['submission_id'], unique=True,
+        postgresql_where=sa.text("status IN ('queued', 'running')")
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('uq_grading_jobs_active_submission', table_name='grading_jobs')
+    op.drop_index('ix_grading_jobs_queued', table_name='grading_jobs')
+    op.drop_index(op.f('ix_grading_jobs_submission_id'), table_name='grading_jobs')
+    op.drop_index(op.f('ix_grading_jobs_job_id'), table_name='grading_jobs')
+    op.drop_table('grading_jobs')
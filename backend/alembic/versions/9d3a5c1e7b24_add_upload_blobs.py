@@ -0,0 +1,42 @@
+"""add_upload_blobs
+
+Revision ID: 9d3a5c1e7b24
+Revises: 4b9e2a6d1f70
+Create Date: 2026-10-18 19:05:41.217630
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d3a5c1e7b24'
+down_revision: Union[str, None] = '4b9e2a6d1f70'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'upload_blobs',
+        sa.Column('sha256', sa.String(length=64), nullable=False),
+        sa.Column('path', sa.Text(), nullable=False),
+        sa.Column('size', sa.BigInteger(), nullable=False),
+        sa.Column('content_type', sa.String(length=255), nullable=True),
+        sa.Column('ref_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('unreferenced_since', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('sha256'),
+        sa.UniqueConstraint('path')
+    )
+    op.create_index(
+        'ix_upload_blobs_unreferenced', 'upload_blobs', ['unreferenced_since'], unique=False,
+        postgresql_where=sa.text('ref_count = 0')
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_upload_blobs_unreferenced', table_name='upload_blobs')
+    op.drop_table('upload_blobs')
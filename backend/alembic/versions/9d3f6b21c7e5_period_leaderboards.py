@@ -0,0 +1,97 @@
+"""period_leaderboards
+
+Revision ID: 9d3f6b21c7e5
+Revises: e27b5a0c8d14
+Create Date: 2026-10-18 13:02:37.518224
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d3f6b21c7e5'
+down_revision: Union[str, None] = 'e27b5a0c8d14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'xp_events',
+        sa.Column('event_id', sa.BigInteger(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('xp_amount', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('gold_amount', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('rolled_up', sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('event_id')
+    )
+    op.create_index(op.f('ix_xp_events_user_id'), 'xp_events', ['user_id'], unique=False)
+    op.create_index('ix_xp_events_created_at', 'xp_events', ['created_at'], unique=False)
+    op.create_index(
+        'ix_xp_events_pending', 'xp_events', ['event_id'], unique=False,
+        postgresql_where=sa.text('NOT rolled_up')
+    )
+
+    op.create_table(
+        'leaderboard_archive',
+        sa.Column('archive_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('period_type', sa.String(length=20), nullable=False),
+        sa.Column('period_start', sa.Date(), nullable=False),
+        sa.Column('period_end', sa.Date(), nullable=False),
+        sa.Column('total_xp', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('total_gold', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('rank_position', sa.Integer(), nullable=True),
+        sa.Column('archived_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('archive_id')
+    )
+    op.create_index(op.f('ix_leaderboard_archive_archive_id'), 'leaderboard_archive', ['archive_id'], unique=False)
+    op.create_index(op.f('ix_leaderboard_archive_user_id'), 'leaderboard_archive', ['user_id'], unique=False)
+    op.create_index(
+        'uq_leaderboard_archive_user_period', 'leaderboard_archive',
+        ['user_id', 'period_start', 'period_end'], unique=True
+    )
+    op.create_index(
+        'ix_leaderboard_archive_period_rank', 'leaderboard_archive',
+        ['period_start', 'period_end', 'rank_position'], unique=False
+    )
+
+    # Keep one global entry per user per period before adding the upsert target
+    op.execute("""
+        DELETE FROM leaderboard_entries AS dup
+        USING leaderboard_entries AS keep
+        WHERE dup.user_id = keep.user_id
+          AND dup.world_id IS NULL
+          AND keep.world_id IS NULL
+          AND dup.period_start = keep.period_start
+          AND dup.period_end IS NOT DISTINCT FROM keep.period_end
+          AND (COALESCE(dup.last_updated, 'epoch'), dup.entry_id) < (COALESCE(keep.last_updated, 'epoch'), keep.entry_id)
+    """)
+    op.create_index(
+        'uq_leaderboard_period_user', 'leaderboard_entries', ['user_id', 'period_start', 'period_end'], unique=True,
+        postgresql_where=sa.text('world_id IS NULL AND period_start IS NOT NULL')
+    )
+    op.create_index(
+        'ix_leaderboard_period_xp', 'leaderboard_entries', ['period_start', 'period_end', sa.text('total_xp DESC')],
+        unique=False, postgresql_where=sa.text('world_id IS NULL AND period_start IS NOT NULL')
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_leaderboard_period_xp', table_name='leaderboard_entries')
+    op.drop_index('uq_leaderboard_period_user', table_name='leaderboard_entries')
+    op.drop_index('ix_leaderboard_archive_period_rank', table_name='leaderboard_archive')
+    op.drop_index('uq_leaderboard_archive_user_period', table_name='leaderboard_archive')
+    op.drop_index(op.f('ix_leaderboard_archive_user_id'), table_name='leaderboard_archive')
+    op.drop_index(op.f('ix_leaderboard_archive_archive_id'), table_name='leaderboard_archive')
+    op.drop_table('leaderboard_archive')
+    op.drop_index('ix_xp_events_pending', table_name='xp_events')
+    op.drop_index('ix_xp_events_created_at', table_name='xp_events')
+    op.drop_index(op.f('ix_xp_events_user_id'), table_name='xp_events')
+    op.drop_table('xp_events')
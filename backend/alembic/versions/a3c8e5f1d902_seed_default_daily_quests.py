@@ -0,0 +1,49 @@
+"""seed_default_daily_quests
+
+Revision ID: a3c8e5f1d902
+Revises: 9d3a5c1e7b24
+Create Date: 2026-10-18 21:04:12.318640
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3c8e5f1d902'
+down_revision: Union[str, None] = '9d3a5c1e7b24'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+DEFAULT_DAILY_QUESTS = [
+    dict(title="Scholar's Path", description="Complete 1 Lesson", quest_type="complete_lesson", target_value=1, xp_reward=50, gold_reward=20, icon="📚"),
+    dict(title="Gladiator", description="Win 1 Battle", quest_type="win_battle", target_value=1, xp_reward=75, gold_reward=30, icon="⚔️"),
+    dict(title="Treasure Hunter", description="Earn 100 XP", quest_type="earn_xp", target_value=100, xp_reward=50, gold_reward=20, icon="⭐"),
+]
+
+
+def upgrade() -> None:
+    # The dashboard used to seed these on its first read; only seed a database that has no daily quests
+    bind = op.get_bind()
+    if bind.execute(sa.text("SELECT EXISTS (SELECT 1 FROM daily_quests)")).scalar():
+        return
+    daily_quests = sa.table(
+        'daily_quests',
+        sa.column('title', sa.String),
+        sa.column('description', sa.Text),
+        sa.column('quest_type', sa.String),
+        sa.column('target_value', sa.Integer),
+        sa.column('xp_reward', sa.Integer),
+        sa.column('gold_reward', sa.Integer),
+        sa.column('icon', sa.String),
+        sa.column('is_active', sa.Boolean),
+    )
+    op.bulk_insert(daily_quests, [dict(q, is_active=True) for q in DEFAULT_DAILY_QUESTS])
+
+
+def downgrade() -> None:
+    # Seed data is left in place: players may already have progress on these quests
+    pass
@@ -0,0 +1,113 @@
+"""broadcast_notifications
+
+Revision ID: b61c0e4f9a27
+Revises: 9d3f6b21c7e5
+Create Date: 2026-10-18 15:24:49.102856
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b61c0e4f9a27'
+down_revision: Union[str, None] = '9d3f6b21c7e5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.alter_column('notifications', 'user_id', existing_type=sa.Integer(), nullable=True)
+    op.add_column('notifications', sa.Column('audience_class', sa.String(length=50), nullable=True))
+    op.add_column('notifications', sa.Column('world_id', sa.Integer(), nullable=True))
+    op.create_foreign_key(
+        'notifications_world_id_fkey', 'notifications', 'worlds', ['world_id'], ['world_id'], ondelete='CASCADE'
+    )
+    op.create_index(
+        'ix_notifications_broadcast', 'notifications', ['created_at'], unique=False,
+        postgresql_where=sa.text('user_id IS NULL')
+    )
+
+    op.create_table(
+        'notification_receipts',
+        sa.Column('notification_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('is_read', sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column('is_dismissed', sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['notification_id'], ['notifications.notification_id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('notification_id', 'user_id')
+    )
+    op.create_index(op.f('ix_notification_receipts_user_id'), 'notification_receipts', ['user_id'], unique=False)
+
+    op.create_table(
+        'notification_markers',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('broadcasts_read_through', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('broadcasts_cleared_through', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id')
+    )
+
+    # Collapse per-user assignment announcements into one broadcast per assignment
+    op.execute("""
+        INSERT INTO notifications (user_id, title, message, icon, notification_type, related_id, related_type,
+                                   audience_class, world_id, is_read, created_at)
+        SELECT DISTINCT ON (n.related_id)
+               NULL, n.title, n.message, n.icon, n.notification_type, n.related_id, n.related_type,
+               CASE
+                   WHEN a.required_class IS NOT NULL AND a.required_class <> 'All' THEN a.required_class
+                   WHEN w.required_class IS NOT NULL AND w.required_class <> 'All' THEN w.required_class
+               END,
+               w.world_id, false, n.created_at
+        FROM notifications n
+        JOIN assignments a ON a.assignment_id = n.related_id
+        JOIN quests q ON q.quest_id = a.quest_id
+        JOIN zones z ON z.zone_id = q.zone_id
+        JOIN worlds w ON w.world_id = z.world_id
+        WHERE n.user_id IS NOT NULL
+          AND n.notification_type = 'assignment'
+          AND n.related_type = 'assignment'
+        ORDER BY n.related_id, n.created_at
+    """)
+    op.execute("""
+        INSERT INTO notification_receipts (notification_id, user_id, is_read, is_dismissed)
+        SELECT b.notification_id, n.user_id, true, false
+        FROM notifications n
+        JOIN notifications b
+          ON b.user_id IS NULL
+         AND b.related_type = 'assignment'
+         AND b.related_id = n.related_id
+        WHERE n.user_id IS NOT NULL
+          AND n.notification_type = 'assignment'
+          AND n.related_type = 'assignment'
+          AND n.is_read
+        ON CONFLICT DO NOTHING
+    """)
+    op.execute("""
+        DELETE FROM notifications n
+        USING notifications b
+        WHERE b.user_id IS NULL
+          AND b.related_type = 'assignment'
+          AND b.related_id = n.related_id
+          AND n.user_id IS NOT NULL
+          AND n.notification_type = 'assignment'
+          AND n.related_type = 'assignment'
+    """)
+
+
+def downgrade() -> None:
+    # Broadcasts have no owner to fall back to
+    op.execute("DELETE FROM notifications WHERE user_id IS NULL")
+    op.drop_table('notification_markers')
+    op.drop_index(op.f('ix_notification_receipts_user_id'), table_name='notification_receipts')
+    op.drop_table('notification_receipts')
+    op.drop_index('ix_notifications_broadcast', table_name='notifications')
+    op.drop_constraint('notifications_world_id_fkey', 'notifications', type_='foreignkey')
+    op.drop_column('notifications', 'world_id')
+    op.drop_column('notifications', 'audience_class')
+    op.alter_column('notifications', 'user_id', existing_type=sa.Integer(), nullable=False)
@@ -0,0 +1,70 @@
+"""add_user_stats_for_achievements
+
+Revision ID: c4d19e7a3b60
+Revises: 5b7e3c91d2a4
+Create Date: 2026-10-18 10:05:12.447310
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4d19e7a3b60'
+down_revision: Union[str, None] = '5b7e3c91d2a4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('achievements', sa.Column('requirement_metric', sa.String(length=50), nullable=True))
+
+    # Replace the old name matching ("perfect" / "gold" in the name) with an explicit counter
+    op.execute("""
+        UPDATE achievements SET requirement_metric = 'perfect_scores'
+        WHERE achievement_type = 'combat' AND LOWER(name) LIKE '%perfect%'
+    """)
+    op.execute("""
+        UPDATE achievements SET requirement_metric = 'gold'
+        WHERE achievement_type = 'collection' AND LOWER(name) LIKE '%gold%'
+    """)
+
+    op.create_table(
+        'user_stats',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('quests_completed', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('perfect_scores', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('items_owned', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id')
+    )
+
+    # Backfill counters from existing progress and inventory
+    op.execute("""
+        INSERT INTO user_stats (user_id, quests_completed, perfect_scores, items_owned)
+        SELECT u.user_id,
+               COALESCE(p.quests_completed, 0),
+               COALESCE(p.perfect_scores, 0),
+               COALESCE(i.items_owned, 0)
+        FROM users u
+        LEFT JOIN (
+            SELECT user_id,
+                   COUNT(*) FILTER (WHERE is_completed) AS quests_completed,
+                   COUNT(*) FILTER (WHERE score = 100) AS perfect_scores
+            FROM user_progress
+            GROUP BY user_id
+        ) p ON p.user_id = u.user_id
+        LEFT JOIN (
+            SELECT user_id, COUNT(*) AS items_owned
+            FROM user_inventory
+            GROUP BY user_id
+        ) i ON i.user_id = u.user_id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('user_stats')
+    op.drop_column('achievements', 'requirement_metric')
@@ -0,0 +1,39 @@
+"""notification_unread_counters
+
+Revision ID: d2f47a9c1e83
+Revises: b61c0e4f9a27
+Create Date: 2026-10-18 16:40:13.287154
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2f47a9c1e83'
+down_revision: Union[str, None] = 'b61c0e4f9a27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'notification_markers',
+        sa.Column('unread_count', sa.Integer(), nullable=False, server_default='0')
+    )
+
+    # Backfill from existing personal notifications
+    op.execute("""
+        INSERT INTO notification_markers (user_id, unread_count)
+        SELECT user_id, COUNT(*)
+        FROM notifications
+        WHERE user_id IS NOT NULL AND is_read = false
+        GROUP BY user_id
+        ON CONFLICT (user_id) DO UPDATE SET unread_count = EXCLUDED.unread_count
+    """)
+
+
+def downgrade() -> None:
+    op.drop_column('notification_markers', 'unread_count')
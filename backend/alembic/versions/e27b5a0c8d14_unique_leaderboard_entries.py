@@ -0,0 +1,44 @@
+"""unique_leaderboard_entries
+
+Revision ID: e27b5a0c8d14
+Revises: c4d19e7a3b60
+Create Date: 2026-10-18 11:20:41.903117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e27b5a0c8d14'
+down_revision: Union[str, None] = 'c4d19e7a3b60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Keep the most recently updated all-time entry per user (and per user/world)
+    op.execute("""
+        DELETE FROM leaderboard_entries AS dup
+        USING leaderboard_entries AS keep
+        WHERE dup.user_id = keep.user_id
+          AND dup.world_id IS NOT DISTINCT FROM keep.world_id
+          AND dup.period_start IS NULL
+          AND keep.period_start IS NULL
+          AND (COALESCE(dup.last_updated, 'epoch'), dup.entry_id) < (COALESCE(keep.last_updated, 'epoch'), keep.entry_id)
+    """)
+    op.create_index(
+        'uq_leaderboard_global_user', 'leaderboard_entries', ['user_id'], unique=True,
+        postgresql_where=sa.text('world_id IS NULL AND period_start IS NULL')
+    )
+    op.create_index(
+        'uq_leaderboard_world_user', 'leaderboard_entries', ['user_id', 'world_id'], unique=True,
+        postgresql_where=sa.text('world_id IS NOT NULL AND period_start IS NULL')
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('uq_leaderboard_world_user', table_name='leaderboard_entries')
+    op.drop_index('uq_leaderboard_global_user', table_name='leaderboard_entries')
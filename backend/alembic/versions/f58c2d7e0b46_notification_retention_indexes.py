@@ -0,0 +1,34 @@
+"""notification_retention_indexes
+
+Revision ID: f58c2d7e0b46
+Revises: d2f47a9c1e83
+Create Date: 2026-10-18 16:41:09.274531
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f58c2d7e0b46'
+down_revision: Union[str, None] = 'd2f47a9c1e83'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_notifications_read_created', 'notifications', ['created_at'], unique=False,
+        postgresql_where=sa.text('is_read AND user_id IS NOT NULL')
+    )
+    op.create_index(
+        'ix_notifications_unread_user_type', 'notifications', ['user_id', 'notification_type'], unique=False,
+        postgresql_where=sa.text('NOT is_read AND user_id IS NOT NULL')
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_notifications_unread_user_type', table_name='notifications')
+    op.drop_index('ix_notifications_read_created', table_name='notifications')
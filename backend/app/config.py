@@ -25,6 +25,50 @@ class Settings(BaseSettings):
     # AI Config
     openrouter_api_key: str = "sk-or-v1-..."
     ai_model: str = "google/gemini-pro"
+    ai_api_url: str = "https://openrouter.ai/api/v1/chat/completions"
+    ai_http_max_connections: int = 20
+    ai_http_max_keepalive: int = 10
+    ai_http_per_host_limit: int = 8  # Concurrent requests to one provider host
+    ai_http_timeout_seconds: float = 30.0
+    ai_http_max_retries: int = 2  # Retries on 429/5xx and connection errors
+    ai_rate_limit_per_minute: int = 60  # Provider quota
+    ai_rate_limit_burst: int = 10
+    ai_rate_limit_wait_seconds: float = 15.0  # Longest a call waits for quota before going to manual review
+    ai_breaker_window_seconds: int = 60  # Rolling window the breaker judges error rate and latency over
+    ai_breaker_min_calls: int = 10
+    ai_breaker_failure_ratio: float = 0.5
+    ai_breaker_slow_call_seconds: float = 20.0
+    ai_breaker_slow_ratio: float = 0.8
+    ai_breaker_open_seconds: int = 30  # Fast-fail period before trial calls are let through
+    grading_worker_concurrency: int = 4  # AI grading calls in flight per process
+    grading_poll_interval_seconds: float = 2.0
+    grading_max_attempts: int = 3
+    grading_prompt_token_budget: int = 6000  # Submission text plus uploaded file sent to the AI grader
+    upload_max_bytes: int = 25 * 1024 * 1024
+    upload_gc_grace_hours: int = 24  # How long an unreferenced upload is kept before it is deleted
+    grading_cache_ttl_days: int = 30  # Cached verdicts for identical submissions
+    grading_cache_max_rows: int = 100000
+    grading_cache_memory_entries: int = 5000
+    grading_cache_memory_ttl_seconds: int = 3600
+    
+    # Caching
+    dashboard_cache_ttl_seconds: int = 60
+    dashboard_cache_max_entries: int = 10000
+    
+    # Leaderboard
+    leaderboard_flush_interval_ms: int = 500
+    leaderboard_rollup_interval_seconds: int = 60
+    xp_event_retention_days: int = 120  # Longer than a season
+    
+    # Notifications
+    notification_pubsub_backend: str = "local"  # "postgres" bridges streams across workers via LISTEN/NOTIFY
+    notification_stream_heartbeat_seconds: int = 15
+    notification_stream_token_seconds: int = 60  # Lifetime of the token an EventSource carries in its URL
+    notification_read_ttl_days: int = 30  # Read personal notifications older than this are pruned
+    notification_broadcast_ttl_days: int = 90
+    notification_digest_after_minutes: int = 60  # Unread bursts older than this are coalesced
+    notification_digest_min_burst: int = 3
+    notification_retention_interval_seconds: int = 3600
     
     class Config:
         env_file = ".env"
@@ -10,15 +10,16 @@ from app.models.assignment import Assignment
 from app.models.submission import Submission
 from app.models.progress import UserProgress
 from app.models.item import Item, UserInventory
-from app.models.achievement import Achievement, UserAchievement
-from app.models.leaderboard import LeaderboardEntry
+from app.models.achievement import Achievement, UserAchievement, UserStats
+from app.models.leaderboard import LeaderboardEntry, XPEvent, LeaderboardArchive
 from app.models.engagement import (
     DailyQuest, UserDailyQuest, UserStreak, 
     UserActivity, WeeklyGoal, Friendship,
     DailyQuestType, ActivityType
 )
-from app.models.ai_grading import AIGradingLog
-from app.models.notification import Notification
+from app.models.ai_grading import AIGradingLog, GradingJob, GradingCacheEntry
+from app.models.notification import Notification, NotificationReceipt, NotificationMarker
+from app.models.upload import UploadBlob
 
 __all__ = [
     "User",
@@ -34,7 +35,10 @@ __all__ = [
     "UserInventory",
     "Achievement",
     "UserAchievement",
+    "UserStats",
     "LeaderboardEntry",
+    "XPEvent",
+    "LeaderboardArchive",
     "DailyQuest",
     "UserDailyQuest",
     "UserStreak",
@@ -42,6 +46,11 @@ __all__ = [
     "WeeklyGoal",
     "Friendship",
     "AIGradingLog",
+    "GradingJob",
+    "GradingCacheEntry",
     "Notification",
+    "NotificationReceipt",
+    "NotificationMarker",
+    "UploadBlob",
 ]
 
@@ -29,6 +29,9 @@ class Achievement(Base):
     # Requirements
     requirement_value = Column(Integer, default=1)
     requirement_description = Column(Text)
+    # Counter compared against requirement_value (see AchievementService.METRICS);
+    # NULL uses the default counter for the achievement type
+    requirement_metric = Column(String(50))
     
     # Rewards
     xp_reward = Column(Integer, default=0)
@@ -69,3 +72,18 @@ class UserAchievement(Base):
     
     def __repr__(self):
         return f"<UserAchievement User:{self.user_id} Achievement:{self.achievement_id}>"
+
+
+class UserStats(Base):
+    """UserStats model - Running counters that achievements are evaluated against."""
+    
+    __tablename__ = "user_stats"
+    
+    user_id = Column(Integer, ForeignKey("users.user_id", ondelete="CASCADE"), primary_key=True)
+    quests_completed = Column(Integer, default=0, nullable=False)
+    perfect_scores = Column(Integer, default=0, nullable=False)
+    items_owned = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+    
+    def __repr__(self):
+        return f"<UserStats User:{self.user_id}>"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Float
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Float, Boolean, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -22,6 +22,7 @@ class AIGradingLog(Base):
     score_awarded = Column(Integer, nullable=False)
     feedback_text = Column(Text, nullable=True)
     status_verdict = Column(String(50), nullable=False) # approved, rejected
+    cache_hit = Column(Boolean, default=False, nullable=False)  # Verdict reused from GradingCacheEntry
     
     created_at = Column(DateTime, server_default=func.now())
     
@@ -29,3 +30,66 @@ class AIGradingLog(Base):
     submission = relationship("Submission")
     assignment = relationship("Assignment")
     user = relationship("User")
+
+
+class GradingJob(Base):
+    """
+    Queue entry for grading one submission with the AI grader.
+    Workers claim queued jobs with FOR UPDATE SKIP LOCKED, so every API process can share the queue.
+    """
+    __tablename__ = "grading_jobs"
+    
+    job_id = Column(Integer, primary_key=True, index=True)
+    submission_id = Column(Integer, ForeignKey("submissions.submission_id", ondelete="CASCADE"), nullable=False, index=True)
+    
+    # Progress
+    status = Column(String(20), default="queued", nullable=False)  # queued, running, completed, failed
+    attempts = Column(Integer, default=0, nullable=False)
+    run_after = Column(DateTime, server_default=func.now(), nullable=False)  # Retry backoff
+    verdict = Column(String(50), nullable=True)  # approved, rejected, pending, skipped
+    error = Column(Text, nullable=True)
+    
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+    finished_at = Column(DateTime, nullable=True)
+    
+    __table_args__ = (
+        Index("ix_grading_jobs_queued", "run_after", "job_id", postgresql_where=text("status = 'queued'")),
+        # At most one queued or running job per submission
+        Index(
+            "uq_grading_jobs_active_submission", "submission_id", unique=True,
+            postgresql_where=text("status IN ('queued', 'running')")
+        ),
+    )
+    
+    # Relationships
+    submission = relationship("Submission")
+    
+    def __repr__(self):
+        return f"<GradingJob {self.job_id}: submission {self.submission_id} {self.status}>"
+
+
+class GradingCacheEntry(Base):
+    """
+    A cached AI verdict, keyed by a hash of the assignment, normalized submission, URL and model.
+    Identical submissions reuse it instead of calling the grader again.
+    """
+    __tablename__ = "grading_cache"
+    
+    cache_key = Column(String(64), primary_key=True)  # sha256 hex
+    assignment_id = Column(Integer, ForeignKey("assignments.assignment_id", ondelete="CASCADE"), nullable=False, index=True)
+    model = Column(String(100), nullable=False)
+    
+    # Verdict
+    score = Column(Integer, nullable=False)
+    feedback = Column(Text, nullable=True)
+    status_verdict = Column(String(50), nullable=False)  # approved, rejected
+    
+    # Usage and expiry
+    hits = Column(Integer, default=0, nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
+    last_hit_at = Column(DateTime, server_default=func.now())
+    expires_at = Column(DateTime, nullable=False, index=True)
+    
+    def __repr__(self):
+        return f"<GradingCacheEntry {self.cache_key[:12]}: {self.status_verdict} {self.score}>"
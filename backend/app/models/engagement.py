@@ -1,7 +1,7 @@
 """
 Engagement Models - Daily Quests, Streaks, Activity Tracking
 """
-from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, ForeignKey, Date
+from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, ForeignKey, Date, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -118,6 +118,11 @@ class WeeklyGoal(Base):
     battles_target = Column(Integer, default=3)
     battles_won = Column(Integer, default=0)
     
+    # One goal row per user per week (upsert target)
+    __table_args__ = (
+        UniqueConstraint("user_id", "week_start", name="uq_weekly_goal_user_week"),
+    )
+    
     # Relationships
     user = relationship("User", back_populates="weekly_goals")
 
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, DateTime, Date, ForeignKey
+from sqlalchemy import BigInteger, Boolean, Column, Integer, DateTime, Date, ForeignKey, Index, String, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -30,9 +30,76 @@ class LeaderboardEntry(Base):
     # Metadata
     last_updated = Column(DateTime, server_default=func.now(), onupdate=func.now())
     
+    # One all-time entry per user globally and per user per world (upsert targets)
+    __table_args__ = (
+        Index(
+            "uq_leaderboard_global_user", "user_id", unique=True,
+            postgresql_where=text("world_id IS NULL AND period_start IS NULL")
+        ),
+        Index(
+            "uq_leaderboard_world_user", "user_id", "world_id", unique=True,
+            postgresql_where=text("world_id IS NOT NULL AND period_start IS NULL")
+        ),
+        # One entry per user per open period (weekly / monthly / season), read in XP order
+        Index(
+            "uq_leaderboard_period_user", "user_id", "period_start", "period_end", unique=True,
+            postgresql_where=text("world_id IS NULL AND period_start IS NOT NULL")
+        ),
+        Index(
+            "ix_leaderboard_period_xp", "period_start", "period_end", text("total_xp DESC"),
+            postgresql_where=text("world_id IS NULL AND period_start IS NOT NULL")
+        ),
+    )
+    
     # Relationships
     user = relationship("User", back_populates="leaderboard_entries")
     world = relationship("World", back_populates="leaderboard_entries")
     
     def __repr__(self):
         return f"<LeaderboardEntry User:{self.user_id} Rank:{self.rank_position}>"
+
+
+class XPEvent(Base):
+    """XPEvent model - Append-only log of XP/gold earned, rolled up into period leaderboards."""
+    
+    __tablename__ = "xp_events"
+    
+    event_id = Column(BigInteger, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.user_id", ondelete="CASCADE"), nullable=False, index=True)
+    xp_amount = Column(Integer, default=0, nullable=False)
+    gold_amount = Column(Integer, default=0, nullable=False)
+    rolled_up = Column(Boolean, default=False, nullable=False)
+    created_at = Column(DateTime, server_default=func.now(), nullable=False)
+    
+    __table_args__ = (
+        # Only events still waiting for the rollup job are indexed
+        Index("ix_xp_events_pending", "event_id", postgresql_where=text("NOT rolled_up")),
+        Index("ix_xp_events_created_at", "created_at"),
+    )
+    
+    def __repr__(self):
+        return f"<XPEvent User:{self.user_id} XP:{self.xp_amount}>"
+
+
+class LeaderboardArchive(Base):
+    """LeaderboardArchive model - Frozen standings of closed leaderboard periods."""
+    
+    __tablename__ = "leaderboard_archive"
+    
+    archive_id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.user_id", ondelete="CASCADE"), nullable=False, index=True)
+    period_type = Column(String(20), nullable=False)
+    period_start = Column(Date, nullable=False)
+    period_end = Column(Date, nullable=False)
+    total_xp = Column(Integer, default=0, nullable=False)
+    total_gold = Column(Integer, default=0, nullable=False)
+    rank_position = Column(Integer)
+    archived_at = Column(DateTime, server_default=func.now())
+    
+    __table_args__ = (
+        Index("uq_leaderboard_archive_user_period", "user_id", "period_start", "period_end", unique=True),
+        Index("ix_leaderboard_archive_period_rank", "period_start", "period_end", "rank_position"),
+    )
+    
+    def __repr__(self):
+        return f"<LeaderboardArchive User:{self.user_id} {self.period_type} {self.period_start} Rank:{self.rank_position}>"
@@ -1,16 +1,20 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, ForeignKey, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
 
 
 class Notification(Base):
-    """Notification model - Alerts for users."""
+    """
+    Notification model - Alerts for users.
+    A row with user_id NULL is a broadcast: stored once and shown to every user
+    matching its audience, with per-user state in NotificationReceipt / NotificationMarker.
+    """
     
     __tablename__ = "notifications"
     
     notification_id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.user_id", ondelete="CASCADE"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.user_id", ondelete="CASCADE"), nullable=True, index=True)
     
     # Notification content
     title = Column(String(255), nullable=False)
@@ -22,14 +26,67 @@ class Notification(Base):
     related_id = Column(Integer, nullable=True)  # e.g., assignment_id
     related_type = Column(String(50), nullable=True)  # e.g., "assignment"
     
-    # Status
+    # Broadcast audience: users of this avatar class (NULL = every class); world for context
+    audience_class = Column(String(50), nullable=True)
+    world_id = Column(Integer, ForeignKey("worlds.world_id", ondelete="CASCADE"), nullable=True)
+    
+    # Status (personal notifications only)
     is_read = Column(Boolean, default=False)
     
     # Metadata
     created_at = Column(DateTime, server_default=func.now())
     
+    __table_args__ = (
+        Index("ix_notifications_broadcast", "created_at", postgresql_where=text("user_id IS NULL")),
+        # Retention: read rows past their TTL, and unread bursts per user and type
+        Index("ix_notifications_read_created", "created_at", postgresql_where=text("is_read AND user_id IS NOT NULL")),
+        Index(
+            "ix_notifications_unread_user_type", "user_id", "notification_type",
+            postgresql_where=text("NOT is_read AND user_id IS NOT NULL")
+        ),
+    )
+    
     # Relationships
     user = relationship("User", back_populates="notifications")
     
+    @property
+    def is_broadcast(self) -> bool:
+        return self.user_id is None
+    
     def __repr__(self):
         return f"<Notification {self.notification_id}: {self.title}>"
+
+
+class NotificationReceipt(Base):
+    """NotificationReceipt model - A user's read / dismissed state for one broadcast."""
+    
+    __tablename__ = "notification_receipts"
+    
+    notification_id = Column(Integer, ForeignKey("notifications.notification_id", ondelete="CASCADE"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.user_id", ondelete="CASCADE"), primary_key=True, index=True)
+    is_read = Column(Boolean, default=False, nullable=False)
+    is_dismissed = Column(Boolean, default=False, nullable=False)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+    
+    def __repr__(self):
+        return f"<NotificationReceipt {self.notification_id} User:{self.user_id}>"
+
+
+class NotificationMarker(Base):
+    """
+    NotificationMarker model - Per-user notification state.
+    unread_count counts unread personal notifications. Broadcasts with ids at or
+    below read_through count as read, at or below cleared_through as dismissed,
+    so "mark all read" / "clear all" are one row.
+    """
+    
+    __tablename__ = "notification_markers"
+    
+    user_id = Column(Integer, ForeignKey("users.user_id", ondelete="CASCADE"), primary_key=True)
+    unread_count = Column(Integer, default=0, nullable=False)  # Unread personal notifications
+    broadcasts_read_through = Column(Integer, default=0, nullable=False)
+    broadcasts_cleared_through = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+    
+    def __repr__(self):
+        return f"<NotificationMarker User:{self.user_id} read:{self.broadcasts_read_through}>"
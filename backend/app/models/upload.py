@@ -0,0 +1,29 @@
+from sqlalchemy import Column, Integer, BigInteger, String, Text, DateTime, Index, text
+from sqlalchemy.sql import func
+from app.database import Base
+
+class UploadBlob(Base):
+    """
+    One stored upload, keyed by the sha256 of its content, so identical uploads share a file.
+    ref_count counts the submissions, avatars and monster images whose URL points at it;
+    unreferenced blobs are deleted by the upload garbage collector after a grace period.
+    """
+    __tablename__ = "upload_blobs"
+    
+    sha256 = Column(String(64), primary_key=True)
+    path = Column(Text, nullable=False, unique=True)  # Relative to the upload dir: ab/cd/<sha256><ext>
+    size = Column(BigInteger, nullable=False)
+    content_type = Column(String(255), nullable=True)
+    
+    # References
+    ref_count = Column(Integer, default=0, nullable=False)
+    unreferenced_since = Column(DateTime, nullable=True)  # Set while ref_count is 0
+    
+    created_at = Column(DateTime, server_default=func.now())
+    
+    __table_args__ = (
+        Index("ix_upload_blobs_unreferenced", "unreferenced_since", postgresql_where=text("ref_count = 0")),
+    )
+    
+    def __repr__(self):
+        return f"<UploadBlob {self.sha256[:12]}: {self.ref_count} refs>"
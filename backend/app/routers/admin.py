@@ -9,6 +9,15 @@ from app.schemas.admin import AdminDashboardData, SystemStats, AdminUserView, Ad
 from app.schemas.user import UserCreate
 from app.schemas.teacher import TeacherCreate
 from app.services.auth_service import AuthService
+from app.services.achievement_service import AchievementService
+from app.services.ai_grader import ai_breaker, ai_http_client, ai_rate_limiter
+from app.services.grading_cache import GradingCache
+from app.services.grading_queue import GradingQueue, grading_workers
+from app.services.leaderboard_service import LeaderboardService, leaderboard_maintainer
+from app.services.period_leaderboard_service import PeriodLeaderboardService, leaderboard_rollup_job
+from app.services.notification_service import NotificationService, notification_hub
+from app.services.upload_service import UploadService, upload_stats
+from app.utils.cache import get_cache_stats
 
 router = APIRouter(prefix="/api/admin", tags=["admin"])
 
@@ -133,7 +142,10 @@ def update_user(user_id: int, user_data: dict, db: Session = Depends(get_db)):
     if "current_xp" in user_data:
         user.current_xp = user_data["current_xp"]
     if "gold" in user_data:
+        old_gold = user.gold or 0
         user.gold = user_data["gold"]
+        db.flush()
+        AchievementService.evaluate(db, user, {"gold": (old_gold, user.gold)})
     if "avatar_class" in user_data:
         user.avatar_class = user_data["avatar_class"]
     
@@ -327,7 +339,9 @@ def delete_item(item_id: int, db: Session = Depends(get_db)):
 @router.get("/leaderboard")
 def get_leaderboard_admin(db: Session = Depends(get_db)):
     """Get full leaderboard data for admin."""
-    entries = db.query(LeaderboardEntry, User).join(User).order_by(desc(LeaderboardEntry.total_xp)).limit(100).all()
+    entries = db.query(LeaderboardEntry, User).join(User).filter(
+        LeaderboardEntry.period_start == None  # Period boards: /leaderboard/rollup
+    ).order_by(desc(LeaderboardEntry.total_xp)).limit(100).all()
     return [{
         "entry_id": e.entry_id,
         "user_id": e.user_id,
@@ -342,27 +356,111 @@ def get_leaderboard_admin(db: Session = Depends(get_db)):
 
 @router.post("/leaderboard/recalculate")
 def recalculate_leaderboard(db: Session = Depends(get_db)):
-    """Recalculate and update all leaderboard positions."""
-    # Get all users ordered by XP
-    users = db.query(User).order_by(desc(User.current_xp)).all()
-    
-    for rank, user in enumerate(users, 1):
-        # Find or create leaderboard entry
-        entry = db.query(LeaderboardEntry).filter(
-            LeaderboardEntry.user_id == user.user_id,
-            LeaderboardEntry.world_id == None  # Global leaderboard
-        ).first()
-        
-        if not entry:
-            entry = LeaderboardEntry(user_id=user.user_id)
-            db.add(entry)
-        
-        entry.total_xp = user.current_xp
-        entry.total_gold = user.gold
-        entry.rank_position = rank
-    
-    db.commit()
-    return {"message": f"Leaderboard recalculated for {len(users)} users"}
+    """
+    Recalculate all-time global and per-world leaderboard totals and positions.
+    Set-based: a handful of statements regardless of user count (see LeaderboardService.recalculate).
+    """
+    result = LeaderboardService.recalculate(db)
+    rows = result["rows_affected"]
+    return {
+        "message": f"Leaderboard recalculated: {rows['global_entries']} global and "
+                   f"{rows['world_entries']} world entries updated, {rows['ranks']} ranks changed "
+                   f"in {result['total_ms']} ms",
+        **result
+    }
+
+@router.get("/leaderboard/rank-index/check")
+def check_rank_index(db: Session = Depends(get_db)):
+    """Compare the in-memory rank index with leaderboard_entries."""
+    return LeaderboardService.check_rank_index(db)
+
+@router.post("/leaderboard/rank-index/rebuild")
+def rebuild_rank_index(db: Session = Depends(get_db)):
+    """Reload the in-memory rank index from leaderboard_entries."""
+    return LeaderboardService.rebuild_rank_index(db)
+
+@router.get("/leaderboard/maintainer")
+def get_leaderboard_maintainer_stats():
+    """Batching stats for incremental leaderboard updates."""
+    return leaderboard_maintainer.stats()
+
+@router.post("/leaderboard/maintainer/flush")
+def flush_leaderboard_maintainer():
+    """Apply buffered leaderboard deltas now instead of waiting for the next tick."""
+    return leaderboard_maintainer.flush()
+
+@router.post("/leaderboard/rollup")
+def rollup_period_leaderboards(db: Session = Depends(get_db)):
+    """Roll pending XP events into the weekly / monthly / season boards and archive closed periods now."""
+    return PeriodLeaderboardService.rollup(db)
+
+@router.get("/leaderboard/rollup")
+def get_leaderboard_rollup_stats():
+    """Status of the background period-leaderboard rollup job."""
+    return {
+        "running": leaderboard_rollup_job.running,
+        "interval_seconds": leaderboard_rollup_job.interval,
+        "runs": leaderboard_rollup_job.runs,
+        "errors": leaderboard_rollup_job.errors,
+        "last_error": leaderboard_rollup_job.last_error
+    }
+
+# ============ CACHE METRICS ============
+
+@router.get("/cache/stats")
+def get_cache_statistics():
+    """Hit/miss counters for in-process caches (per worker), for tuning TTL and size."""
+    return {"caches": get_cache_stats()}
+
+@router.get("/notifications/pubsub")
+def get_notification_pubsub_stats():
+    """Streaming subscribers and event counters for notification push (per worker)."""
+    return notification_hub.stats()
+
+@router.post("/notifications/repair-counters")
+def repair_notification_counters(db: Session = Depends(get_db)):
+    """Reconcile every user's unread-notification counter with the notifications table."""
+    return NotificationService.repair_unread_counters(db)
+
+@router.post("/notifications/retention")
+def run_notification_retention():
+    """Prune expired notifications and coalesce unread bursts into digests now."""
+    return NotificationService.run_retention()
+
+# ============ AI GRADING ============
+
+@router.get("/grading/queue")
+def get_grading_queue(db: Session = Depends(get_db)):
+    """AI grading worker pool counters and the number of grading jobs in each status."""
+    return {
+        "workers": grading_workers.stats(),
+        "jobs": GradingQueue.queue_counts(db)
+    }
+
+@router.get("/grading/http")
+def get_grading_http_stats():
+    """Connection pool, retry and latency metrics for the AI provider client."""
+    return ai_http_client.stats()
+
+@router.get("/grading/provider")
+def get_grading_provider_stats():
+    """AI provider circuit breaker state and counters, and rate limiter tokens."""
+    return {"breaker": ai_breaker.stats(), "rate_limiter": ai_rate_limiter.stats()}
+
+@router.get("/uploads/stats")
+def get_upload_stats():
+    """Upload counts, rejections and throughput (per worker)."""
+    return upload_stats.stats()
+
+@router.post("/uploads/gc")
+def collect_upload_garbage(db: Session = Depends(get_db)):
+    """Recount upload references and delete uploads no longer referenced after the grace period."""
+    return UploadService.collect_garbage(db)
+
+@router.post("/grading/cache/prune")
+def prune_grading_cache(db: Session = Depends(get_db)):
+    """Delete expired cached AI verdicts and trim the cache to its configured size."""
+    return GradingCache.prune(db)
 
 # ============ INVENTORY MANAGEMENT ============
 
@@ -406,6 +504,8 @@ def grant_item_to_user(data: dict, db: Session = Depends(get_db)):
     else:
         new_inv = UserInventory(user_id=user_id, item_id=item_id, quantity=quantity)
         db.add(new_inv)
+        changes = AchievementService.record(db, user.user_id, items_owned=1)
+        AchievementService.evaluate(db, user, changes)
     
     db.commit()
     return {"message": f"Granted {quantity}x {item.name} to {user.username}"}
@@ -418,6 +518,7 @@ def remove_inventory_item(inventory_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Inventory entry not found")
     
     db.delete(inv)
+    AchievementService.record(db, inv.user_id, items_owned=-1)
     db.commit()
     return {"message": "Inventory item removed"}
 
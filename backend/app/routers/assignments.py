@@ -1,19 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, or_
-from typing import List
+from typing import List, Optional
 from datetime import datetime
 
 from app.database import get_db
 from app.models.assignment import Assignment
 from app.models.quest import Quest
-from app.models.zone import Zone
-from app.models.world import World
 from app.models.teacher import Teacher
 from app.models.user import User
-from app.models.submission import Submission
-from app.models.notification import Notification
-from app.schemas.assignment import AssignmentCreate, AssignmentResponse, AssignmentUpdate
+from app.schemas.assignment import AssignmentCreate, AssignmentCreateResponse, AssignmentResponse, AssignmentUpdate
+from app.services.assignment_service import AssignmentService
+from app.services.notification_service import NotificationService, assignment_audience
 from app.utils.dependencies import get_current_teacher, get_current_user
 
 router = APIRouter(prefix="/api/assignments", tags=["Assignments (Bounties)"])
@@ -21,146 +18,66 @@ router = APIRouter(prefix="/api/assignments", tags=["Assignments (Bounties)"])
 
 @router.get("/teacher/all")
 async def get_teacher_assignments(
+    response: Response,
+    world_id: Optional[int] = None,
+    zone_id: Optional[int] = None,
+    due_from: Optional[datetime] = None,
+    due_to: Optional[datetime] = None,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
     current_teacher: Teacher = Depends(get_current_teacher),
     db: Session = Depends(get_db)
 ):
     """
-    Get all assignments created by the current teacher (across all their worlds).
+    Get the assignments created in the current teacher's worlds, newest first.
+    Each row carries its world/zone/quest path and pending/approved/rejected submission counts.
+    Sets X-Next-Cursor when more remain; pass it back as cursor.
     """
-    # Get all worlds owned by this teacher
-    teacher_worlds = db.query(World).filter(World.teacher_id == current_teacher.teacher_id).all()
-    
-    if not teacher_worlds:
-        return []
-    
-    world_ids = [w.world_id for w in teacher_worlds]
-    
-    # Get all zones in these worlds
-    zones = db.query(Zone).filter(Zone.world_id.in_(world_ids)).all()
-    
-    if not zones:
-        return []
-    
-    zone_ids = [z.zone_id for z in zones]
-    
-    # Get all quests in these zones
-    quests = db.query(Quest).filter(Quest.zone_id.in_(zone_ids)).all()
-    
-    if not quests:
-        return []
-    
-    quest_ids = [q.quest_id for q in quests]
+    try:
+        assignments, next_cursor = AssignmentService.list_for_teacher(
+            db, current_teacher.teacher_id, world_id, zone_id, due_from, due_to, limit, cursor
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     
-    # Get all assignments for these quests
-    assignments = db.query(Assignment).filter(Assignment.quest_id.in_(quest_ids)).order_by(desc(Assignment.created_at)).all()
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     
     # Return as plain dict for frontend
     return [{
-        "assignment_id": a.assignment_id,
-        "quest_id": a.quest_id,
-        "title": a.title,
-        "description": a.description,
-        "max_score": a.max_score,
-        "xp_reward": a.xp_reward,
-        "gold_reward": a.gold_reward,
-        "due_date": a.due_date.isoformat() if a.due_date else None,
-        "created_at": a.created_at.isoformat() if a.created_at else None,
+        **a,
+        "due_date": a["due_date"].isoformat() if a["due_date"] else None,
+        "created_at": a["created_at"].isoformat() if a["created_at"] else None,
     } for a in assignments]
 
 
 @router.get("/user/pending")
 async def get_user_pending_assignments(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=200),
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
     Get all pending (not yet submitted or graded) assignments for the current user.
-    Returns assignments with due dates and submission status.
+    Returns assignments with due dates and submission status, soonest due first.
+    With limit, returns one page and sets X-Next-Cursor when more remain; pass it back as cursor.
     """
-    # Get all published worlds relevant to the user's class (World-Level Permission)
-    published_worlds = db.query(World).filter(
-        World.is_published == True,
-        or_(
-            World.required_class == "All",
-            World.required_class == None,
-            World.required_class == current_user.avatar_class
-        )
-    ).all()
-    
-    if not published_worlds:
-        return []
-    
-    world_ids = [w.world_id for w in published_worlds]
-    
-    # Get all zones
-    zones = db.query(Zone).filter(Zone.world_id.in_(world_ids)).all()
-    
-    if not zones:
-        return []
-    
-    zone_ids = [z.zone_id for z in zones]
-    
-    # Get all quests
-    quests = db.query(Quest).filter(Quest.zone_id.in_(zone_ids)).all()
-    
-    if not quests:
-        return []
-    
-    quest_ids = [q.quest_id for q in quests]
-    
-    # Get all assignments with upcoming or no due date
-    # AND filter by Assignment-Level Class Restriction
-    all_assignments = db.query(Assignment).filter(
-        Assignment.quest_id.in_(quest_ids),
-        or_(
-            Assignment.required_class == "All",
-            Assignment.required_class == None,
-            Assignment.required_class == current_user.avatar_class
+    try:
+        assignments, next_cursor = AssignmentService.pending_for_user(db, current_user, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
         )
-    ).all()
-    
-    # Check submission status for each
-    result = []
-    for assignment in all_assignments:
-        submission = db.query(Submission).filter(
-            Submission.assignment_id == assignment.assignment_id,
-            Submission.user_id == current_user.user_id
-        ).first()
-        
-        # Determine status
-        if submission:
-            if submission.status == 'approved':
-                status = 'completed'
-            elif submission.status == 'rejected':
-                status = 'rejected'
-            else:
-                status = 'pending_review'
-        else:
-            status = 'not_submitted'
-        
-        # Get quest and world info
-        quest = db.query(Quest).filter(Quest.quest_id == assignment.quest_id).first()
-        zone = db.query(Zone).filter(Zone.zone_id == quest.zone_id).first() if quest else None
-        world = db.query(World).filter(World.world_id == zone.world_id).first() if zone else None
-        
-        result.append({
-            "assignment_id": assignment.assignment_id,
-            "title": assignment.title,
-            "description": assignment.description,
-            "max_score": assignment.max_score,
-            "xp_reward": assignment.xp_reward,
-            "gold_reward": assignment.gold_reward,
-            "due_date": assignment.due_date,
-            "status": status,
-            "quest_title": quest.title if quest else None,
-            "world_title": world.title if world else None,
-            "is_overdue": assignment.due_date and assignment.due_date < datetime.now() and status == 'not_submitted'
-        })
-    
-    # Sort by due date (upcoming first, then no due date)
-    result.sort(key=lambda x: (x['due_date'] is None, x['due_date'] or datetime.max))
     
-    return result
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return assignments
 
 
 @router.get("/quest/{quest_id}", response_model=List[AssignmentResponse])
@@ -194,7 +111,7 @@ async def get_assignment_by_id(
     return assignment
 
 
-@router.post("/", response_model=AssignmentResponse, status_code=status.HTTP_201_CREATED)
+@router.post("/", response_model=AssignmentCreateResponse, status_code=status.HTTP_201_CREATED)
 async def create_assignment(
     assignment_data: AssignmentCreate,
     current_teacher: Teacher = Depends(get_current_teacher),
@@ -202,6 +119,7 @@ async def create_assignment(
 ):
     """
     Create a new assignment (teacher only).
+    Eligible users are notified by a single broadcast notification.
     """
     quest = db.query(Quest).filter(Quest.quest_id == assignment_data.quest_id).first()
     
@@ -226,46 +144,30 @@ async def create_assignment(
     )
     
     db.add(new_assignment)
-    db.commit()
-    db.refresh(new_assignment)
+    db.flush()
     
-    # Create notifications for eligible users
-    # Get the world info for context
+    # Announce to eligible users, restricted by the assignment's class first, then the world's
     zone = quest.zone
     world = zone.world if zone else None
     world_title = world.title if world else "Unknown World"
-    world_class = world.required_class if world else "All"
-    assignment_class = assignment_data.required_class or "All"
-    
-    # Determine which users should be notified based on class restrictions
-    if assignment_class == "All" and world_class == "All":
-        # Notify all users
-        eligible_users = db.query(User).all()
-    elif assignment_class != "All":
-        # Notify users of the specific assignment class
-        eligible_users = db.query(User).filter(User.avatar_class == assignment_class).all()
-    elif world_class != "All":
-        # Notify users of the world's class
-        eligible_users = db.query(User).filter(User.avatar_class == world_class).all()
-    else:
-        eligible_users = db.query(User).all()
-    
-    # Create notification for each eligible user
-    for user in eligible_users:
-        notification = Notification(
-            user_id=user.user_id,
-            title="📝 New Assignment Available!",
-            message=f"'{new_assignment.title}' has been posted in {world_title}. Complete it to earn {new_assignment.xp_reward} XP!",
-            icon="📝",
-            notification_type="assignment",
-            related_id=new_assignment.assignment_id,
-            related_type="assignment"
-        )
-        db.add(notification)
     
+    notification = NotificationService.create_broadcast(
+        db,
+        title="📝 New Assignment Available!",
+        message=f"'{new_assignment.title}' has been posted in {world_title}. Complete it to earn {new_assignment.xp_reward} XP!",
+        icon="📝",
+        notification_type="assignment",
+        related_id=new_assignment.assignment_id,
+        related_type="assignment",
+        audience_class=assignment_audience(assignment_data.required_class, world.required_class if world else None),
+        world_id=world.world_id if world else None
+    )
     db.commit()
+    db.refresh(new_assignment)
     
-    return new_assignment
+    response = AssignmentCreateResponse.model_validate(new_assignment)
+    response.notification_id = notification.notification_id
+    return response
 
 
 @router.put("/{assignment_id}", response_model=AssignmentResponse)
@@ -10,6 +10,7 @@ from app.schemas.user import UserCreate, UserResponse
 from app.schemas.teacher import TeacherCreate, TeacherResponse
 from app.schemas.auth import Token, LoginRequest
 from app.services.auth_service import AuthService
+from app.services.game_service import GameService
 from app.config import get_settings
 
 router = APIRouter(prefix="/api/auth", tags=["Authentication"])
@@ -70,6 +71,10 @@ async def login_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    # Logging in counts as daily activity for the streak
+    GameService.update_streak(db, user.user_id)
+    db.commit()
+    
     access_token = AuthService.create_access_token(
         data={
             "sub": str(user.user_id),
@@ -8,6 +8,8 @@ from app.models.user import User
 from app.schemas.item import ItemResponse, InventoryResponse, PurchaseRequest, EquipRequest
 from app.utils.dependencies import get_current_user
 from app.services.game_service import GameService
+from app.services.counter_service import CounterService
+from app.services.achievement_service import AchievementService
 
 router = APIRouter(prefix="/api/inventory", tags=["Inventory & Shop"])
 
@@ -143,7 +145,7 @@ async def use_consumable(
     
     if item.hp_bonus > 0:
         old_hp = current_user.hp_current
-        current_user.hp_current = min(current_user.hp_max, current_user.hp_current + item.hp_bonus)
+        CounterService.apply(db, current_user, heal=item.hp_bonus)
         effects.append(f"Healed {current_user.hp_current - old_hp} HP")
     
     # Reduce quantity
@@ -151,6 +153,7 @@ async def use_consumable(
     
     if inventory.quantity <= 0:
         db.delete(inventory)
+        AchievementService.record(db, current_user.user_id, items_owned=-1)
     
     db.commit()
     
@@ -2,16 +2,39 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from sqlalchemy import desc
 from typing import List, Optional
+from datetime import date
 
 from app.database import get_db
 from app.models.leaderboard import LeaderboardEntry
 from app.models.user import User
-from app.schemas.leaderboard import LeaderboardEntryResponse
+from app.schemas.leaderboard import LeaderboardEntryResponse, PeriodLeaderboardResponse
 from app.utils.dependencies import get_current_user
+from app.services.leaderboard_service import LeaderboardService, rank_index, lifetime_xp
+from app.services.period_leaderboard_service import PERIODS, PeriodLeaderboardService
 
 router = APIRouter(prefix="/api/leaderboard", tags=["Leaderboard (Hall of Fame)"])
 
 
+def _to_response(entry: LeaderboardEntry, user: User, rank: Optional[int] = None,
+                 total_xp: Optional[int] = None) -> LeaderboardEntryResponse:
+    """Build a response row; rank/total_xp override the stored values with fresher ones."""
+    return LeaderboardEntryResponse(
+        entry_id=entry.entry_id,
+        user_id=entry.user_id,
+        username=user.username,
+        avatar_class=user.avatar_class,
+        world_id=entry.world_id,
+        total_xp=entry.total_xp if total_xp is None else total_xp,
+        total_gold=entry.total_gold,
+        quests_completed=entry.quests_completed,
+        monsters_defeated=entry.monsters_defeated,
+        achievements_unlocked=entry.achievements_unlocked,
+        rank_position=entry.rank_position if rank is None else rank,
+        period_start=entry.period_start,
+        period_end=entry.period_end
+    )
+
+
 @router.get("/", response_model=List[LeaderboardEntryResponse])
 async def get_global_leaderboard(
     limit: int = 10,
@@ -20,30 +43,22 @@ async def get_global_leaderboard(
 ):
     """
     Get the global leaderboard (all worlds).
+    Pages come from the in-memory rank index when it is loaded.
     """
+    if rank_index.ready:
+        ranked = rank_index.top(limit, offset)
+        rows = LeaderboardService.load_global_entries(db, [user_id for _, user_id, _ in ranked])
+        return [
+            _to_response(*rows[user_id], rank=rank, total_xp=xp)
+            for rank, user_id, xp in ranked if user_id in rows
+        ]
+    
     entries = db.query(LeaderboardEntry, User).join(User).filter(
-        LeaderboardEntry.world_id == None  # Global leaderboard
+        LeaderboardEntry.world_id == None,  # Global leaderboard
+        LeaderboardEntry.period_start == None
     ).order_by(desc(LeaderboardEntry.total_xp)).offset(offset).limit(limit).all()
     
-    result = []
-    for entry, user in entries:
-        result.append(LeaderboardEntryResponse(
-            entry_id=entry.entry_id,
-            user_id=entry.user_id,
-            username=user.username,
-            avatar_class=user.avatar_class,
-            world_id=entry.world_id,
-            total_xp=entry.total_xp,
-            total_gold=entry.total_gold,
-            quests_completed=entry.quests_completed,
-            monsters_defeated=entry.monsters_defeated,
-            achievements_unlocked=entry.achievements_unlocked,
-            rank_position=entry.rank_position,
-            period_start=entry.period_start,
-            period_end=entry.period_end
-        ))
-    
-    return result
+    return [_to_response(entry, user) for entry, user in entries]
 
 
 @router.get("/world/{world_id}", response_model=List[LeaderboardEntryResponse])
@@ -57,28 +72,32 @@ async def get_world_leaderboard(
     Get the leaderboard for a specific world.
     """
     entries = db.query(LeaderboardEntry, User).join(User).filter(
-        LeaderboardEntry.world_id == world_id
+        LeaderboardEntry.world_id == world_id,
+        LeaderboardEntry.period_start == None
     ).order_by(desc(LeaderboardEntry.total_xp)).offset(offset).limit(limit).all()
     
-    result = []
-    for entry, user in entries:
-        result.append(LeaderboardEntryResponse(
-            entry_id=entry.entry_id,
-            user_id=entry.user_id,
-            username=user.username,
-            avatar_class=user.avatar_class,
-            world_id=entry.world_id,
-            total_xp=entry.total_xp,
-            total_gold=entry.total_gold,
-            quests_completed=entry.quests_completed,
-            monsters_defeated=entry.monsters_defeated,
-            achievements_unlocked=entry.achievements_unlocked,
-            rank_position=entry.rank_position,
-            period_start=entry.period_start,
-            period_end=entry.period_end
-        ))
+    return [_to_response(entry, user) for entry, user in entries]
+
+
+@router.get("/period/{period_type}", response_model=PeriodLeaderboardResponse)
+async def get_period_leaderboard(
+    period_type: str,
+    day: Optional[date] = None,
+    limit: int = 10,
+    offset: int = 0,
+    db: Session = Depends(get_db)
+):
+    """
+    Get the weekly, monthly or season leaderboard for the period containing `day` (default: today).
+    Totals are rolled up from the XP event log every minute; closed periods come from the archive.
+    """
+    if period_type not in PERIODS:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Unknown period type. Use one of: {', '.join(PERIODS)}"
+        )
     
-    return result
+    return PeriodLeaderboardService.get_board(db, period_type, day, limit, offset)
 
 
 @router.get("/my-rank")
@@ -89,31 +108,44 @@ async def get_my_rank(
 ):
     """
     Get the current user's rank on the leaderboard.
+    Global ranks come from the in-memory rank index when it is loaded.
     """
+    use_index = world_id is None and rank_index.ready
+    
     entry = db.query(LeaderboardEntry).filter(
         LeaderboardEntry.user_id == current_user.user_id,
-        LeaderboardEntry.world_id == world_id
+        LeaderboardEntry.world_id == world_id,
+        LeaderboardEntry.period_start == None
     ).first()
     
     if not entry:
-        # Calculate rank dynamically if no entry exists
-        users_above = db.query(User).filter(
-            User.current_xp > current_user.current_xp
-        ).count()
+        # Not on the board yet: rank the user's lifetime XP
+        total_xp = lifetime_xp(current_user)
+        if use_index:
+            rank = rank_index.rank_for_score(total_xp)
+        else:
+            rank = db.query(LeaderboardEntry).filter(
+                LeaderboardEntry.world_id == world_id,
+                LeaderboardEntry.period_start == None,
+                LeaderboardEntry.total_xp > total_xp
+            ).count() + 1
         
         return {
-            "rank": users_above + 1,
-            "total_xp": current_user.current_xp,
+            "rank": rank,
+            "total_xp": total_xp,
             "total_gold": current_user.gold,
             "message": "Rank calculated dynamically"
         }
     
+    rank, total_xp = entry.rank_position, entry.total_xp
+    if use_index:
+        rank, total_xp = rank_index.rank_of(current_user.user_id) or (rank, total_xp)
+    
     return {
-        "rank": entry.rank_position,
-        "total_xp": entry.total_xp,
+        "rank": rank,
+        "total_xp": total_xp,
         "total_gold": entry.total_gold,
         "quests_completed": entry.quests_completed,
         "monsters_defeated": entry.monsters_defeated,
         "achievements_unlocked": entry.achievements_unlocked
     }
-
@@ -1,16 +1,41 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from datetime import timedelta
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
-from typing import List
+from typing import List, Optional
+import json
 
-from app.database import get_db
-from app.models.notification import Notification
+from app.config import get_settings
+from app.database import SessionLocal, get_db
 from app.models.user import User
 from app.schemas.notification import NotificationResponse
+from app.services.auth_service import AuthService
+from app.services.notification_service import (
+    BROADCAST_TOPIC, NotificationService, event_applies, notification_hub, user_topic
+)
 from app.utils.dependencies import get_current_user
 
 router = APIRouter(prefix="/api/notifications", tags=["Notifications"])
 
+settings = get_settings()
+
+# Scope of the short-lived token /stream accepts in its URL; the login token is refused there
+STREAM_TOKEN_SCOPE = "notifications:stream"
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def _count_unread(user: User) -> int:
+    """Unread count in a short-lived session (streams must not hold a connection between events)."""
+    db = SessionLocal()
+    try:
+        return NotificationService.unread_count(db, user)
+    finally:
+        db.close()
+
 
 @router.get("/", response_model=List[NotificationResponse])
 async def get_user_notifications(
@@ -20,12 +45,9 @@ async def get_user_notifications(
 ):
     """
     Get all notifications for the current user.
+    Personal notifications and broadcasts to the user's audience are merged in one query.
     """
-    notifications = db.query(Notification).filter(
-        Notification.user_id == current_user.user_id
-    ).order_by(desc(Notification.created_at)).limit(limit).all()
-    
-    return notifications
+    return NotificationService.list_for_user(db, current_user, limit)
 
 
 @router.get("/unread-count")
@@ -34,14 +56,118 @@ async def get_unread_count(
     db: Session = Depends(get_db)
 ):
     """
-    Get the count of unread notifications.
+    Get the count of unread notifications (personal and broadcast).
     """
-    count = db.query(Notification).filter(
-        Notification.user_id == current_user.user_id,
-        Notification.is_read == False
-    ).count()
+    return {"unread_count": NotificationService.unread_count(db, current_user)}
+
+
+@router.post("/stream-token")
+async def create_stream_token(current_user: User = Depends(get_current_user)):
+    """
+    Issue a short-lived token for /stream. EventSource cannot set headers, so the token
+    ends up in the URL (and in access logs and browser history); this one only opens the
+    stream and expires in seconds, where the login token would grant everything for a day.
+    """
+    stream_token = AuthService.create_access_token(
+        data={
+            "sub": str(current_user.user_id),
+            "role": "user",
+            "scope": STREAM_TOKEN_SCOPE
+        },
+        expires_delta=timedelta(seconds=settings.notification_stream_token_seconds)
+    )
+    return {"token": stream_token, "expires_in": settings.notification_stream_token_seconds}
+
+
+@router.get("/stream")
+async def stream_notifications(
+    request: Request,
+    token: Optional[str] = None
+):
+    """
+    Server-sent events for the current user: `unread_count` on connect and whenever it
+    may have changed, `notification` for each new notification. EventSource cannot set
+    headers, so ?token= takes a token from /stream-token (the login token is refused in the
+    URL); clients that can set headers may send the login token as a Bearer header instead.
+    The token is only checked on connect, so a stream outlives it. /unread-count remains the
+    polling fallback.
+    
+    A new broadcast carries its unread delta, so the count is bumped in place rather than
+    every connected client querying at once; it is recounted on connect, on changes to the
+    user's own notifications, and at the next heartbeat after broadcasts were applied.
+    """
+    header_token = request.headers.get("authorization", "").removeprefix("Bearer ").strip()
+    if not token and not header_token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated"
+        )
+    
+    # Authenticate with a session of our own: a Depends(get_db) session would stay open for the whole stream
+    db = SessionLocal()
+    try:
+        if token:
+            token_data = AuthService.decode_token(token, scope=STREAM_TOKEN_SCOPE)
+            current_user = db.query(User).filter(User.user_id == token_data.id).first()
+            if current_user is None:
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="User not found"
+                )
+        else:
+            current_user = await get_current_user(token=header_token, db=db)
+        db.expunge(current_user)
+    finally:
+        db.close()
+    
+    async def events():
+        subscription = notification_hub.subscribe(user_topic(current_user.user_id), BROADCAST_TOPIC)
+        try:
+            count = await run_in_threadpool(_count_unread, current_user)
+            yield _sse("unread_count", {"unread_count": count})
+            # Broadcast deltas applied since the last recount
+            estimated = False
+            
+            while not await request.is_disconnected():
+                first = await subscription.get(settings.notification_stream_heartbeat_seconds)
+                if first is None:
+                    yield ": keep-alive\n\n"
+                    if estimated:
+                        estimated = False
+                        recount = await run_in_threadpool(_count_unread, current_user)
+                        if recount != count:
+                            count = recount
+                            yield _sse("unread_count", {"unread_count": count})
+                    continue
+                
+                # Coalesce a burst of events into at most one recount
+                delta = 0
+                recount = False
+                for event in [first, *subscription.drain()]:
+                    if not event_applies(event, current_user):
+                        continue
+                    if event["type"] == "notification":
+                        yield _sse("notification", event["notification"])
+                    if "unread_delta" in event:
+                        delta += event["unread_delta"]
+                    else:
+                        recount = True
+                if recount:
+                    count = await run_in_threadpool(_count_unread, current_user)
+                    estimated = False
+                    yield _sse("unread_count", {"unread_count": count})
+                elif delta:
+                    count = max(count + delta, 0)
+                    estimated = True
+                    yield _sse("unread_count", {"unread_count": count})
+        finally:
+            subscription.close()
     
-    return {"unread_count": count}
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 @router.put("/{notification_id}/read")
@@ -53,20 +179,12 @@ async def mark_notification_read(
     """
     Mark a single notification as read.
     """
-    notification = db.query(Notification).filter(
-        Notification.notification_id == notification_id,
-        Notification.user_id == current_user.user_id
-    ).first()
-    
-    if not notification:
+    if not NotificationService.mark_read(db, current_user, notification_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Notification not found"
         )
     
-    notification.is_read = True
-    db.commit()
-    
     return {"message": "Notification marked as read"}
 
 
@@ -78,12 +196,7 @@ async def mark_all_notifications_read(
     """
     Mark all notifications as read for the current user.
     """
-    db.query(Notification).filter(
-        Notification.user_id == current_user.user_id,
-        Notification.is_read == False
-    ).update({"is_read": True})
-    
-    db.commit()
+    NotificationService.mark_all_read(db, current_user)
     
     return {"message": "All notifications marked as read"}
 
@@ -95,22 +208,14 @@ async def delete_notification(
     db: Session = Depends(get_db)
 ):
     """
-    Delete a notification.
+    Delete a notification (broadcasts are dismissed for the current user only).
     """
-    notification = db.query(Notification).filter(
-        Notification.notification_id == notification_id,
-        Notification.user_id == current_user.user_id
-    ).first()
-    
-    if not notification:
+    if not NotificationService.delete(db, current_user, notification_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Notification not found"
         )
     
-    db.delete(notification)
-    db.commit()
-    
     return {"message": "Notification deleted"}
 
 
@@ -122,10 +227,6 @@ async def clear_all_notifications(
     """
     Clear all notifications for the current user.
     """
-    db.query(Notification).filter(
-        Notification.user_id == current_user.user_id
-    ).delete()
-    
-    db.commit()
+    NotificationService.clear_all(db, current_user)
     
     return {"message": "All notifications cleared"}
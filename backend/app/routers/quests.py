@@ -190,11 +190,7 @@ async def complete_quest(
             detail="Quest not found"
         )
     
+    # Rewards and achievement unlocks are applied in the same transaction
     result = GameService.complete_quest(db, current_user, quest)
     
-    # Check for achievements
-    new_achievements = GameService.check_and_award_achievements(db, current_user)
-    
-    result["new_achievements"] = [a.name for a in new_achievements]
-    
     return result
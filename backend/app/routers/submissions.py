@@ -8,9 +8,15 @@ from app.models.submission import Submission, SubmissionStatus
 from app.models.assignment import Assignment
 from app.models.user import User
 from app.models.teacher import Teacher
-from app.schemas.submission import SubmissionCreate, SubmissionResponse, SubmissionGrade
+from app.schemas.submission import (
+    BulkGradeRequest, BulkGradeResponse, GradingStatusResponse, RegradeResponse,
+    SubmissionCreate, SubmissionCreateResponse, SubmissionGrade, SubmissionResponse
+)
 from app.utils.dependencies import get_current_user, get_current_teacher
-from app.services.game_service import GameService
+from app.services.grading_queue import GradingQueue, grading_workers
+from app.services.reward_pipeline import RewardPipeline
+from app.services.submission_service import SubmissionService
+from app.utils.cache import invalidate_dashboard
 
 router = APIRouter(prefix="/api/submissions", tags=["Submissions"])
 
@@ -59,7 +65,7 @@ async def get_submissions_for_assignment(
     return submissions
 
 
-@router.post("/", response_model=SubmissionResponse, status_code=status.HTTP_201_CREATED)
+@router.post("/", response_model=SubmissionCreateResponse, status_code=status.HTTP_201_CREATED)
 async def create_submission(
     submission_data: SubmissionCreate,
     current_user: User = Depends(get_current_user),
@@ -67,10 +73,8 @@ async def create_submission(
 ):
     """
     Submit work for an assignment.
+    Returns immediately; AI grading is queued (poll GET /{submission_id}/grading for progress).
     """
-    print(f"DEBUG: Processing submission for user {current_user.username}")
-    print(f"DEBUG: Data: {submission_data}")
-    
     assignment = db.query(Assignment).filter(
         Assignment.assignment_id == submission_data.assignment_id
     ).first()
@@ -102,84 +106,49 @@ async def create_submission(
     )
     
     db.add(new_submission)
+    db.flush()
+    
+    # AI grading runs in the background worker pool; the job commits with the submission
+    job = GradingQueue.enqueue(db, new_submission.submission_id)
     db.commit()
     db.refresh(new_submission)
+    grading_workers.notify()
+    invalidate_dashboard(current_user.user_id)
     
-    # === AI AUTO-GRADING ===
-    try:
-        from app.services.ai_grader import AIGraderService
-        from app.models.ai_grading import AIGradingLog
-        
-        # Determine content to grade
-        content_to_grade = submission_data.submission_text or "See attached file."
-        
-        grading_result = await AIGraderService.grade_submission(
-            assignment_title=assignment.title,
-            assignment_description=assignment.description,
-            submission_text=content_to_grade,
-            submission_url=submission_data.submission_url
-        )
-        
-        # Apply Grading
-        new_submission.grade_awarded = grading_result.get("score", 0)
-        new_submission.teacher_feedback = grading_result.get("feedback", "Pending review.")
-        
-        status_str = grading_result.get("status", "pending")
-        if status_str == "approved":
-            new_submission.status = SubmissionStatus.APPROVED
-        elif status_str == "rejected":
-            new_submission.status = SubmissionStatus.REJECTED
-        else:
-            new_submission.status = SubmissionStatus.PENDING
-            
-        new_submission.graded_at = datetime.utcnow()
-        
-        # Award Rewards if Approved
-        if new_submission.status == SubmissionStatus.APPROVED:
-            # Calculate proportional rewards
-            grade_percent = new_submission.grade_awarded / assignment.max_score
-            xp_earned = int(assignment.xp_reward * grade_percent)
-            gold_earned = int(assignment.gold_reward * grade_percent)
-            
-            if xp_earned > 0:
-                GameService.award_xp(db, current_user, xp_earned)
-            if gold_earned > 0:
-                GameService.award_gold(db, current_user, gold_earned)
-                
-            # Update Weekly Progress
-            GameService.update_weekly_progress(db, current_user.user_id, xp_earned, activity_type="quest_complete") 
-                
-        # === Log to AIGradingLog Table ===
-        try:
-            ai_log = AIGradingLog(
-                submission_id=new_submission.submission_id,
-                assignment_id=assignment.assignment_id,
-                user_id=current_user.user_id,
-                user_email=current_user.email,
-                score_awarded=new_submission.grade_awarded or 0,
-                feedback_text=new_submission.teacher_feedback,
-                status_verdict=status_str
-            )
-            db.add(ai_log)
-        except Exception as log_err:
-            print(f"ERROR: Failed to create AI log: {log_err}")
-            import traceback
-            traceback.print_exc()
-
-        db.commit()
-    except Exception as e:
-        db.rollback() # Rollback potentially failed transaction state from AI logic
-        print(f"ERROR inside AI Grading Block: {e}")
-        import traceback
-        traceback.print_exc()
-        # Ensure the basic submission is still saved!
-        # The first commit happened at line 105, so the submission exists.
-        # We just need to ensure we don't leave the DB in an invalid state if something exploded.
-        pass
+    response = SubmissionCreateResponse.model_validate(new_submission)
+    response.grading_job_id = job.job_id
+    response.grading_status = job.status
+    return response
+
+
+@router.get("/{submission_id}/grading", response_model=GradingStatusResponse)
+async def get_grading_status(
+    submission_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Get the AI grading progress of one of the current user's submissions.
+    """
+    submission = db.query(Submission).filter(
+        Submission.submission_id == submission_id,
+        Submission.user_id == current_user.user_id
+    ).first()
     
-    db.refresh(new_submission)
+    if not submission:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Submission not found"
+        )
     
-    return new_submission
+    job = GradingQueue.status(db, submission_id)
+    return {
+        "submission_id": submission.submission_id,
+        "submission_status": submission.status,
+        "grade_awarded": submission.grade_awarded,
+        "teacher_feedback": submission.teacher_feedback,
+        "job": job
+    }
 
 
 @router.put("/{submission_id}/grade", response_model=SubmissionResponse)
@@ -192,9 +161,10 @@ async def grade_submission(
     """
     Grade a submission (teacher only).
     """
+    # Locked until commit so the AI worker or a bulk grade cannot approve (and reward) it concurrently
     submission = db.query(Submission).filter(
         Submission.submission_id == submission_id
-    ).first()
+    ).with_for_update().first()
     
     if not submission:
         raise HTTPException(
@@ -210,26 +180,95 @@ async def grade_submission(
         )
     
     # Update submission
+    was_approved = submission.status == SubmissionStatus.APPROVED
     submission.status = SubmissionStatus(grade_data.status.value)
     submission.grade_awarded = grade_data.grade_awarded
     submission.teacher_feedback = grade_data.teacher_feedback
     submission.graded_at = datetime.utcnow()
     
-    # Award XP and gold if approved
-    if grade_data.status == SubmissionStatus.APPROVED:
-        user = submission.user
-        
+    # Award XP and gold if newly approved (committed together with the grade)
+    pipeline = RewardPipeline(db, submission.user)
+    if grade_data.status == SubmissionStatus.APPROVED and not was_approved:
         # Calculate rewards based on grade percentage
         grade_percent = grade_data.grade_awarded / assignment.max_score
         xp_earned = int(assignment.xp_reward * grade_percent)
         gold_earned = int(assignment.gold_reward * grade_percent)
         
         if xp_earned > 0:
-            GameService.award_xp(db, user, xp_earned)
+            pipeline.add_xp(xp_earned)
         if gold_earned > 0:
-            GameService.award_gold(db, user, gold_earned)
+            pipeline.add_gold(gold_earned)
     
-    db.commit()
+    pipeline.commit()
     db.refresh(submission)
     
     return submission
+
+
+@router.post("/grade/bulk", response_model=BulkGradeResponse)
+async def grade_submissions_bulk(
+    request: BulkGradeRequest,
+    current_teacher: Teacher = Depends(get_current_teacher),
+    db: Session = Depends(get_db)
+):
+    """
+    Grade many submissions in one transaction (teacher only).
+    Ownership is checked once per assignment; XP and gold go to submissions that become approved.
+    """
+    grades = [g.model_dump(mode="json") for g in request.grades]
+    submission_ids = [g["submission_id"] for g in grades]
+    if len(set(submission_ids)) != len(submission_ids):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Each submission can only be graded once per request"
+        )
+    
+    submissions = SubmissionService.load_for_grading(db, submission_ids)
+    missing = [submission_id for submission_id in submission_ids if submission_id not in submissions]
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Submissions not found: {missing}"
+        )
+    
+    foreign = sorted({
+        row["assignment_id"] for row in submissions.values()
+        if row["teacher_id"] != current_teacher.teacher_id
+    })
+    if foreign:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"You don't have permission to grade submissions for assignments: {foreign}"
+        )
+    
+    return SubmissionService.grade_many(db, submissions, grades)
+
+
+@router.post("/assignment/{assignment_id}/regrade", response_model=RegradeResponse)
+async def regrade_pending_submissions(
+    assignment_id: int,
+    current_teacher: Teacher = Depends(get_current_teacher),
+    db: Session = Depends(get_db)
+):
+    """
+    Re-run AI grading for every pending submission of an assignment (teacher only).
+    Jobs are queued and graded by the worker pool at its configured concurrency.
+    """
+    assignment = db.query(Assignment).filter(Assignment.assignment_id == assignment_id).first()
+    
+    if not assignment:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Assignment not found"
+        )
+    
+    if assignment.quest.zone.world.teacher_id != current_teacher.teacher_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You don't have permission to grade these submissions"
+        )
+    
+    queued = SubmissionService.requeue_pending(db, assignment_id)
+    if queued:
+        grading_workers.notify()
+    return {"assignment_id": assignment_id, "jobs_queued": queued}
@@ -1,38 +1,71 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
-import shutil
-import os
-import secrets
-from pathlib import Path
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query, Request, status
+from sqlalchemy.orm import Session
+from typing import Optional
+
+from app.config import get_settings
+from app.database import get_db
+from app.services.upload_service import (
+    UPLOAD_CHUNK_BYTES, UPLOAD_DIR, UnsupportedUploadError, UploadService, UploadTooLargeError
+)
 
 router = APIRouter(prefix="/api/upload", tags=["Upload"])
+settings = get_settings()
 
-UPLOAD_DIR = Path("static/uploads")
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
 from app.utils.dependencies import get_current_user
 from app.models.user import User
 from fastapi import Depends
 
+
+async def _store(db: Session, chunks, filename: Optional[str], content_type: Optional[str]) -> dict:
+    try:
+        return await UploadService.store(db, chunks, filename, content_type)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    except UnsupportedUploadError as e:
+        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail=str(e))
+    except Exception as e:
+        print(f"Upload error: {e}")
+        raise HTTPException(status_code=500, detail="Could not upload file")
+
+
+def _check_declared_size(request: Request) -> None:
+    """Turn away uploads whose Content-Length is already over the limit, before reading the body."""
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > settings.upload_max_bytes:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"File is larger than {settings.upload_max_bytes} bytes"
+        )
+
+
 @router.post("/file")
 async def upload_file(
     file: UploadFile = File(...),
+    db: Session = Depends(get_db),
     # current_user: User = Depends(get_current_user) # Auth removed by user request
 ):
-    try:
-        # Generate a unique filename to prevent overwrites
-        file_ext = os.path.splitext(file.filename)[1]
-        random_name = secrets.token_hex(8)
-        filename = f"{random_name}{file_ext}"
-        
-        file_path = UPLOAD_DIR / filename
-        
-        with file_path.open("wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-            
-        # Return the URL (relative path that will be served by StaticFiles)
-        url = f"/static/uploads/{filename}"
-        
-        return {"url": url, "filename": filename}
-    except Exception as e:
-        print(f"Upload error: {e}")
-        raise HTTPException(status_code=500, detail="Could not upload file")
+    """
+    Upload a file as multipart form data. Returns its URL, checksum and throughput;
+    a file whose content is already stored gets the existing URL.
+    """
+    async def chunks():
+        while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+            yield chunk
+
+    return await _store(db, chunks(), file.filename, file.content_type)
+
+
+@router.post("/stream")
+async def upload_stream(
+    request: Request,
+    filename: str = Query(..., min_length=1, max_length=255),
+    db: Session = Depends(get_db),
+):
+    """
+    Upload a file as the raw request body (Content-Type is the file's type). Nothing is buffered:
+    the body is written to disk as it arrives and the upload stops as soon as it breaks a limit.
+    """
+    _check_declared_size(request)
+    return await _store(db, request.stream(), filename, request.headers.get("content-type"))
@@ -7,6 +7,7 @@ from app.models.user import User
 from app.schemas.user import UserResponse, UserUpdate, UserStats
 from app.utils.dependencies import get_current_user
 from app.services.game_service import GameService
+from app.services.counter_service import CounterService
 
 router = APIRouter(prefix="/api/users", tags=["Users (Heroes)"])
 
@@ -92,27 +93,35 @@ async def heal_current_user(
     """
     heal_cost = 50
     
-    if current_user.gold < heal_cost:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Not enough gold! Need {heal_cost}, have {current_user.gold}"
-        )
+    # Charge and heal in one guarded UPDATE so concurrent requests can't double-spend
+    counters = CounterService.apply(
+        db, current_user,
+        gold=-heal_cost,
+        full_heal=True,
+        min_gold=heal_cost,
+        require_missing_hp=True
+    )
     
-    if current_user.hp_current == current_user.hp_max:
+    if counters is None:
+        db.rollback()
+        db.refresh(current_user)
+        if current_user.gold < heal_cost:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Not enough gold! Need {heal_cost}, have {current_user.gold}"
+            )
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Already at full health!"
         )
     
-    current_user.gold -= heal_cost
-    current_user.hp_current = current_user.hp_max
     db.commit()
     
     return {
         "message": "Fully healed!",
-        "hp_current": current_user.hp_current,
-        "hp_max": current_user.hp_max,
-        "gold_remaining": current_user.gold
+        "hp_current": counters["hp_current"],
+        "hp_max": counters["hp_max"],
+        "gold_remaining": counters["gold"]
     }
 
 
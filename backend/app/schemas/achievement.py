@@ -23,6 +23,7 @@ class AchievementResponse(BaseModel):
     icon_url: Optional[str] = None
     requirement_value: int
     requirement_description: Optional[str] = None
+    requirement_metric: Optional[str] = None
     xp_reward: int
     gold_reward: int
     title_reward: Optional[str] = None
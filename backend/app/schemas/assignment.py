@@ -39,3 +39,8 @@ class AssignmentResponse(AssignmentBase):
     
     class Config:
         from_attributes = True
+
+
+class AssignmentCreateResponse(AssignmentResponse):
+    """Schema for a newly created assignment with its broadcast announcement."""
+    notification_id: Optional[int] = None
@@ -0,0 +1,86 @@
+from pydantic import BaseModel
+from typing import List, Optional
+from datetime import date, datetime
+
+
+class DailyQuestResponse(BaseModel):
+    quest_id: int
+    title: str
+    description: Optional[str]
+    quest_type: str
+    target_value: int
+    xp_reward: int
+    gold_reward: int
+    icon: str
+    current_progress: int = 0
+    is_completed: bool = False
+
+    class Config:
+        from_attributes = True
+
+
+class StreakResponse(BaseModel):
+    current_streak: int
+    longest_streak: int
+    last_activity_date: Optional[date]
+    is_active_today: bool
+
+    class Config:
+        from_attributes = True
+
+
+class ActivityResponse(BaseModel):
+    id: int
+    activity_type: str
+    title: str
+    description: Optional[str]
+    xp_earned: int
+    gold_earned: int
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class WeeklyGoalResponse(BaseModel):
+    xp_target: int
+    xp_earned: int
+    xp_percent: float
+    quests_target: int
+    quests_completed: int
+    quests_percent: float
+    battles_target: int
+    battles_won: int
+    battles_percent: float
+
+    class Config:
+        from_attributes = True
+
+
+class SkillProgress(BaseModel):
+    world_id: int
+    world_title: str
+    total_quests: int
+    completed_quests: int
+    percent: float
+    color: str
+
+
+class ContinueJourneyResponse(BaseModel):
+    quest_id: int
+    quest_title: str
+    zone_title: str
+    world_title: str
+    world_id: int
+    zone_id: int
+
+
+class DashboardEngagementResponse(BaseModel):
+    daily_quests: List[DailyQuestResponse]
+    streak: StreakResponse
+    recent_activity: List[ActivityResponse]
+    weekly_goals: WeeklyGoalResponse
+    skills: List[SkillProgress]
+    continue_quest: Optional[ContinueJourneyResponse]
+    battle_ready: bool
+    hp_percent: float
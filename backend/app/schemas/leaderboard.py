@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime, date
 
 
@@ -23,6 +23,25 @@ class LeaderboardEntryResponse(BaseModel):
         from_attributes = True
 
 
+class PeriodLeaderboardEntryResponse(BaseModel):
+    """Schema for one row of a weekly / monthly / season leaderboard."""
+    user_id: int
+    username: str
+    avatar_class: str
+    total_xp: int
+    total_gold: int
+    rank_position: Optional[int] = None
+
+
+class PeriodLeaderboardResponse(BaseModel):
+    """Schema for a page of a period leaderboard."""
+    period_type: str
+    period_start: date
+    period_end: date
+    archived: bool = False
+    entries: List[PeriodLeaderboardEntryResponse]
+
+
 class LeaderboardQuery(BaseModel):
     """Schema for querying leaderboard."""
     world_id: Optional[int] = None  # None = global
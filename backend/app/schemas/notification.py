@@ -20,6 +20,7 @@ class NotificationResponse(NotificationBase):
     notification_id: int
     user_id: int
     is_read: bool
+    is_broadcast: bool = False
     created_at: datetime
     
     class Config:
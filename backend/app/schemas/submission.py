@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import List, Optional
 from datetime import datetime
 from enum import Enum
 
@@ -29,6 +29,32 @@ class SubmissionGrade(BaseModel):
     teacher_feedback: Optional[str] = None
 
 
+class BulkGradeItem(SubmissionGrade):
+    """One grade in a bulk grading request."""
+    submission_id: int
+
+
+class BulkGradeRequest(BaseModel):
+    """Schema for grading many submissions in one request (teacher only)."""
+    grades: List[BulkGradeItem] = Field(..., min_length=1, max_length=500)
+
+
+class BulkGradeResponse(BaseModel):
+    """Summary of a bulk grading request."""
+    graded: int
+    approved: int
+    rewarded_users: int
+    xp_awarded: int
+    gold_awarded: int
+    achievements_unlocked: int = 0
+
+
+class RegradeResponse(BaseModel):
+    """Summary of re-running AI grading for an assignment's pending submissions."""
+    assignment_id: int
+    jobs_queued: int
+
+
 class SubmissionResponse(SubmissionBase):
     """Schema for submission response."""
     submission_id: int
@@ -43,3 +69,31 @@ class SubmissionResponse(SubmissionBase):
     
     class Config:
         from_attributes = True
+
+
+class SubmissionCreateResponse(SubmissionResponse):
+    """Schema for a new submission with its queued AI grading job."""
+    grading_job_id: Optional[int] = None
+    grading_status: Optional[str] = None
+
+
+class GradingJobResponse(BaseModel):
+    """Schema for an AI grading job."""
+    job_id: int
+    submission_id: int
+    status: str  # queued, running, completed, failed
+    attempts: int
+    queue_position: Optional[int] = None  # Queued jobs ahead of this one
+    verdict: Optional[str] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+
+class GradingStatusResponse(BaseModel):
+    """Schema for a submission's AI grading progress."""
+    submission_id: int
+    submission_status: SubmissionStatus
+    grade_awarded: Optional[int] = None
+    teacher_feedback: Optional[str] = None
+    job: Optional[GradingJobResponse] = None
@@ -0,0 +1,311 @@
+"""
+Achievement Service - Incremental, indexed achievement evaluation.
+
+Each user has a row of running counters (user_stats) that game events bump
+with a single upsert. Achievements are indexed in memory by counter and
+sorted threshold, so an event only looks at the thresholds it crossed
+(old < threshold <= new) instead of re-counting progress and scanning every
+achievement. Progress reads are a counter lookup per achievement.
+
+The index is invalidated when a session that wrote achievements commits, and
+reloaded after INDEX_TTL_SECONDS in any case (other workers and seed scripts).
+"""
+import threading
+import time
+from bisect import bisect_right
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import event, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session, object_session
+
+from app.models.achievement import Achievement, AchievementType, UserAchievement, UserStats
+from app.models.user import User
+from app.services.counter_service import CounterService
+
+# Counters stored in user_stats
+STAT_METRICS = ("quests_completed", "perfect_scores", "items_owned")
+
+# Every counter an achievement can require; gold is read from the users row
+METRICS = STAT_METRICS + ("gold",)
+
+# Counter used when an achievement has no requirement_metric
+DEFAULT_METRIC_BY_TYPE = {
+    AchievementType.QUEST: "quests_completed",
+    AchievementType.COMBAT: "quests_completed",
+    AchievementType.COLLECTION: "items_owned",
+}
+
+# How long the in-memory index is trusted before it is reloaded
+INDEX_TTL_SECONDS = 300
+
+# Session.info key set when the session has written achievements
+ACHIEVEMENTS_CHANGED_KEY = "achievements_changed"
+
+
+class IndexedAchievement(NamedTuple):
+    """Immutable snapshot of an achievement held by the index."""
+    achievement_id: int
+    name: str
+    description: str
+    metric: Optional[str]
+    threshold: int
+    xp_reward: int
+    gold_reward: int
+    title_reward: Optional[str]
+
+
+class AchievementIndex:
+    """Achievements grouped by counter, sorted by threshold."""
+
+    def __init__(self, ttl: float = INDEX_TTL_SECONDS):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._loaded_at: Optional[float] = None
+        self._all: List[IndexedAchievement] = []
+        self._thresholds: Dict[str, List[int]] = {}
+        self._by_metric: Dict[str, List[IndexedAchievement]] = {}
+
+    def ensure_loaded(self, db: Session) -> "AchievementIndex":
+        with self._lock:
+            if self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl:
+                self._load(db)
+        return self
+
+    def invalidate(self) -> None:
+        """Force a reload on next use (call after achievements are created or edited)."""
+        with self._lock:
+            self._loaded_at = None
+
+    def _load(self, db: Session) -> None:
+        entries = []
+        for a in db.query(Achievement).order_by(Achievement.achievement_id).all():
+            metric = a.requirement_metric or DEFAULT_METRIC_BY_TYPE.get(a.achievement_type)
+            entries.append(IndexedAchievement(
+                achievement_id=a.achievement_id,
+                name=a.name,
+                description=a.description,
+                metric=metric if metric in METRICS else None,
+                threshold=a.requirement_value or 0,
+                xp_reward=a.xp_reward or 0,
+                gold_reward=a.gold_reward or 0,
+                title_reward=a.title_reward
+            ))
+
+        by_metric: Dict[str, List[IndexedAchievement]] = {}
+        for entry in entries:
+            if entry.metric:
+                by_metric.setdefault(entry.metric, []).append(entry)
+        for metric in by_metric:
+            by_metric[metric].sort(key=lambda e: e.threshold)
+
+        self._all = entries
+        self._by_metric = by_metric
+        self._thresholds = {m: [e.threshold for e in items] for m, items in by_metric.items()}
+        self._loaded_at = time.monotonic()
+
+    def all(self) -> List[IndexedAchievement]:
+        return self._all
+
+    def crossed(self, metric: str, old_value: int, new_value: int) -> List[IndexedAchievement]:
+        """Achievements whose threshold lies in (old_value, new_value]."""
+        thresholds = self._thresholds.get(metric)
+        if not thresholds or new_value <= old_value:
+            return []
+        lo = bisect_right(thresholds, old_value)
+        hi = bisect_right(thresholds, new_value)
+        return self._by_metric[metric][lo:hi]
+
+    def reached(self, metric: str, value: int) -> List[IndexedAchievement]:
+        """Achievements whose threshold is at or below value."""
+        thresholds = self._thresholds.get(metric)
+        if not thresholds:
+            return []
+        return self._by_metric[metric][:bisect_right(thresholds, value)]
+
+
+achievement_index = AchievementIndex()
+
+
+@event.listens_for(Achievement, "after_insert")
+@event.listens_for(Achievement, "after_update")
+@event.listens_for(Achievement, "after_delete")
+def _mark_achievements_changed(mapper, connection, target: Achievement) -> None:
+    session = object_session(target)
+    if session is not None:
+        session.info[ACHIEVEMENTS_CHANGED_KEY] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _reload_changed_achievements(session: Session) -> None:
+    # Invalidated only once committed, so a reload cannot pick up rows that are later rolled back
+    if session.info.pop(ACHIEVEMENTS_CHANGED_KEY, False):
+        achievement_index.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_achievement_changes(session: Session) -> None:
+    session.info.pop(ACHIEVEMENTS_CHANGED_KEY, None)
+
+
+class AchievementService:
+    """Maintains achievement counters and awards achievements as thresholds are crossed."""
+
+    @staticmethod
+    def get_stats(db: Session, user: User) -> Dict[str, int]:
+        """Current value of every counter for a user."""
+        stats = db.query(UserStats).filter(UserStats.user_id == user.user_id).first()
+        values = {metric: getattr(stats, metric) if stats else 0 for metric in STAT_METRICS}
+        values["gold"] = user.gold
+        return values
+
+    @staticmethod
+    def record(db: Session, user_id: int, **deltas: int) -> Dict[str, Tuple[int, int]]:
+        """
+        Add deltas to a user's counters (INSERT ... ON CONFLICT) without committing.
+        Returns {metric: (old_value, new_value)} for every counter that changed.
+        """
+        deltas = {metric: amount for metric, amount in deltas.items() if amount}
+        unknown = set(deltas) - set(STAT_METRICS)
+        if unknown:
+            raise ValueError(f"Unknown achievement counters: {', '.join(sorted(unknown))}")
+        if not deltas:
+            return {}
+
+        stmt = insert(UserStats).values(
+            user_id=user_id,
+            **{metric: max(deltas.get(metric, 0), 0) for metric in STAT_METRICS}
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[UserStats.user_id],
+            set_={metric: func.greatest(0, getattr(UserStats, metric) + amount) for metric, amount in deltas.items()}
+        ).returning(*(getattr(UserStats, metric) for metric in deltas))
+
+        row = db.execute(stmt).first()
+        return {
+            metric: (max(new_value - amount, 0), new_value)
+            for (metric, amount), new_value in zip(deltas.items(), row)
+        }
+
+    @staticmethod
+    def evaluate(db: Session, user: User, changes: Dict[str, Tuple[int, int]]) -> List[IndexedAchievement]:
+        """Award achievements whose thresholds were crossed by the given counter changes."""
+        if not changes:
+            return []
+        index = achievement_index.ensure_loaded(db)
+        candidates = []
+        for metric, (old_value, new_value) in changes.items():
+            candidates.extend(index.crossed(metric, old_value, new_value))
+        return AchievementService.award(db, user, candidates)
+
+    @staticmethod
+    def evaluate_many(
+        db: Session, changes_by_user: Dict[int, Dict[str, Tuple[int, int]]]
+    ) -> Dict[int, List[IndexedAchievement]]:
+        """
+        evaluate() for many users at once (e.g. bulk grading). Only users who crossed a threshold are loaded.
+        Does not commit. Returns user_id -> newly unlocked achievements.
+        """
+        index = achievement_index.ensure_loaded(db)
+        candidates: Dict[int, List[IndexedAchievement]] = {}
+        for user_id, changes in changes_by_user.items():
+            crossed = [
+                achievement
+                for metric, (old_value, new_value) in changes.items()
+                for achievement in index.crossed(metric, old_value, new_value)
+            ]
+            if crossed:
+                candidates[user_id] = crossed
+        if not candidates:
+            return {}
+
+        users = db.query(User).filter(User.user_id.in_(candidates)).all()
+        return {user.user_id: AchievementService.award(db, user, candidates[user.user_id]) for user in users}
+
+    @staticmethod
+    def sync_user(db: Session, user: User) -> List[IndexedAchievement]:
+        """
+        Award every achievement the user's current counters qualify for.
+        Used for explicit re-checks (e.g. after new achievements are added).
+        """
+        index = achievement_index.ensure_loaded(db)
+        stats = AchievementService.get_stats(db, user)
+        candidates = []
+        for metric, value in stats.items():
+            candidates.extend(index.reached(metric, value))
+        return AchievementService.award(db, user, candidates)
+
+    @staticmethod
+    def award(db: Session, user: User, candidates: Iterable[IndexedAchievement]) -> List[IndexedAchievement]:
+        """
+        Unlock candidate achievements (skipping ones already owned) and apply their rewards.
+        Does not commit. Returns the achievements that were newly unlocked.
+        """
+        candidates = {a.achievement_id: a for a in candidates}
+        if not candidates:
+            return []
+
+        stmt = insert(UserAchievement).values([
+            dict(user_id=user.user_id, achievement_id=achievement_id)
+            for achievement_id in candidates
+        ]).on_conflict_do_nothing(
+            index_elements=[UserAchievement.user_id, UserAchievement.achievement_id]
+        ).returning(UserAchievement.achievement_id)
+
+        unlocked = [candidates[achievement_id] for achievement_id in db.execute(stmt).scalars()]
+        if not unlocked:
+            return []
+
+        reward_xp = sum(max(a.xp_reward, 0) for a in unlocked)
+        reward_gold = sum(max(a.gold_reward, 0) for a in unlocked)
+        if reward_xp or reward_gold:
+            counters = CounterService.apply(db, user, xp=reward_xp, gold=reward_gold)
+
+        titles = [a.title_reward for a in unlocked if a.title_reward]
+        if titles:
+            user.title = titles[-1]
+
+        # The user's achievements collection no longer matches the table
+        db.expire(user, ["achievements"])
+
+        from app.services.leaderboard_service import stage_user_change  # Local import to avoid circular dep
+        stage_user_change(db, user.user_id, achievements=len(unlocked))
+
+        # Reward gold can cross further gold thresholds; owned achievements are skipped, so this ends
+        if reward_gold:
+            unlocked += AchievementService.evaluate(
+                db, user, {"gold": (counters["gold"] - reward_gold, counters["gold"])}
+            )
+
+        return unlocked
+
+    @staticmethod
+    def get_progress(db: Session, user: User) -> dict:
+        """Progress towards every achievement from the user's counters."""
+        index = achievement_index.ensure_loaded(db)
+        stats = AchievementService.get_stats(db, user)
+        unlocked_ids = {
+            achievement_id for (achievement_id,) in db.query(UserAchievement.achievement_id).filter(
+                UserAchievement.user_id == user.user_id
+            )
+        }
+
+        progress_list = []
+        for achievement in index.all():
+            current_value = stats[achievement.metric] if achievement.metric else 0
+            required = achievement.threshold
+            progress_list.append({
+                "achievement_id": achievement.achievement_id,
+                "name": achievement.name,
+                "description": achievement.description,
+                "is_unlocked": achievement.achievement_id in unlocked_ids,
+                "current_value": current_value,
+                "required_value": required,
+                "progress_percent": min(100, (current_value / required * 100)) if required > 0 else 0
+            })
+
+        return {
+            "total_achievements": len(progress_list),
+            "unlocked_count": len(unlocked_ids),
+            "achievements": progress_list
+        }
@@ -1,9 +1,44 @@
 from typing import Optional, Dict, Any
-import httpx
 import json
+import logging
+import time
+from starlette.concurrency import run_in_threadpool
 from app.config import get_settings
+from app.services.grading_payload import build_grading_payload
+from app.utils.http_client import ManagedHTTPClient
+from app.utils.resilience import CircuitBreaker, TokenBucket
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# One pooled client per process, opened and closed by the app lifespan
+ai_http_client = ManagedHTTPClient(
+    max_connections=settings.ai_http_max_connections,
+    max_keepalive=settings.ai_http_max_keepalive,
+    per_host_limit=settings.ai_http_per_host_limit,
+    timeout=settings.ai_http_timeout_seconds,
+    max_retries=settings.ai_http_max_retries
+)
+
+# Stops calling the provider while it is failing or slow; grading falls back to manual review
+ai_breaker = CircuitBreaker(
+    "ai-grader",
+    window_seconds=settings.ai_breaker_window_seconds,
+    min_calls=settings.ai_breaker_min_calls,
+    failure_ratio=settings.ai_breaker_failure_ratio,
+    slow_call_seconds=settings.ai_breaker_slow_call_seconds,
+    slow_ratio=settings.ai_breaker_slow_ratio,
+    open_seconds=settings.ai_breaker_open_seconds
+)
+
+# Keeps calls within the provider's rate quota
+ai_rate_limiter = TokenBucket(settings.ai_rate_limit_per_minute / 60, settings.ai_rate_limit_burst)
+
+
+def manual_review(feedback: str) -> Dict[str, Any]:
+    """The verdict used when the AI cannot grade: leave the submission pending for a teacher."""
+    return {"score": 0, "feedback": feedback, "status": "pending"}
+
 
 class AIGraderService:
     @staticmethod
@@ -21,7 +56,21 @@ class AIGraderService:
             "status": "approved" | "rejected"
         }
         """
-        
+        # Cut the submission and its uploaded file to the prompt budget (reads the file, so off the event loop)
+        payload = await run_in_threadpool(build_grading_payload, submission_text, submission_url)
+        attachment = payload["attachment"]
+        if attachment is None:
+            attachment_section = ""
+        elif attachment["binary"]:
+            attachment_section = f"Attached File: {attachment['name']} ({attachment['size']} bytes, binary, not shown)"
+        else:
+            attachment_section = f"Attached File: {attachment['name']} ({attachment['size']} bytes)\n{attachment['content']}"
+        truncation_note = (
+            "Parts of the submission were omitted to fit the grading limit; omissions are marked. "
+            "Do not penalize the student for the marked omissions."
+            if payload["truncated"] else ""
+        )
+
         # Prepare the prompt
         prompt = f"""
         You are an expert strict but fair teacher grading a coding assignment.
@@ -30,9 +79,11 @@ class AIGraderService:
         Assignment Description: {assignment_description}
         
         Student Submission:
-        {submission_text}
+        {payload["text"]}
         
         Submission URL (if any): {submission_url or "N/A"}
+        {attachment_section}
+        {truncation_note}
         
         Task:
         1. Evaluate if the submission meets the requirements described in the assignment.
@@ -61,38 +112,51 @@ class AIGraderService:
             ]
         }
         
+        if not ai_breaker.allow():
+            return manual_review("AI Grading Service Unavailable. Please wait for manual grading.")
+
+        # allow() may have taken a half-open trial slot: every path below records an outcome or gives it back
+        recorded = False
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    "https://openrouter.ai/api/v1/chat/completions",
+            if not await ai_rate_limiter.acquire(settings.ai_rate_limit_wait_seconds):
+                logger.warning("AI grading throttled: no provider quota within %ss", settings.ai_rate_limit_wait_seconds)
+                return manual_review("AI Grading Service is busy. Please wait for manual grading.")
+
+            started = time.perf_counter()
+            try:
+                response = await ai_http_client.post(
+                    settings.ai_api_url,
                     headers=headers,
-                    json=data,
-                    timeout=30.0 
+                    json=data
                 )
-                
-                if response.status_code != 200:
-                    print(f"AI Error: {response.text}")
-                    return {
-                        "score": 0,
-                        "feedback": "AI Grading Service Unavailable. Please wait for manual grading.",
-                        "status": "pending"
-                    }
-                
-                result = response.json()
-                content = result['choices'][0]['message']['content']
-                
-                # Parse JSON from content (handle potential markdown ticks)
-                clean_content = content.replace("```json", "").replace("```", "").strip()
-                grading = json.loads(clean_content)
-                
-                return grading
+            except Exception as e:
+                ai_breaker.record(False, time.perf_counter() - started, type(e).__name__)
+                recorded = True
+                logger.exception("AI grading request failed: %s", e)
+                return manual_review("An error occurred during auto-grading. Sent for manual review.")
+
+            # Rate limiting and server errors count against the provider; other statuses are our request's fault
+            healthy = response.status_code < 500 and response.status_code != 429
+            ai_breaker.record(healthy, time.perf_counter() - started, None if healthy else f"HTTP {response.status_code}")
+            recorded = True
+        finally:
+            if not recorded:
+                ai_breaker.cancel()
+
+        if response.status_code != 200:
+            logger.error("AI grading provider returned HTTP %s: %s", response.status_code, response.text[:500])
+            return manual_review("AI Grading Service Unavailable. Please wait for manual grading.")
+
+        try:
+            result = response.json()
+            content = result['choices'][0]['message']['content']
+            
+            # Parse JSON from content (handle potential markdown ticks)
+            clean_content = content.replace("```json", "").replace("```", "").strip()
+            grading = json.loads(clean_content)
+            
+            return grading
 
         except Exception as e:
-            import traceback
-            traceback.print_exc()
-            print(f"AI Exception: {e}")
-            return {
-                "score": 0,
-                "feedback": "An error occurred during auto-grading. Sent for manual review.",
-                "status": "pending"
-            }
+            logger.exception("Could not parse AI grading response: %s", e)
+            return manual_review("An error occurred during auto-grading. Sent for manual review.")
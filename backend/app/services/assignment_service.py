@@ -0,0 +1,207 @@
+"""
+Assignment Service - Assignment listings built as single joined queries.
+
+Both listings are one statement each. A student's pending list joins assignments to their quest, zone and world,
+LEFT JOINs the student's own submission (unique on user_id, assignment_id)
+and derives status and overdue in SQL, so the endpoint costs one query no
+matter how many assignments are visible. A teacher's index selects one page
+of their assignments with the world/zone/quest path and LEFT JOINs per-status
+submission counts grouped over just that page.
+
+Pages continue from an opaque cursor naming the last row's sort timestamp
+(due date for students, creation time for teachers) and assignment id.
+"""
+import base64
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import and_, case, false, func, or_, select
+from sqlalchemy.orm import Session
+
+from app.models.assignment import Assignment
+from app.models.quest import Quest
+from app.models.submission import Submission, SubmissionStatus
+from app.models.user import User
+from app.models.world import World
+from app.models.zone import Zone
+
+
+def encode_cursor(sort_key: Optional[datetime], assignment_id: int) -> str:
+    """Opaque cursor for the row (sort_key, assignment_id)."""
+    key = sort_key.isoformat() if sort_key else ""
+    return base64.urlsafe_b64encode(f"{key}|{assignment_id}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[datetime], int]:
+    """Inverse of encode_cursor. Raises ValueError for a malformed cursor."""
+    try:
+        key, assignment_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return (datetime.fromisoformat(key) if key else None), int(assignment_id)
+    except ValueError:  # Also covers bad base64 and bad UTF-8
+        raise ValueError("Invalid cursor")
+
+
+def class_allowed(column, avatar_class: Optional[str]):
+    """Rows whose required_class admits avatar_class ("All" and NULL admit everyone)."""
+    return or_(column == "All", column.is_(None), column == avatar_class)
+
+
+class AssignmentService:
+    """Read paths for assignment listings."""
+
+    @staticmethod
+    def pending_for_user(db: Session, user: User, limit: Optional[int] = None,
+                         cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+        """
+        Assignments visible to user with their submission status, soonest due first.
+        Returns one page and the cursor for the next one (None when this is the last page).
+        """
+        status = case(
+            (Submission.submission_id.is_(None), "not_submitted"),
+            (Submission.status == SubmissionStatus.APPROVED, "completed"),
+            (Submission.status == SubmissionStatus.REJECTED, "rejected"),
+            else_="pending_review"
+        ).label("status")
+        is_overdue = case(
+            (and_(
+                Assignment.due_date.isnot(None),
+                Assignment.due_date < datetime.now(),
+                Submission.submission_id.is_(None)
+            ), True),
+            else_=false()
+        ).label("is_overdue")
+
+        query = db.query(
+            Assignment.assignment_id,
+            Assignment.title,
+            Assignment.description,
+            Assignment.max_score,
+            Assignment.xp_reward,
+            Assignment.gold_reward,
+            Assignment.due_date,
+            status,
+            Quest.title.label("quest_title"),
+            World.title.label("world_title"),
+            is_overdue
+        ).join(
+            Quest, Quest.quest_id == Assignment.quest_id
+        ).join(
+            Zone, Zone.zone_id == Quest.zone_id
+        ).join(
+            World, World.world_id == Zone.world_id
+        ).outerjoin(
+            Submission, and_(
+                Submission.assignment_id == Assignment.assignment_id,
+                Submission.user_id == user.user_id
+            )
+        ).filter(
+            World.is_published == True,
+            class_allowed(World.required_class, user.avatar_class),
+            class_allowed(Assignment.required_class, user.avatar_class)
+        )
+
+        if cursor:
+            due_date, assignment_id = decode_cursor(cursor)
+            if due_date is None:
+                query = query.filter(Assignment.due_date.is_(None), Assignment.assignment_id > assignment_id)
+            else:
+                query = query.filter(or_(
+                    Assignment.due_date.is_(None),
+                    Assignment.due_date > due_date,
+                    and_(Assignment.due_date == due_date, Assignment.assignment_id > assignment_id)
+                ))
+
+        query = query.order_by(
+            Assignment.due_date.is_(None), Assignment.due_date, Assignment.assignment_id
+        )
+        if limit is not None:
+            query = query.limit(limit + 1)
+
+        rows = [dict(row._mapping) for row in query.all()]
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]["due_date"], rows[-1]["assignment_id"])
+        return rows, next_cursor
+
+    @staticmethod
+    def list_for_teacher(db: Session, teacher_id: int, world_id: Optional[int] = None, zone_id: Optional[int] = None,
+                         due_from: Optional[datetime] = None, due_to: Optional[datetime] = None,
+                         limit: int = 50, cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+        """
+        Assignments in the teacher's worlds, newest first, with their world path and submission counts.
+        Returns one page and the cursor for the next one (None when this is the last page).
+        """
+        page = select(
+            Assignment.assignment_id,
+            Assignment.quest_id,
+            Assignment.title,
+            Assignment.description,
+            Assignment.max_score,
+            Assignment.xp_reward,
+            Assignment.gold_reward,
+            Assignment.due_date,
+            Assignment.required_class,
+            Assignment.created_at,
+            Quest.title.label("quest_title"),
+            Zone.zone_id,
+            Zone.title.label("zone_title"),
+            World.world_id,
+            World.title.label("world_title")
+        ).join(
+            Quest, Quest.quest_id == Assignment.quest_id
+        ).join(
+            Zone, Zone.zone_id == Quest.zone_id
+        ).join(
+            World, World.world_id == Zone.world_id
+        ).where(World.teacher_id == teacher_id)
+
+        if world_id is not None:
+            page = page.where(World.world_id == world_id)
+        if zone_id is not None:
+            page = page.where(Zone.zone_id == zone_id)
+        if due_from is not None:
+            page = page.where(Assignment.due_date >= due_from)
+        if due_to is not None:
+            page = page.where(Assignment.due_date <= due_to)
+        if cursor:
+            created_at, assignment_id = decode_cursor(cursor)
+            if created_at is None:
+                page = page.where(Assignment.created_at.is_(None), Assignment.assignment_id < assignment_id)
+            else:
+                page = page.where(or_(
+                    Assignment.created_at.is_(None),
+                    Assignment.created_at < created_at,
+                    and_(Assignment.created_at == created_at, Assignment.assignment_id < assignment_id)
+                ))
+        page = page.order_by(
+            Assignment.created_at.is_(None), Assignment.created_at.desc(), Assignment.assignment_id.desc()
+        ).limit(limit + 1).cte("page")
+
+        # Submission counts for the page's assignments only
+        counts = select(
+            Submission.assignment_id,
+            func.count().filter(Submission.status == SubmissionStatus.PENDING).label("pending"),
+            func.count().filter(Submission.status == SubmissionStatus.APPROVED).label("approved"),
+            func.count().filter(Submission.status == SubmissionStatus.REJECTED).label("rejected")
+        ).where(
+            Submission.assignment_id.in_(select(page.c.assignment_id))
+        ).group_by(Submission.assignment_id).subquery("counts")
+
+        stmt = select(
+            page,
+            func.coalesce(counts.c.pending, 0).label("pending_submissions"),
+            func.coalesce(counts.c.approved, 0).label("approved_submissions"),
+            func.coalesce(counts.c.rejected, 0).label("rejected_submissions")
+        ).outerjoin(
+            counts, counts.c.assignment_id == page.c.assignment_id
+        ).order_by(
+            page.c.created_at.is_(None), page.c.created_at.desc(), page.c.assignment_id.desc()
+        )
+
+        rows = [dict(row._mapping) for row in db.execute(stmt)]
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["assignment_id"])
+        return rows, next_cursor
@@ -45,10 +45,19 @@ class AuthService:
         return encoded_jwt
     
     @staticmethod
-    def decode_token(token: str) -> TokenData:
-        """Decode and validate a JWT token."""
+    def decode_token(token: str, scope: Optional[str] = None) -> TokenData:
+        """
+        Decode and validate a JWT token.
+        Scoped tokens are only accepted where that scope is asked for, and the login token only where none is.
+        """
         try:
             payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
+            if payload.get("scope") != scope:
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="Invalid token",
+                    headers={"WWW-Authenticate": "Bearer"},
+                )
             user_id: int = int(payload.get("sub"))
             username: str = payload.get("username")
             role: str = payload.get("role", "user")
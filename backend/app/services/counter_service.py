@@ -0,0 +1,181 @@
+"""
+Counter Service - Atomic, server-side updates of user gold/XP/HP.
+
+Every change is a single `UPDATE users SET ... RETURNING` evaluated by the
+database against the current row, so concurrent requests for the same user
+(several tabs, bulk grading) cannot lose updates. Guards such as
+`gold >= :cost` are part of the WHERE clause; a failed guard updates nothing.
+"""
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import Integer, case, column, func, insert, select, update, values
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.config import get_settings
+from app.models.leaderboard import XPEvent
+from app.models.user import User
+
+settings = get_settings()
+
+# Flat XP per level; current_xp is the progress into the current level, so
+# level ups resolve in closed form: level += (xp + gain) // 100, xp = (xp + gain) % 100
+XP_PER_LEVEL = 100
+
+COUNTER_COLUMNS = ("level", "current_xp", "hp_current", "hp_max", "gold")
+
+
+class InsufficientGoldError(Exception):
+    """Raised when a guarded gold charge finds less gold than required."""
+
+
+def _level_up_values(c, xp) -> dict:
+    """Column values after adding xp (a number or SQL expression): level ups raise hp_max and fully heal."""
+    new_total_xp = c.current_xp + xp
+    levels_gained = new_total_xp // XP_PER_LEVEL
+    new_level = c.level + levels_gained
+    new_hp_max = case(
+        (levels_gained > 0, settings.base_hp + (new_level - 1) * settings.hp_per_level),
+        else_=c.hp_max
+    )
+    return dict(
+        level=new_level,
+        current_xp=new_total_xp % XP_PER_LEVEL,
+        hp_max=new_hp_max,
+        hp_current=case((levels_gained > 0, new_hp_max), else_=c.hp_current)
+    )
+
+
+class CounterService:
+    """Atomic counter updates on the users table."""
+
+    @staticmethod
+    def apply(
+        db: Session,
+        user: User,
+        xp: int = 0,
+        gold: int = 0,
+        damage: int = 0,
+        heal: int = 0,
+        full_heal: bool = False,
+        min_gold: Optional[int] = None,
+        require_missing_hp: bool = False
+    ) -> Optional[dict]:
+        """
+        Atomically add XP (resolving level ups), add/subtract gold, heal and apply damage.
+        Level ups raise hp_max and fully heal; healing is capped at hp_max and
+        damage is applied last, never dropping HP below 0.
+
+        Guards:
+        - min_gold: only apply if the user currently has at least this much gold
+        - require_missing_hp: only apply if the user is below max HP
+
+        Returns the new counter values (plus levels_gained), or None if a guard failed.
+        The loaded `user` object is refreshed in place without being marked dirty.
+        """
+        users = User.__table__
+        c = users.c
+
+        values = {}
+        new_hp_max = c.hp_max
+        new_hp_current = c.hp_current
+
+        if xp:
+            leveled = _level_up_values(c, xp)
+            new_hp_max = leveled["hp_max"]
+            new_hp_current = leveled["hp_current"]
+            values.update(level=leveled["level"], current_xp=leveled["current_xp"], hp_max=new_hp_max)
+
+        if full_heal:
+            new_hp_current = new_hp_max
+        if heal:
+            new_hp_current = func.least(new_hp_max, new_hp_current + heal)
+        if damage:
+            new_hp_current = func.greatest(0, new_hp_current - damage)
+        if xp or full_heal or heal or damage:
+            values["hp_current"] = new_hp_current
+
+        if gold:
+            values["gold"] = c.gold + gold
+
+        returning = [c[name] for name in COUNTER_COLUMNS]
+        stmt = update(users)
+        if xp:
+            # Join the locked pre-update row so RETURNING can report the old level
+            old = select(c.user_id, c.level.label("old_level")).where(
+                c.user_id == user.user_id
+            ).with_for_update().subquery("old")
+            stmt = stmt.where(c.user_id == old.c.user_id)
+            returning.append(old.c.old_level)
+        else:
+            stmt = stmt.where(c.user_id == user.user_id)
+
+        if min_gold is not None:
+            stmt = stmt.where(c.gold >= min_gold)
+        if require_missing_hp:
+            stmt = stmt.where(c.hp_current < c.hp_max)
+
+        stmt = stmt.values(**values).returning(*returning)
+
+        row = db.execute(stmt).first()
+        if row is None:
+            return None
+
+        result = dict(zip(COUNTER_COLUMNS, row))
+        result["levels_gained"] = result["level"] - row[-1] if xp else 0
+
+        # Keep the in-session object consistent without scheduling another UPDATE
+        for name in COUNTER_COLUMNS:
+            set_committed_value(user, name, result[name])
+
+        if xp > 0 or gold > 0:
+            # Earnings feed the weekly / monthly / season leaderboards via the rollup job
+            db.execute(insert(XPEvent).values(
+                user_id=user.user_id, xp_amount=max(xp, 0), gold_amount=max(gold, 0)
+            ))
+
+        if xp > 0 or gold:
+            from app.services.leaderboard_service import stage_user_change  # Local import to avoid circular dep
+            stage_user_change(db, user.user_id, xp=max(xp, 0))
+
+        return result
+
+    @staticmethod
+    def apply_many(db: Session, rewards: Dict[int, Tuple[int, int]]) -> Dict[int, Tuple[int, int]]:
+        """
+        Add XP and gold to many users in one UPDATE ... FROM (VALUES ...), keyed by user_id -> (xp, gold).
+        Amounts must be non-negative. Records the XP events and stages leaderboard changes; does not commit.
+        Returns user_id -> (old gold, new gold) for every user updated, for achievement evaluation.
+        Loaded User objects are not refreshed.
+        """
+        rewards = {user_id: (xp, gold) for user_id, (xp, gold) in rewards.items() if xp > 0 or gold > 0}
+        if not rewards:
+            return {}
+
+        users = User.__table__
+        c = users.c
+        batch = values(
+            column("user_id", Integer), column("xp", Integer), column("gold", Integer),
+            name="rewards"
+        ).data([(user_id, xp, gold) for user_id, (xp, gold) in rewards.items()])
+
+        updated = db.execute(
+            update(users).where(
+                c.user_id == batch.c.user_id
+            ).values(
+                gold=c.gold + batch.c.gold,
+                **_level_up_values(c, batch.c.xp)
+            ).returning(c.user_id, c.gold)
+        ).all()
+
+        # Earnings feed the weekly / monthly / season leaderboards via the rollup job
+        db.execute(insert(XPEvent), [
+            {"user_id": user_id, "xp_amount": xp, "gold_amount": gold}
+            for user_id, (xp, gold) in rewards.items()
+        ])
+
+        from app.services.leaderboard_service import stage_user_change  # Local import to avoid circular dep
+        for user_id, (xp, _) in rewards.items():
+            stage_user_change(db, user_id, xp=xp)
+
+        return {user_id: (gold - rewards[user_id][1], gold) for user_id, gold in updated}
@@ -0,0 +1,251 @@
+"""
+Dashboard Service - Set-based data provider for the engagement dashboard.
+
+Every section of the dashboard is fetched with a fixed number of queries,
+independent of how many daily quests, worlds or activities exist. Reads
+never write: streak and weekly-goal state is derived from stored rows.
+"""
+from datetime import date
+from typing import List, Optional, Tuple
+
+from sqlalchemy import and_, func
+from sqlalchemy.orm import Session, aliased
+
+from app.models.user import User
+from app.models.world import World
+from app.models.zone import Zone
+from app.models.quest import Quest
+from app.models.progress import UserProgress
+from app.models.engagement import DailyQuest, UserDailyQuest, UserActivity, UserStreak, WeeklyGoal
+from app.schemas.engagement import (
+    DailyQuestResponse, StreakResponse, ActivityResponse, WeeklyGoalResponse,
+    SkillProgress, ContinueJourneyResponse, DashboardEngagementResponse
+)
+from app.services.game_service import GameService, DEFAULT_WEEKLY_GOAL
+from app.utils.cache import dashboard_cache, dashboard_cache_key
+
+
+def get_world_color(title: str) -> str:
+    """Get theme color for a world."""
+    lower = title.lower()
+    if 'python' in lower: return '#10b981'
+    if 'sql' in lower: return '#3b82f6'
+    if 'git' in lower: return '#8b5cf6'
+    if 'javascript' in lower or 'js' in lower: return '#f59e0b'
+    if 'c++' in lower: return '#3178c6'
+    if 'java' in lower: return '#f89820'
+    if 'ai' in lower: return '#ef4444'
+    return '#8b5cf6'
+
+
+def _percent(value: int, target: int) -> float:
+    return min(100, (value / target) * 100) if target > 0 else 0
+
+
+class DashboardService:
+    """Builds the dashboard payload with one query per section."""
+
+    @staticmethod
+    def get_daily_quests(db: Session, user_id: int, today: date) -> List[DailyQuestResponse]:
+        """Active daily quests joined with today's progress for the user (empty when none are active)."""
+        rows = db.query(DailyQuest, UserDailyQuest).outerjoin(
+            UserDailyQuest,
+            and_(
+                UserDailyQuest.daily_quest_id == DailyQuest.quest_id,
+                UserDailyQuest.user_id == user_id,
+                UserDailyQuest.date == today
+            )
+        ).filter(
+            DailyQuest.is_active == True
+        ).order_by(DailyQuest.quest_id).limit(3).all()
+
+        return [
+            DailyQuestResponse(
+                quest_id=dq.quest_id,
+                title=dq.title,
+                description=dq.description,
+                quest_type=dq.quest_type,
+                target_value=dq.target_value,
+                xp_reward=dq.xp_reward,
+                gold_reward=dq.gold_reward,
+                icon=dq.icon,
+                current_progress=udq.current_progress if udq else 0,
+                is_completed=udq.is_completed if udq else False
+            ) for dq, udq in rows
+        ]
+
+    @staticmethod
+    def get_streak_and_weekly_goals(db: Session, user_id: int, today: date) -> Tuple[StreakResponse, WeeklyGoalResponse]:
+        """
+        Read streak and this week's goal in one query, without creating or updating rows.
+        Missing rows are reported as an empty streak / untouched weekly goal.
+        """
+        streak, weekly = db.query(UserStreak, WeeklyGoal).select_from(User).outerjoin(
+            UserStreak, UserStreak.user_id == User.user_id
+        ).outerjoin(
+            WeeklyGoal,
+            and_(
+                WeeklyGoal.user_id == User.user_id,
+                WeeklyGoal.week_start == GameService.get_week_start(today)
+            )
+        ).filter(User.user_id == user_id).one()
+
+        current_streak, is_active_today = GameService.get_streak_state(streak, today)
+        streak_response = StreakResponse(
+            current_streak=current_streak,
+            longest_streak=streak.longest_streak if streak else 0,
+            last_activity_date=streak.last_activity_date if streak else None,
+            is_active_today=is_active_today
+        )
+
+        if weekly:
+            targets = (weekly.xp_target, weekly.quests_target, weekly.battles_target)
+            earned = (weekly.xp_earned, weekly.quests_completed, weekly.battles_won)
+        else:
+            targets = (DEFAULT_WEEKLY_GOAL["xp_target"], DEFAULT_WEEKLY_GOAL["quests_target"], DEFAULT_WEEKLY_GOAL["battles_target"])
+            earned = (0, 0, 0)
+
+        weekly_response = WeeklyGoalResponse(
+            xp_target=targets[0],
+            xp_earned=earned[0],
+            xp_percent=_percent(earned[0], targets[0]),
+            quests_target=targets[1],
+            quests_completed=earned[1],
+            quests_percent=_percent(earned[1], targets[1]),
+            battles_target=targets[2],
+            battles_won=earned[2],
+            battles_percent=_percent(earned[2], targets[2])
+        )
+
+        return streak_response, weekly_response
+
+    @staticmethod
+    def get_recent_activity(db: Session, user_id: int, limit: int = 5) -> List[ActivityResponse]:
+        activities = db.query(UserActivity).filter(
+            UserActivity.user_id == user_id
+        ).order_by(UserActivity.created_at.desc()).limit(limit).all()
+
+        return [
+            ActivityResponse(
+                id=a.id,
+                activity_type=a.activity_type,
+                title=a.title,
+                description=a.description,
+                xp_earned=a.xp_earned,
+                gold_earned=a.gold_earned,
+                created_at=a.created_at
+            ) for a in activities
+        ]
+
+    @staticmethod
+    def get_skills(db: Session, user_id: int) -> List[SkillProgress]:
+        """Total and completed quest counts for every published world, grouped in one query."""
+        rows = db.query(
+            World.world_id,
+            World.title,
+            func.count(Quest.quest_id).label("total_quests"),
+            func.count(UserProgress.progress_id).label("completed_quests")
+        ).outerjoin(
+            Zone, Zone.world_id == World.world_id
+        ).outerjoin(
+            Quest, Quest.zone_id == Zone.zone_id
+        ).outerjoin(
+            UserProgress,
+            and_(
+                UserProgress.quest_id == Quest.quest_id,
+                UserProgress.user_id == user_id,
+                UserProgress.is_completed == True
+            )
+        ).filter(
+            World.is_published == True
+        ).group_by(World.world_id, World.title).order_by(World.world_id).all()
+
+        return [
+            SkillProgress(
+                world_id=world_id,
+                world_title=title,
+                total_quests=total,
+                completed_quests=completed,
+                percent=round((completed / total) * 100, 1) if total > 0 else 0,
+                color=get_world_color(title)
+            ) for world_id, title, total, completed in rows
+        ]
+
+    @staticmethod
+    def get_continue_quest(db: Session, user_id: int) -> Optional[ContinueJourneyResponse]:
+        """Next quest after the most recently touched one, in the same zone."""
+        last_quest_id = db.query(UserProgress.quest_id).filter(
+            UserProgress.user_id == user_id
+        ).order_by(UserProgress.updated_at.desc()).limit(1).scalar_subquery()
+
+        current = aliased(Quest)
+
+        row = db.query(
+            Quest.quest_id,
+            Quest.title,
+            Zone.zone_id,
+            Zone.title,
+            World.world_id,
+            World.title
+        ).select_from(Quest).join(
+            current,
+            and_(
+                current.quest_id == last_quest_id,
+                current.zone_id == Quest.zone_id
+            )
+        ).join(
+            Zone, Zone.zone_id == Quest.zone_id
+        ).join(
+            World, World.world_id == Zone.world_id
+        ).filter(
+            Quest.order_index > current.order_index
+        ).order_by(Quest.order_index).first()
+
+        if not row:
+            return None
+
+        quest_id, quest_title, zone_id, zone_title, world_id, world_title = row
+        return ContinueJourneyResponse(
+            quest_id=quest_id,
+            quest_title=quest_title,
+            zone_title=zone_title,
+            world_title=world_title,
+            world_id=world_id,
+            zone_id=zone_id
+        )
+
+    @staticmethod
+    def build_snapshot(db: Session, user_id: int, today: date) -> dict:
+        """Load every DB-backed dashboard section for a user."""
+        streak, weekly_goals = DashboardService.get_streak_and_weekly_goals(db, user_id, today)
+        return {
+            "daily_quests": DashboardService.get_daily_quests(db, user_id, today),
+            "streak": streak,
+            "recent_activity": DashboardService.get_recent_activity(db, user_id),
+            "weekly_goals": weekly_goals,
+            "skills": DashboardService.get_skills(db, user_id),
+            "continue_quest": DashboardService.get_continue_quest(db, user_id),
+        }
+
+    @staticmethod
+    def get_dashboard(db: Session, user: User, use_cache: bool = True) -> DashboardEngagementResponse:
+        """
+        Assemble all dashboard sections for a user.
+        DB-backed sections are served from the per-user snapshot cache; HP comes
+        from the already-loaded user so heals and damage show up immediately.
+        """
+        today = date.today()
+        key = dashboard_cache_key(user.user_id, today)
+
+        snapshot = dashboard_cache.get(key) if use_cache else None
+        if snapshot is None:
+            snapshot = DashboardService.build_snapshot(db, user.user_id, today)
+            dashboard_cache.set(key, snapshot)
+
+        hp_percent = (user.hp_current / user.hp_max) * 100 if user.hp_max > 0 else 100
+
+        return DashboardEngagementResponse(
+            **snapshot,
+            battle_ready=hp_percent >= 50,
+            hp_percent=hp_percent
+        )
@@ -1,6 +1,8 @@
 from typing import Optional, Tuple
+from sqlalchemy import case, func
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
-from datetime import datetime
+from datetime import datetime, date, timedelta
 
 from app.config import get_settings
 from app.models.user import User
@@ -9,11 +11,17 @@ from app.models.monster import Monster
 from app.models.quiz_question import QuizQuestion
 from app.models.progress import UserProgress
 from app.models.item import Item, UserInventory
-from app.models.achievement import Achievement, UserAchievement
 from app.models.leaderboard import LeaderboardEntry
+from app.models.engagement import ActivityType
+from app.services.achievement_service import AchievementService
+from app.services.counter_service import CounterService, InsufficientGoldError
+from app.utils.cache import invalidate_dashboard
 
 settings = get_settings()
 
+# Targets for a freshly started week
+DEFAULT_WEEKLY_GOAL = dict(xp_target=500, quests_target=10, battles_target=3)
+
 
 class GameService:
     """Service for game logic operations."""
@@ -27,50 +35,34 @@ class GameService:
     @staticmethod
     def award_xp(db: Session, user: User, xp_amount: int) -> Tuple[int, bool]:
         """
-        Award XP to a user and handle level ups.
-        Logic: Flat 100 XP per level.
-        When XP >= 100, Level Up and reset XP (carrying over overflow).
+        Award XP to a user and handle level ups (flat 100 XP per level, overflow carries over).
         Returns (new_xp_total, leveled_up).
         """
-        user.current_xp += xp_amount
-        leveled_up = False
-        
-        # Check for level up
-        # Using a while loop to handle multiple level ups at once if massive XP is granted
-        XP_THRESHOLD = 100
-        
-        while user.current_xp >= XP_THRESHOLD:
-            user.level += 1
-            user.current_xp -= XP_THRESHOLD # Carry over overflow (e.g. 110 -> 10)
-            leveled_up = True
-            
-            # Heal and Increase Stats on Level Up
-            user.hp_max = GameService.calculate_max_hp(user.level)
-            user.hp_current = user.hp_max
-        
+        counters = CounterService.apply(db, user, xp=xp_amount)
         db.commit()
-        return user.current_xp, leveled_up
+        return counters["current_xp"], counters["levels_gained"] > 0
     
     @staticmethod
     def award_gold(db: Session, user: User, gold_amount: int) -> int:
-        """Award gold to a user. Returns new gold total."""
-        user.gold += gold_amount
+        """Award gold to a user (and any gold achievements it unlocks). Returns new gold total."""
+        counters = CounterService.apply(db, user, gold=gold_amount)
+        AchievementService.evaluate(db, user, {"gold": (counters["gold"] - gold_amount, counters["gold"])})
         db.commit()
         return user.gold
     
     @staticmethod
     def deal_damage(db: Session, user: User, damage: int) -> int:
         """Deal damage to a user. Returns remaining HP."""
-        user.hp_current = max(0, user.hp_current - damage)
+        counters = CounterService.apply(db, user, damage=damage)
         db.commit()
-        return user.hp_current
+        return counters["hp_current"]
     
     @staticmethod
     def heal_user(db: Session, user: User, heal_amount: int) -> int:
         """Heal a user. Returns new HP."""
-        user.hp_current = min(user.hp_max, user.hp_current + heal_amount)
+        counters = CounterService.apply(db, user, heal=heal_amount)
         db.commit()
-        return user.hp_current
+        return counters["hp_current"]
     
     @staticmethod
     def complete_quest(db: Session, user: User, quest: Quest, score: int = 100) -> dict:
@@ -86,6 +78,7 @@ class GameService:
         ).first()
         
         first_completion = False
+        previous_score = progress.score if progress else None
         
         if not progress:
             # First attempt
@@ -109,10 +102,7 @@ class GameService:
             if score > progress.score:
                 progress.score = score
         
-        # Award rewards only on first completion
-        xp_earned = 0
-        gold_earned = 0
-        leveled_up = False
+        from app.services.reward_pipeline import RewardPipeline  # Local import to avoid circular dep
         
         # Award rewards on every completion (per user request: "Every lesson gives 50 XP")
         # Previously restricted to first_completion, but now allowing repeats.
@@ -121,19 +111,22 @@ class GameService:
         xp_earned = 50
         gold_earned = 10
         
-        # Always award XP/Gold
-        if xp_earned > 0:
-            _, leveled_up_status = GameService.award_xp(db, user, xp_earned)
-            if leveled_up_status:
-                leveled_up = True
-            
-        GameService.award_gold(db, user, gold_earned)
+        # Achievement counters only move when this completion changes the progress row
+        first_perfect = progress.score == 100 and (previous_score or 0) < 100
         
-        # Update Weekly Progress (XP + Quest Count)
+        # Stage XP/Gold, activity (streak + weekly XP/quest count) and achievement counters,
+        # then apply them together with the progress row in one commit.
         # Note: We increment quest count even on repeat to track "activity"
-        GameService.update_weekly_progress(db, user.user_id, xp_added=xp_earned, activity_type="quest_complete")
+        rewards = RewardPipeline(db, user).add_xp(xp_earned).add_gold(gold_earned).log_activity(
+            ActivityType.QUEST_COMPLETE,
+            title=f"Completed {quest.title}",
+            xp=xp_earned, gold=gold_earned, ref_id=quest.quest_id
+        ).count_stats(
+            quests_completed=int(first_completion),
+            perfect_scores=int(first_perfect)
+        ).commit()
         
-        db.commit()
+        leveled_up = rewards["leveled_up"]
         
         return {
             "quest_id": quest.quest_id,
@@ -141,10 +134,11 @@ class GameService:
             "xp_earned": xp_earned,
             "gold_earned": gold_earned,
             "leveled_up": leveled_up,
-            "new_level": user.level,
-            "total_xp": user.current_xp,
-            "total_gold": user.gold,
-            "event": "LEVEL_UP" if leveled_up else None
+            "new_level": rewards["new_level"],
+            "total_xp": rewards["total_xp"],
+            "total_gold": rewards["total_gold"],
+            "event": "LEVEL_UP" if leveled_up else None,
+            "new_achievements": [a.name for a in rewards["new_achievements"]]
         }
     
     @staticmethod
@@ -157,7 +151,10 @@ class GameService:
         """
         Process a battle answer using DB questions.
         Tracks monster health via UserProgress.score (0-100% defeated).
+        All gold, HP and reward changes are committed together at the end.
         """
+        from app.services.reward_pipeline import RewardPipeline  # Local import to avoid circular dep
+        
         # Load Question
         question = db.query(QuizQuestion).filter(QuizQuestion.question_id == question_id).first()
         if not question:
@@ -179,8 +176,8 @@ class GameService:
         monster_defeated = False
         xp_earned = 0
         gold_earned = 0
-        leveled_up = False
         message = ""
+        pipeline = RewardPipeline(db, user)
 
         if not progress:
             # CHECK ENTRY COST (Only on first attempt/entry)
@@ -197,7 +194,7 @@ class GameService:
             # but since progress tracks the session, we check it here).
             # Note: User didn't specify WHEN to deduct, but "Checks if user has enough to enter" implies cost.
             if monster.entry_cost > 0:
-                user.gold -= monster.entry_cost
+                pipeline.charge_gold(monster.entry_cost)
                 
             progress = UserProgress(
                 user_id=user.user_id,
@@ -239,14 +236,17 @@ class GameService:
                 battle_gold = monster.pass_reward
                 
                 if quest_xp > 0:
-                    _, leveled_up_status = GameService.award_xp(db, user, quest_xp)
-                    if leveled_up_status:
-                        leveled_up = True
+                    pipeline.add_xp(quest_xp)
                 if battle_gold > 0:
-                    GameService.award_gold(db, user, battle_gold)
+                    pipeline.add_gold(battle_gold)
                 
-                # Update Weekly Progress (XP + Battle Count)
-                GameService.update_weekly_progress(db, user.user_id, xp_added=quest_xp, activity_type="battle_won")
+                # Log activity (updates streak + weekly XP/battle count)
+                pipeline.log_activity(
+                    ActivityType.BATTLE_WON,
+                    title=f"Defeated {monster.name}",
+                    xp=quest_xp, gold=battle_gold, ref_id=quest.quest_id
+                )
+                pipeline.count_stats(quests_completed=1, perfect_scores=1)
                 
                 xp_earned = quest_xp
                 gold_earned = battle_gold
@@ -255,12 +255,24 @@ class GameService:
             # Monster hits Player
             # FAIL PENALTY
             damage_received = monster.fail_penalty # Use new fail_penalty field
-            GameService.deal_damage(db, user, damage_received)
+            pipeline.deal_damage(damage_received)
             
             error_status = "Glitched" # As requested
             message = f"Wrong! {monster.name} hits you for {damage_received} HP! Status: {error_status}"
 
-        db.commit()
+        try:
+            rewards = pipeline.commit()
+        except InsufficientGoldError:
+            # Gold was spent elsewhere between the check above and the charge
+            return {
+                "is_correct": False,
+                "monster_defeated": False,
+                "player_hp": user.hp_current,
+                "monster_hp_pct": 100,
+                "message": f"Not enough gold to enter! Need {monster.entry_cost} coins.",
+                "error": True
+            }
+        leveled_up = rewards["leveled_up"]
 
         return {
             "is_correct": is_correct,
@@ -274,7 +286,8 @@ class GameService:
             "player_hp": user.hp_current,
             "monster_hp_pct": 100 - (progress.score or 0),
             "message": message,
-            "status": "Glitched" if not is_correct else "Normal"
+            "status": "Glitched" if not is_correct else "Normal",
+            "new_achievements": [a.name for a in rewards["new_achievements"]]
         }
     
     @staticmethod
@@ -285,38 +298,39 @@ class GameService:
         """
         total_cost = item.price * quantity
         
-        if user.gold < total_cost:
+        # Deduct gold only if the user still has enough at update time
+        counters = CounterService.apply(db, user, gold=-total_cost, min_gold=total_cost)
+        if counters is None:
             return {
                 "success": False,
                 "message": f"Not enough gold! Need {total_cost}, have {user.gold}"
             }
         
-        # Deduct gold
-        user.gold -= total_cost
-        
-        # Add to inventory
-        inventory = db.query(UserInventory).filter(
-            UserInventory.user_id == user.user_id,
-            UserInventory.item_id == item.item_id
-        ).first()
+        # Add to inventory (INSERT ... ON CONFLICT on the user/item pair)
+        stmt = insert(UserInventory).values(
+            user_id=user.user_id,
+            item_id=item.item_id,
+            quantity=quantity,
+            is_equipped=False
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[UserInventory.user_id, UserInventory.item_id],
+            set_={"quantity": UserInventory.quantity + stmt.excluded.quantity}
+        ).returning(UserInventory.quantity)
+        new_quantity = db.execute(stmt).scalar()
         
-        if inventory:
-            inventory.quantity += quantity
-        else:
-            inventory = UserInventory(
-                user_id=user.user_id,
-                item_id=item.item_id,
-                quantity=quantity,
-                is_equipped=False
-            )
-            db.add(inventory)
+        # A fresh inventory row is one more item owned
+        if new_quantity == quantity:
+            changes = AchievementService.record(db, user.user_id, items_owned=1)
+            AchievementService.evaluate(db, user, changes)
         
         db.commit()
+        invalidate_dashboard(user.user_id)
         
         return {
             "success": True,
             "message": f"Purchased {quantity}x {item.name} for {total_cost} gold",
-            "gold_remaining": user.gold
+            "gold_remaining": counters["gold"]
         }
     
     @staticmethod
@@ -345,150 +359,129 @@ class GameService:
         }
     
     @staticmethod
-    def check_and_award_achievements(db: Session, user: User) -> list:
+    def check_and_award_achievements(db: Session, user: User, commit: bool = True) -> list:
         """
-        Check if user qualifies for any new achievements and award them.
+        Award every achievement the user's counters currently qualify for.
+        Game events award incrementally through the reward pipeline; this is the full re-check.
+        Pass commit=False to leave the unlocks in the caller's transaction.
         Returns list of newly unlocked achievements.
         """
-        # Get all achievements user doesn't have
-        user_achievement_ids = [ua.achievement_id for ua in user.achievements]
-        available_achievements = db.query(Achievement).filter(
-            ~Achievement.achievement_id.in_(user_achievement_ids) if user_achievement_ids else True
-        ).all()
-        
-        # Count user stats
-        quests_completed = db.query(UserProgress).filter(
-            UserProgress.user_id == user.user_id,
-            UserProgress.is_completed == True
-        ).count()
-        
-        newly_unlocked = []
-        
-        for achievement in available_achievements:
-            qualified = False
-            
-            # Check quest achievements
-            if str(achievement.achievement_type.value).upper() == "QUEST":
-                if quests_completed >= achievement.requirement_value:
-                    qualified = True
-            
-            # Add more achievement type checks as needed
-            
-            if qualified:
-                user_achievement = UserAchievement(
-                    user_id=user.user_id,
-                    achievement_id=achievement.achievement_id
-                )
-                db.add(user_achievement)
-                
-                # Award achievement rewards
-                if achievement.xp_reward > 0:
-                    user.current_xp += achievement.xp_reward
-                if achievement.gold_reward > 0:
-                    user.gold += achievement.gold_reward
-                if achievement.title_reward:
-                    user.title = achievement.title_reward
-                
-                newly_unlocked.append(achievement)
+        newly_unlocked = AchievementService.sync_user(db, user)
         
-        if newly_unlocked:
+        if newly_unlocked and commit:
             db.commit()
+            invalidate_dashboard(user.user_id)
         
         return newly_unlocked
 
     # ============ ENGAGEMENT TRACKING ============
-    
+    #
+    # Streak and weekly-goal rows are only written here, by the activity
+    # logging path, using single-statement upserts. Readers load both rows
+    # in one query (DashboardService.get_streak_and_weekly_goals), derive the
+    # streak with get_streak_state, fall back to DEFAULT_WEEKLY_GOAL for a
+    # week with no row yet, and never commit.
+
     @staticmethod
-    def get_or_create_streak(db: Session, user_id: int):
-        """Get or create user streak record."""
-        from app.models.engagement import UserStreak  # Local import to avoid circular dep
-        streak = db.query(UserStreak).filter(UserStreak.user_id == user_id).first()
-        if not streak:
-            streak = UserStreak(user_id=user_id, current_streak=0, longest_streak=0)
-            db.add(streak)
-            db.commit()
-            db.refresh(streak)
-        return streak
+    def get_week_start(today: date = None) -> date:
+        """Monday of the week containing today."""
+        today = today or date.today()
+        return today - timedelta(days=today.weekday())
 
     @staticmethod
-    def update_streak(db: Session, user_id: int):
-        """Update user's streak based on activity."""
-        from datetime import date, timedelta
-        streak = GameService.get_or_create_streak(db, user_id)
-        today = date.today()
-        
+    def get_streak_state(streak, today: date = None) -> Tuple[int, bool]:
+        """
+        Derive (current_streak, is_active_today) from a stored streak row without writing.
+        A streak survives until the end of the day after the last activity.
+        """
+        today = today or date.today()
+        if streak is None or streak.last_activity_date is None:
+            return 0, False
         if streak.last_activity_date == today:
-            return streak
-        
-        # If last activity was yesterday, increment
+            return streak.current_streak, True
         if streak.last_activity_date == today - timedelta(days=1):
-            streak.current_streak += 1
-        else:
-            # Streak broken or new
-            streak.current_streak = 1
-            streak.streak_start_date = today
-            
-        if streak.current_streak > streak.longest_streak:
-            streak.longest_streak = streak.current_streak
-        
-        streak.last_activity_date = today
-        db.commit()
-        db.refresh(streak)
-        return streak
+            return streak.current_streak, False
+        return 0, False
 
     @staticmethod
-    def get_or_create_weekly_goal(db: Session, user_id: int):
-        """Get or create weekly goal for current week."""
-        from app.models.engagement import WeeklyGoal
-        from datetime import date, timedelta
-        import datetime as dt_module
-        
+    def update_streak(db: Session, user_id: int):
+        """Record today's activity in the user's streak (INSERT ... ON CONFLICT)."""
+        from app.models.engagement import UserStreak
         today = date.today()
-        week_start = today - timedelta(days=today.weekday())
-        
-        goal = db.query(WeeklyGoal).filter(
-            WeeklyGoal.user_id == user_id,
-            WeeklyGoal.week_start == week_start
-        ).first()
-        
-        if not goal:
-            goal = WeeklyGoal(
-                user_id=user_id,
-                week_start=week_start,
-                xp_target=500,
-                quests_target=10,
-                battles_target=3
-            )
-            db.add(goal)
-            db.commit()
-            db.refresh(goal)
-        
-        return goal
+        yesterday = today - timedelta(days=1)
+
+        # In the DO UPDATE clause, UserStreak columns refer to the existing row
+        continued_streak = case(
+            (UserStreak.last_activity_date == today, UserStreak.current_streak),
+            (UserStreak.last_activity_date == yesterday, UserStreak.current_streak + 1),
+            else_=1
+        )
+
+        stmt = insert(UserStreak).values(
+            user_id=user_id,
+            current_streak=1,
+            longest_streak=1,
+            last_activity_date=today,
+            streak_start_date=today
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[UserStreak.user_id],
+            set_={
+                "current_streak": continued_streak,
+                "longest_streak": func.greatest(func.coalesce(UserStreak.longest_streak, 0), continued_streak),
+                "streak_start_date": case(
+                    (UserStreak.last_activity_date >= yesterday, func.coalesce(UserStreak.streak_start_date, today)),
+                    else_=today
+                ),
+                "last_activity_date": today,
+            }
+        )
+        db.execute(stmt)
 
     @staticmethod
     def update_weekly_progress(db: Session, user_id: int, xp_added: int = 0, activity_type = None):
-        """Update weekly goal progress."""
-        from app.models.engagement import ActivityType
-        goal = GameService.get_or_create_weekly_goal(db, user_id)
-        
-        if xp_added > 0:
-            goal.xp_earned += xp_added
-        
+        """Add progress to the current week's goal (INSERT ... ON CONFLICT)."""
+        from app.models.engagement import WeeklyGoal, ActivityType
+
+        quests_added = 0
+        battles_added = 0
         if activity_type:
             # Handle string or Enum safely
             act_val = str(activity_type.value if hasattr(activity_type, 'value') else activity_type)
-            
-            # Use ActivityType enum values or direct string match
-            if act_val == "quest_complete" or act_val == ActivityType.QUEST_COMPLETE:
-                goal.quests_completed += 1
-            elif act_val == "battle_won" or act_val == ActivityType.BATTLE_WON:
-                goal.battles_won += 1
-        
-        db.commit()
+
+            if act_val == ActivityType.QUEST_COMPLETE.value:
+                quests_added = 1
+            elif act_val == ActivityType.BATTLE_WON.value:
+                battles_added = 1
+
+        stmt = insert(WeeklyGoal).values(
+            user_id=user_id,
+            week_start=GameService.get_week_start(),
+            xp_earned=max(xp_added or 0, 0),
+            quests_completed=quests_added,
+            battles_won=battles_added,
+            **DEFAULT_WEEKLY_GOAL
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[WeeklyGoal.user_id, WeeklyGoal.week_start],
+            set_={
+                "xp_earned": WeeklyGoal.xp_earned + stmt.excluded.xp_earned,
+                "quests_completed": WeeklyGoal.quests_completed + stmt.excluded.quests_completed,
+                "battles_won": WeeklyGoal.battles_won + stmt.excluded.battles_won,
+            }
+        )
+        db.execute(stmt)
 
     @staticmethod
     def log_activity(db: Session, user_id: int, activity_type, title: str, description: str = None, xp: int = 0, gold: int = 0, ref_id: int = None):
-        """Log a user activity and update trackers."""
+        """Log a user activity, update trackers and commit."""
+        GameService.record_activity(db, user_id, activity_type, title, description, xp, gold, ref_id)
+        db.commit()
+        invalidate_dashboard(user_id)
+
+    @staticmethod
+    def record_activity(db: Session, user_id: int, activity_type, title: str, description: str = None, xp: int = 0, gold: int = 0, ref_id: int = None):
+        """Add an activity record and update streak/weekly trackers without committing."""
         from app.models.engagement import UserActivity
         
         # Create Activity Record
@@ -506,6 +499,3 @@ class GameService:
         # Update Trackers
         GameService.update_streak(db, user_id)
         GameService.update_weekly_progress(db, user_id, xp, activity_type)
-        
-        db.commit()
-
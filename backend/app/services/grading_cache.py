@@ -0,0 +1,159 @@
+"""
+Grading Cache - Reuse AI verdicts for identical submissions.
+
+A verdict is keyed by sha256 over the assignment (id, title and description,
+so editing the assignment starts afresh), the normalized submission text,
+the submission URL and the grading model. Verdicts live in the
+grading_cache table for grading_cache_ttl_days, with an in-process LRU in
+front; a background job deletes expired rows and trims the table to
+grading_cache_max_rows, least recently hit first.
+
+Only final verdicts (approved / rejected) are cached, never the "pending"
+fallback returned when the provider fails.
+"""
+import hashlib
+import json
+import unicodedata
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.models.ai_grading import GradingCacheEntry
+from app.utils.background import PeriodicTask
+from app.utils.cache import LRUCacheBackend, SnapshotCache
+
+settings = get_settings()
+
+# Verdicts worth reusing
+CACHEABLE_VERDICTS = {"approved", "rejected"}
+
+# Rows deleted per statement by the prune job, and how often it runs
+PRUNE_BATCH_SIZE = 5000
+PRUNE_INTERVAL_SECONDS = 3600
+
+# Verdicts by cache key, in front of the table
+verdict_cache = SnapshotCache(
+    "ai_grading",
+    LRUCacheBackend(settings.grading_cache_memory_entries),
+    settings.grading_cache_memory_ttl_seconds
+)
+
+
+def normalize_submission(text: Optional[str]) -> str:
+    """Canonical form of submission text: NFC, LF line endings, no trailing whitespace or edge blank lines."""
+    text = unicodedata.normalize("NFC", text or "").replace("\r\n", "\n").replace("\r", "\n")
+    return "\n".join(line.rstrip() for line in text.split("\n")).strip()
+
+
+def grading_cache_key(assignment_id: int, assignment_title: str, assignment_description: Optional[str],
+                      submission_text: Optional[str], submission_url: Optional[str], model: str) -> str:
+    payload = json.dumps([
+        assignment_id,
+        assignment_title,
+        assignment_description or "",
+        normalize_submission(submission_text),
+        (submission_url or "").strip(),
+        model
+    ], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class GradingCache:
+    """Lookup and storage of cached AI verdicts."""
+
+    @staticmethod
+    def lookup(db: Session, cache_key: str) -> Optional[dict]:
+        """A cached, unexpired verdict ({score, feedback, status}) or None."""
+        grading = verdict_cache.get(cache_key)
+        if grading is not None:
+            return grading
+
+        entry = db.query(GradingCacheEntry).filter(
+            GradingCacheEntry.cache_key == cache_key,
+            GradingCacheEntry.expires_at > datetime.utcnow()
+        ).first()
+        if not entry:
+            return None
+
+        grading = {"score": entry.score, "feedback": entry.feedback, "status": entry.status_verdict}
+        verdict_cache.set(cache_key, grading)
+        return grading
+
+    @staticmethod
+    def record_hit(db: Session, cache_key: str) -> None:
+        """Count a reuse of a cached verdict. Does not commit."""
+        db.query(GradingCacheEntry).filter(
+            GradingCacheEntry.cache_key == cache_key
+        ).update({
+            GradingCacheEntry.hits: GradingCacheEntry.hits + 1,
+            GradingCacheEntry.last_hit_at: datetime.utcnow()
+        }, synchronize_session=False)
+
+    @staticmethod
+    def store(db: Session, cache_key: str, assignment_id: int, grading: dict) -> bool:
+        """Stage a verdict for the cache if it is final. Does not commit. Returns whether it was cacheable."""
+        if grading.get("status") not in CACHEABLE_VERDICTS:
+            return False
+
+        now = datetime.utcnow()
+        values = dict(
+            score=grading.get("score", 0),
+            feedback=grading.get("feedback"),
+            status_verdict=grading["status"],
+            model=settings.ai_model,
+            expires_at=now + timedelta(days=settings.grading_cache_ttl_days)
+        )
+        stmt = insert(GradingCacheEntry).values(
+            cache_key=cache_key, assignment_id=assignment_id, created_at=now, last_hit_at=now, **values
+        )
+        db.execute(stmt.on_conflict_do_update(index_elements=[GradingCacheEntry.cache_key], set_=values))
+        verdict_cache.set(cache_key, {k: grading.get(k) for k in ("score", "feedback", "status")})
+        return True
+
+    @staticmethod
+    def prune(db: Session) -> dict:
+        """Delete expired rows, then the least recently hit rows beyond grading_cache_max_rows, in batches."""
+        expired = trimmed = 0
+        while True:
+            batch = select(GradingCacheEntry.cache_key).where(
+                GradingCacheEntry.expires_at <= datetime.utcnow()
+            ).limit(PRUNE_BATCH_SIZE)
+            deleted = db.execute(
+                delete(GradingCacheEntry).where(GradingCacheEntry.cache_key.in_(batch.scalar_subquery()))
+            ).rowcount
+            db.commit()
+            expired += deleted
+            if deleted < PRUNE_BATCH_SIZE:
+                break
+
+        while True:
+            overflow = select(GradingCacheEntry.cache_key).order_by(
+                GradingCacheEntry.last_hit_at.desc()
+            ).offset(settings.grading_cache_max_rows).limit(PRUNE_BATCH_SIZE)
+            deleted = db.execute(
+                delete(GradingCacheEntry).where(GradingCacheEntry.cache_key.in_(overflow.scalar_subquery()))
+            ).rowcount
+            db.commit()
+            trimmed += deleted
+            if deleted < PRUNE_BATCH_SIZE:
+                break
+
+        return {"expired": expired, "trimmed": trimmed}
+
+    @staticmethod
+    def run_prune() -> dict:
+        """Prune with its own session (used by the background job)."""
+        from app.database import SessionLocal  # Local import: runs outside the request session
+
+        db = SessionLocal()
+        try:
+            return GradingCache.prune(db)
+        finally:
+            db.close()
+
+
+grading_cache_pruner = PeriodicTask("grading-cache-prune", PRUNE_INTERVAL_SECONDS, GradingCache.run_prune)
@@ -0,0 +1,219 @@
+"""
+Grading Payload - Fit a submission into the AI prompt's token budget.
+
+The submission text and the uploaded file its submission_url points to
+(under static/uploads) are kept within grading_prompt_token_budget: the head
+and tail of each source survive and the middle is replaced by an omission
+marker. A unified diff over its budget keeps file headers, hunk headers and
+changed lines, dropping unchanged context first. Over-long lines are cut.
+
+Files are read in chunks, and once the head of a large non-diff file is
+full the reader seeks to its tail, so memory stays near the budget whatever
+the upload size. Binary files are described rather than included.
+"""
+import codecs
+import re
+from collections import deque
+from pathlib import Path
+from typing import BinaryIO, Optional
+
+from app.config import get_settings
+from app.services.upload_service import UPLOAD_DIR, upload_path
+
+settings = get_settings()
+
+# Rough characters per token for English text and code
+CHARS_PER_TOKEN = 4
+
+# Bytes read from an upload at a time, and the most bytes one character can take
+READ_CHUNK_BYTES = 64 * 1024
+MAX_UTF8_BYTES = 4
+
+# Longest line passed through; the rest of the line is omitted
+MAX_LINE_CHARS = 2000
+LINE_CUT_MARKER = " [...]\n"
+
+# Share of a source's budget kept from its end
+TAIL_SHARE = 0.3
+
+DIFF_HUNK = re.compile(r"^@@ -\d+(,\d+)? \+\d+(,\d+)? @@", re.MULTILINE)
+DIFF_FILE = re.compile(r"^(\+\+\+|---) \S", re.MULTILINE)
+
+
+def looks_like_diff(sample: str) -> bool:
+    """Whether text starts like a unified diff (file headers and a hunk header)."""
+    return bool(DIFF_FILE.search(sample) and DIFF_HUNK.search(sample))
+
+
+def resolve_upload(submission_url: Optional[str]) -> Optional[Path]:
+    """The stored file behind an upload URL (absolute or relative), or None if it is not a local upload."""
+    path = upload_path(submission_url)
+    if not path:
+        return None
+    try:
+        root = UPLOAD_DIR.resolve()
+        candidate = (root / path).resolve()
+        if root not in candidate.parents or not candidate.is_file():
+            return None
+    except (OSError, ValueError):
+        # Malformed names (e.g. too long for the filesystem) are not uploads we stored
+        return None
+    return candidate
+
+
+class BudgetedText:
+    """The head and tail of a stream of lines, kept within a character limit."""
+
+    def __init__(self, limit_chars: int, diff: bool = False):
+        self.tail_limit = int(limit_chars * TAIL_SHARE)
+        self.head_limit = limit_chars - self.tail_limit
+        self.diff = diff
+        self.head: list = []
+        self.head_chars = 0
+        self.head_full = False
+        self.tail: deque = deque()
+        self.tail_chars = 0
+        self.omitted_chars = 0
+        self.context_lines = 0
+
+    @property
+    def used_chars(self) -> int:
+        return self.head_chars + self.tail_chars
+
+    @property
+    def truncated(self) -> bool:
+        return self.omitted_chars > 0 or self.context_lines > 0
+
+    def omit(self, chars: int) -> None:
+        self.omitted_chars += chars
+
+    def drop_tail(self) -> None:
+        """Forget the tail collected so far (the reader is about to jump ahead)."""
+        self.omitted_chars += self.tail_chars
+        self.tail.clear()
+        self.tail_chars = 0
+
+    def add_line(self, line: str) -> None:
+        if self.diff and (line.startswith(" ") or line.startswith("index ")):
+            self.context_lines += 1
+            return
+        # Cut over-long lines to what can still be kept, so one minified line does not crowd out everything
+        room = self.tail_limit if self.head_full else max(self.head_limit - self.head_chars, self.tail_limit)
+        keep = max(min(MAX_LINE_CHARS, room) - len(LINE_CUT_MARKER), 0)
+        if len(line) > keep + len(LINE_CUT_MARKER):
+            self.omitted_chars += len(line) - keep
+            line = line[:keep] + LINE_CUT_MARKER
+
+        if not self.head_full and self.head_chars + len(line) <= self.head_limit:
+            self.head.append(line)
+            self.head_chars += len(line)
+            return
+        self.head_full = True
+        self.tail.append(line)
+        self.tail_chars += len(line)
+        while self.tail_chars > self.tail_limit:
+            dropped = self.tail.popleft()
+            self.tail_chars -= len(dropped)
+            self.omitted_chars += len(dropped)
+
+    def render(self) -> str:
+        parts = ["".join(self.head)]
+        if self.omitted_chars:
+            parts.append(f"\n[... {self.omitted_chars} characters omitted ...]\n")
+        parts.append("".join(self.tail))
+        if self.context_lines:
+            parts.append(f"\n[{self.context_lines} unchanged context lines omitted]\n")
+        return "".join(parts)
+
+
+def _read_lines(budget: BudgetedText, f: BinaryIO, size: int) -> None:
+    """Feed a UTF-8 file into budget chunk by chunk, seeking past the middle of large non-diff files."""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    partial = ""
+    skip_line = False  # Discard text up to the next newline
+    sought = False
+    while True:
+        chunk = f.read(READ_CHUNK_BYTES)
+        text = decoder.decode(chunk, final=not chunk)
+        if skip_line:
+            newline = text.find("\n")
+            if newline == -1:
+                budget.omit(len(text))
+                text = ""
+            else:
+                budget.omit(newline + 1)
+                text = text[newline + 1:]
+                skip_line = False
+
+        *lines, partial = (partial + text).split("\n")
+        for line in lines:
+            budget.add_line(line.rstrip("\r") + "\n")
+        if len(partial) > MAX_LINE_CHARS:
+            budget.add_line(partial)
+            partial = ""
+            skip_line = True
+        if not chunk:
+            break
+
+        if budget.head_full and not budget.diff and not sought:
+            tail_start = size - budget.tail_limit * MAX_UTF8_BYTES
+            if tail_start > f.tell():
+                budget.drop_tail()
+                budget.omit(tail_start - f.tell() + len(partial))
+                f.seek(tail_start)
+                decoder.reset()
+                partial = ""
+                skip_line = True
+                sought = True
+
+    if partial:
+        budget.add_line(partial)
+
+
+def read_upload(path: Path, limit_chars: int) -> dict:
+    """An uploaded file's content cut to limit_chars, with its name, size and whether it was cut."""
+    size = path.stat().st_size
+    attachment = {"name": path.name, "size": size, "binary": False, "content": None, "truncated": False}
+    with path.open("rb") as f:
+        sample = f.read(READ_CHUNK_BYTES)
+        if b"\x00" in sample:
+            attachment["binary"] = True
+            return attachment
+        diff = size > limit_chars and looks_like_diff(sample.decode("utf-8", errors="replace"))
+        budget = BudgetedText(limit_chars, diff)
+        f.seek(0)
+        _read_lines(budget, f, size)
+    attachment["content"] = budget.render()
+    attachment["truncated"] = budget.truncated
+    return attachment
+
+
+def build_grading_payload(submission_text: Optional[str], submission_url: Optional[str]) -> dict:
+    """
+    The submission text and its uploaded file's content, together within grading_prompt_token_budget.
+    The text gets up to half the budget when there is a file, and the file whatever the text leaves.
+    Returns {"text", "attachment" (None or from read_upload), "truncated", "estimated_tokens"}.
+    """
+    budget_chars = settings.grading_prompt_token_budget * CHARS_PER_TOKEN
+    upload = resolve_upload(submission_url)
+    text = submission_text or ""
+
+    text_limit = budget_chars // 2 if upload else budget_chars
+    text_budget = BudgetedText(text_limit, len(text) > text_limit and looks_like_diff(text[:READ_CHUNK_BYTES]))
+    for line in text.splitlines(keepends=True):
+        text_budget.add_line(line)
+
+    attachment = None
+    if upload:
+        try:
+            attachment = read_upload(upload, budget_chars - text_budget.used_chars)
+        except OSError as e:
+            print(f"Could not read upload {upload.name}: {e}")
+
+    content_chars = text_budget.used_chars + len((attachment or {}).get("content") or "")
+    return {
+        "text": text_budget.render(),
+        "attachment": attachment,
+        "truncated": text_budget.truncated or bool(attachment and attachment["truncated"]),
+        "estimated_tokens": content_chars // CHARS_PER_TOKEN
+    }
@@ -0,0 +1,409 @@
+"""
+Grading Queue - Durable background AI grading.
+
+Submitting work records a grading_jobs row in the same transaction as the
+submission and returns straight away. GradingWorkerPool runs on the API's
+event loop: it claims queued jobs with UPDATE ... WHERE job_id IN (SELECT
+... FOR UPDATE SKIP LOCKED), so any number of processes can share the
+table, and grades up to grading_worker_concurrency submissions at a time.
+
+No database connection is held while the grader runs: the submission is
+read in one short session (which also checks the grading cache), the AI
+call is awaited, and the grade, rewards and AIGradingLog are written
+together in a second session. Jobs left running
+by a dead process are reclaimed after STALE_JOB_SECONDS; failed attempts
+are retried with backoff until grading_max_attempts.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import List, Optional, Set
+
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.config import get_settings
+from app.models.ai_grading import AIGradingLog, GradingJob
+from app.models.engagement import ActivityType
+from app.models.submission import Submission, SubmissionStatus
+from app.services.ai_grader import AIGraderService
+from app.services.grading_cache import GradingCache, grading_cache_key
+from app.services.reward_pipeline import RewardPipeline
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# A running job not finished within this long is assumed lost and claimed again
+STALE_JOB_SECONDS = 300
+
+# Retry delay after a failed attempt, multiplied by the attempt number
+RETRY_BACKOFF_SECONDS = 30
+
+# How long shutdown waits for in-flight grading before leaving it to be reclaimed
+SHUTDOWN_GRACE_SECONDS = 10
+
+
+class GradingQueue:
+    """Enqueue, claim and complete AI grading jobs."""
+
+    @staticmethod
+    def enqueue(db: Session, submission_id: int) -> GradingJob:
+        """Queue a submission for grading. Flushes but does not commit, so the job commits with the caller."""
+        job = GradingJob(submission_id=submission_id, status="queued", attempts=0)
+        db.add(job)
+        db.flush()
+        return job
+
+    @staticmethod
+    def _claimable():
+        return or_(
+            and_(GradingJob.status == "queued", GradingJob.run_after <= func.now()),
+            and_(
+                GradingJob.status == "running",
+                GradingJob.updated_at < func.now() - timedelta(seconds=STALE_JOB_SECONDS)
+            )
+        )
+
+    @staticmethod
+    def claim(db: Session, limit: int) -> List[int]:
+        """Mark up to limit claimable jobs as running (skipping rows other workers hold) and commit. Returns job ids."""
+        candidates = select(GradingJob.job_id).where(
+            GradingQueue._claimable()
+        ).order_by(GradingJob.job_id).limit(limit).with_for_update(skip_locked=True)
+
+        job_ids = db.execute(
+            update(GradingJob).where(
+                GradingJob.job_id.in_(candidates.scalar_subquery())
+            ).values(
+                status="running",
+                attempts=GradingJob.attempts + 1,
+                updated_at=func.now()
+            ).returning(GradingJob.job_id)
+        ).scalars().all()
+        db.commit()
+        return sorted(job_ids)
+
+    @staticmethod
+    def _load(job_id: int) -> Optional[dict]:
+        """Everything the grader needs for a claimed job, or None if there is nothing left to grade."""
+        from app.database import SessionLocal  # Local import: runs outside the request session
+
+        db = SessionLocal()
+        try:
+            job = db.query(GradingJob).filter(GradingJob.job_id == job_id).first()
+            if not job or job.status != "running":
+                return None
+            submission = job.submission
+            assignment = submission.assignment
+            cache_key = grading_cache_key(
+                assignment.assignment_id, assignment.title, assignment.description,
+                submission.submission_text, submission.submission_url, settings.ai_model
+            )
+            return {
+                "attempts": job.attempts,
+                "assignment_title": assignment.title,
+                "assignment_description": assignment.description,
+                "submission_text": submission.submission_text or "See attached file.",
+                "submission_url": submission.submission_url,
+                "cache_key": cache_key,
+                "cached": GradingCache.lookup(db, cache_key)
+            }
+        finally:
+            db.close()
+
+    @staticmethod
+    def apply_result(db: Session, job: GradingJob, grading: dict, cache_hit: bool = False) -> str:
+        """
+        Write an AI verdict to the job's submission with its rewards and AIGradingLog entry, and commit.
+        A submission already graded (e.g. by its teacher) is left alone. Returns the job verdict.
+        """
+        # Locked so a teacher grading the same submission concurrently cannot also be rewarded
+        submission = db.query(Submission).filter(
+            Submission.submission_id == job.submission_id
+        ).with_for_update().populate_existing().first()
+        if submission.status != SubmissionStatus.PENDING or submission.graded_at is not None:
+            job.status = "completed"
+            job.verdict = "skipped"
+            job.finished_at = datetime.utcnow()
+            db.commit()
+            return job.verdict
+
+        assignment = submission.assignment
+        user = submission.user
+
+        # Apply Grading
+        submission.grade_awarded = grading.get("score", 0)
+        submission.teacher_feedback = grading.get("feedback", "Pending review.")
+
+        status_str = grading.get("status", "pending")
+        if status_str == "approved":
+            submission.status = SubmissionStatus.APPROVED
+        elif status_str == "rejected":
+            submission.status = SubmissionStatus.REJECTED
+        else:
+            submission.status = SubmissionStatus.PENDING
+
+        submission.graded_at = datetime.utcnow()
+
+        # Grade, rewards, log and job state are committed together
+        pipeline = RewardPipeline(db, user)
+
+        # Award Rewards if Approved
+        if submission.status == SubmissionStatus.APPROVED:
+            # Calculate proportional rewards
+            grade_percent = submission.grade_awarded / assignment.max_score
+            xp_earned = int(assignment.xp_reward * grade_percent)
+            gold_earned = int(assignment.gold_reward * grade_percent)
+
+            if xp_earned > 0:
+                pipeline.add_xp(xp_earned)
+            if gold_earned > 0:
+                pipeline.add_gold(gold_earned)
+
+            # Log activity (updates streak + weekly progress)
+            pipeline.log_activity(
+                ActivityType.QUEST_COMPLETE,
+                title=f"Assignment approved: {assignment.title}",
+                xp=xp_earned, gold=gold_earned, ref_id=assignment.quest_id
+            )
+
+        db.add(AIGradingLog(
+            submission_id=submission.submission_id,
+            assignment_id=assignment.assignment_id,
+            user_id=user.user_id,
+            user_email=user.email,
+            score_awarded=submission.grade_awarded or 0,
+            feedback_text=submission.teacher_feedback,
+            status_verdict=status_str,
+            cache_hit=cache_hit
+        ))
+
+        job.status = "completed"
+        job.verdict = status_str
+        job.error = None
+        job.finished_at = datetime.utcnow()
+
+        pipeline.commit()
+        return status_str
+
+    @staticmethod
+    def _complete(job_id: int, attempts: int, grading: dict, cache_key: str, cache_hit: bool) -> Optional[str]:
+        """
+        Apply a verdict in its own session, unless the job was reclaimed by another worker meanwhile.
+        A fresh verdict is stored in the grading cache and a reused one counted, in the same transaction.
+        """
+        from app.database import SessionLocal  # Local import: runs outside the request session
+
+        db = SessionLocal()
+        try:
+            job = db.query(GradingJob).filter(
+                GradingJob.job_id == job_id
+            ).with_for_update().first()
+            if not job or job.status != "running" or job.attempts != attempts:
+                db.rollback()
+                return None
+            if cache_hit:
+                GradingCache.record_hit(db, cache_key)
+            else:
+                GradingCache.store(db, cache_key, job.submission.assignment_id, grading)
+            return GradingQueue.apply_result(db, job, grading, cache_hit)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    @staticmethod
+    def _fail(job_id: int, error: str) -> str:
+        """Requeue a failed job with backoff, or mark it failed after grading_max_attempts. Returns the new status."""
+        from app.database import SessionLocal  # Local import: runs outside the request session
+
+        db = SessionLocal()
+        try:
+            job = db.query(GradingJob).filter(GradingJob.job_id == job_id).first()
+            if not job:
+                return "missing"
+            job.error = error
+            if job.attempts >= settings.grading_max_attempts:
+                job.status = "failed"
+                job.finished_at = datetime.utcnow()
+            else:
+                job.status = "queued"
+                job.run_after = datetime.utcnow() + timedelta(seconds=RETRY_BACKOFF_SECONDS * job.attempts)
+            db.commit()
+            return job.status
+        finally:
+            db.close()
+
+    @staticmethod
+    async def process(job_id: int) -> Optional[str]:
+        """Grade one claimed job. Returns the verdict, or None if the job no longer needed grading."""
+        inputs = await run_in_threadpool(GradingQueue._load, job_id)
+        if inputs is None:
+            return None
+        grading = inputs["cached"]
+        cache_hit = grading is not None
+        if not cache_hit:
+            grading = await AIGraderService.grade_submission(
+                assignment_title=inputs["assignment_title"],
+                assignment_description=inputs["assignment_description"],
+                submission_text=inputs["submission_text"],
+                submission_url=inputs["submission_url"]
+            )
+        return await run_in_threadpool(
+            GradingQueue._complete, job_id, inputs["attempts"], grading, inputs["cache_key"], cache_hit
+        )
+
+    @staticmethod
+    def status(db: Session, submission_id: int) -> Optional[dict]:
+        """Latest grading job for a submission with its place in the queue, or None if it was never queued."""
+        job = db.query(GradingJob).filter(
+            GradingJob.submission_id == submission_id
+        ).order_by(GradingJob.job_id.desc()).first()
+        if not job:
+            return None
+
+        queue_position = None
+        if job.status == "queued":
+            queue_position = db.query(func.count(GradingJob.job_id)).filter(
+                GradingJob.status == "queued",
+                GradingJob.job_id < job.job_id
+            ).scalar()
+
+        return {
+            "job_id": job.job_id,
+            "submission_id": job.submission_id,
+            "status": job.status,
+            "attempts": job.attempts,
+            "queue_position": queue_position,
+            "verdict": job.verdict,
+            "error": job.error,
+            "created_at": job.created_at,
+            "finished_at": job.finished_at
+        }
+
+    @staticmethod
+    def queue_counts(db: Session) -> dict:
+        """Number of jobs in each status."""
+        rows = db.query(GradingJob.status, func.count(GradingJob.job_id)).group_by(GradingJob.status).all()
+        return {status: count for status, count in rows}
+
+
+class GradingWorkerPool:
+    """
+    Claims grading jobs and runs up to concurrency of them at once on the event loop.
+    The dispatcher polls every poll_interval seconds, or sooner when notify() is called or a job finishes.
+    """
+
+    def __init__(self, concurrency: int, poll_interval: float):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._active: Set[asyncio.Task] = set()
+        self.claimed = 0
+        self.completed = 0
+        self.failed = 0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def running(self) -> bool:
+        return bool(self._dispatcher and not self._dispatcher.done())
+
+    def notify(self) -> None:
+        """Wake the dispatcher now (e.g. after a job was enqueued). Safe to call from any thread."""
+        if self.loop is not None and self._wake is not None:
+            self.loop.call_soon_threadsafe(self._wake.set)
+
+    def _claim(self, limit: int) -> List[int]:
+        from app.database import SessionLocal  # Local import: runs outside the request session
+
+        db = SessionLocal()
+        try:
+            return GradingQueue.claim(db, limit)
+        finally:
+            db.close()
+
+    async def _run(self, job_id: int) -> None:
+        try:
+            await GradingQueue.process(job_id)
+            self.completed += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failed += 1
+            self.last_error = str(e)
+            logger.exception("Grading job %s failed", job_id)
+            try:
+                await run_in_threadpool(GradingQueue._fail, job_id, str(e))
+            except Exception:
+                # Left running; it is reclaimed once stale
+                logger.exception("Grading job %s could not be requeued", job_id)
+
+    def _finished(self, task: asyncio.Task) -> None:
+        self._active.discard(task)
+        self._wake.set()
+
+    async def _dispatch(self) -> None:
+        while True:
+            free = self.concurrency - len(self._active)
+            if free > 0:
+                try:
+                    job_ids = await run_in_threadpool(self._claim, free)
+                except Exception as e:
+                    self.errors += 1
+                    self.last_error = str(e)
+                    logger.exception("Grading dispatcher could not claim jobs")
+                    job_ids = []
+                self.claimed += len(job_ids)
+                for job_id in job_ids:
+                    task = asyncio.create_task(self._run(job_id))
+                    self._active.add(task)
+                    task.add_done_callback(self._finished)
+            # Sleep until a job finishes, one is enqueued here, or the poll interval passes
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    def start(self) -> None:
+        """Start dispatching on the running event loop (call from the app lifespan)."""
+        if self.running:
+            return
+        self.loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._dispatcher = asyncio.create_task(self._dispatch())
+
+    async def stop(self) -> None:
+        """Stop claiming, give in-flight jobs SHUTDOWN_GRACE_SECONDS to finish, then cancel the rest."""
+        if self._dispatcher:
+            self._dispatcher.cancel()
+            try:
+                await self._dispatcher
+            except asyncio.CancelledError:
+                pass
+            self._dispatcher = None
+        if self._active:
+            await asyncio.wait(set(self._active), timeout=SHUTDOWN_GRACE_SECONDS)
+            for task in list(self._active):
+                task.cancel()
+        self.loop = None
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "concurrency": self.concurrency,
+            "active": len(self._active),
+            "claimed": self.claimed,
+            "completed": self.completed,
+            "failed": self.failed,
+            "errors": self.errors,
+            "last_error": self.last_error,
+        }
+
+
+grading_workers = GradingWorkerPool(settings.grading_worker_concurrency, settings.grading_poll_interval_seconds)
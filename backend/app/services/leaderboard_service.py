@@ -0,0 +1,597 @@
+"""
+Leaderboard Service - Ranking and maintenance of leaderboard_entries.
+
+An in-process rank index mirrors the global leaderboard (total XP per user)
+so rank-of-user, top-N and users-around-me are O(log n) instead of a COUNT
+or OFFSET scan. It is rebuilt from leaderboard_entries at startup.
+
+Game actions stage leaderboard deltas on their session. When the
+transaction commits, XP moves the rank index immediately and the deltas go
+to the LeaderboardMaintainer, which batch-upserts global and per-world
+entries every few hundred milliseconds.
+
+Full recalculation is set-based: one INSERT ... SELECT ... ON CONFLICT per
+scope (global, per world) and one RANK() OVER update for every board.
+"""
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import Integer, and_, case, column, event, func, literal, null, or_, select, union_all, update, values
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.models.achievement import UserAchievement
+from app.models.engagement import ActivityType, UserActivity
+from app.models.leaderboard import LeaderboardEntry
+from app.models.progress import UserProgress
+from app.models.quest import Quest
+from app.models.user import User
+from app.models.zone import Zone
+from app.services.counter_service import XP_PER_LEVEL
+from app.utils.background import PeriodicTask
+from app.utils.ranking import IndexableSkipList
+
+settings = get_settings()
+
+# Session.info key for leaderboard deltas waiting for their transaction to commit
+PENDING_DELTAS_KEY = "leaderboard_pending_deltas"
+
+# Aggregates stored on every entry
+ENTRY_STAT_COLUMNS = ("total_xp", "total_gold", "quests_completed", "monsters_defeated", "achievements_unlocked")
+
+# Activities that carry a quest id in reference_id and count towards that quest's world
+WORLD_ACTIVITY_TYPES = (ActivityType.QUEST_COMPLETE.value, ActivityType.BATTLE_WON.value)
+
+
+def lifetime_xp(user: User) -> int:
+    """Total XP a user has earned (levels are a flat XP_PER_LEVEL each)."""
+    return (user.level - 1) * XP_PER_LEVEL + user.current_xp
+
+
+class RankIndex:
+    """
+    Global XP ranking held in an indexable skip list keyed by (-xp, user_id).
+    Ranks are competition ranks (ties share a rank), matching RANK() OVER (ORDER BY total_xp DESC).
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._scores: Dict[int, int] = {}
+        self._list = IndexableSkipList()
+        self.ready = False
+        self.built_at: Optional[datetime] = None
+
+    @staticmethod
+    def _key(user_id: int, xp: int) -> Tuple[int, int]:
+        return (-xp, user_id)
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def load(self, scores: Dict[int, int]) -> None:
+        """Replace the whole index (used by rebuilds)."""
+        ranked = IndexableSkipList()
+        for user_id, xp in scores.items():
+            ranked.insert(self._key(user_id, xp))
+        with self._lock:
+            self._scores = dict(scores)
+            self._list = ranked
+            self.ready = True
+            self.built_at = datetime.utcnow()
+
+    def set_score(self, user_id: int, xp: int) -> None:
+        with self._lock:
+            old = self._scores.get(user_id)
+            if old == xp:
+                return
+            if old is not None:
+                self._list.remove(self._key(user_id, old))
+            self._scores[user_id] = xp
+            self._list.insert(self._key(user_id, xp))
+
+    def add_score(self, user_id: int, delta: int) -> None:
+        """Apply an XP delta to a user on the board (others join when their entry is created)."""
+        with self._lock:
+            xp = self._scores.get(user_id)
+            if xp is not None:
+                self.set_score(user_id, xp + delta)
+
+    def remove(self, user_id: int) -> None:
+        with self._lock:
+            old = self._scores.pop(user_id, None)
+            if old is not None:
+                self._list.remove(self._key(user_id, old))
+
+    def score_of(self, user_id: int) -> Optional[int]:
+        return self._scores.get(user_id)
+
+    def rank_for_score(self, xp: int) -> int:
+        """Rank a score would have: 1 + number of users with strictly more XP."""
+        with self._lock:
+            return self._list.count_less((-xp,)) + 1
+
+    def rank_of(self, user_id: int) -> Optional[Tuple[int, int]]:
+        """(rank, xp) for a user, or None if the user is not on the board."""
+        with self._lock:
+            xp = self._scores.get(user_id)
+            if xp is None:
+                return None
+            return self.rank_for_score(xp), xp
+
+    def _slice(self, start: int, limit: int) -> List[Tuple[int, int, int]]:
+        """(rank, user_id, xp) for positions start .. start+limit-1."""
+        rows = []
+        if limit <= 0:
+            return rows
+        with self._lock:
+            rank = None
+            previous_xp = None
+            for position, (neg_xp, user_id) in enumerate(self._list.iter_from(start), start):
+                xp = -neg_xp
+                if rank is None:
+                    rank = self.rank_for_score(xp)
+                elif xp != previous_xp:
+                    rank = position + 1
+                rows.append((rank, user_id, xp))
+                previous_xp = xp
+                if len(rows) >= limit:
+                    break
+        return rows
+
+    def top(self, limit: int = 10, offset: int = 0) -> List[Tuple[int, int, int]]:
+        """Page of the leaderboard as (rank, user_id, xp)."""
+        return self._slice(max(offset, 0), limit)
+
+    def around(self, user_id: int, radius: int = 2) -> List[Tuple[int, int, int]]:
+        """The user plus up to `radius` neighbours on each side."""
+        with self._lock:
+            xp = self._scores.get(user_id)
+            if xp is None:
+                return []
+            position = self._list.count_less(self._key(user_id, xp))
+            start = max(position - radius, 0)
+            return self._slice(start, position - start + radius + 1)
+
+    def snapshot(self) -> Dict[int, int]:
+        with self._lock:
+            return dict(self._scores)
+
+
+rank_index = RankIndex()
+
+
+class LeaderboardMaintainer:
+    """
+    Buffers leaderboard deltas from committed transactions and applies them in batches.
+    Every flush_interval_ms a background thread merges the buffer and runs one upsert
+    for global entries and one for per-world entries, then refreshes the rank index.
+    """
+
+    def __init__(self, flush_interval_ms: int):
+        self.flush_interval = flush_interval_ms / 1000
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._global: Dict[int, Dict[str, int]] = {}
+        self._world: Dict[Tuple[int, int], Dict[str, int]] = {}
+        self._task = PeriodicTask("leaderboard-maintainer", self.flush_interval, self.flush)
+        self.flushes = 0
+        self.failures = 0
+        self.rows_upserted = 0
+        self.last_flush_ms: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    @staticmethod
+    def _merge(target: dict, key, delta: Dict[str, int]) -> None:
+        current = target.setdefault(key, {})
+        for field, amount in delta.items():
+            current[field] = current.get(field, 0) + amount
+
+    def enqueue(self, global_deltas: Dict[int, Dict[str, int]], world_deltas: Dict[Tuple[int, int], Dict[str, int]]) -> None:
+        with self._lock:
+            for user_id, delta in global_deltas.items():
+                self._merge(self._global, user_id, delta)
+            for key, delta in world_deltas.items():
+                self._merge(self._world, key, delta)
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._global) + len(self._world)
+
+    @staticmethod
+    def _global_upsert(deltas: Dict[int, Dict[str, int]]):
+        """Totals come from the users row; completion counters are incremented by the deltas."""
+        batch = values(
+            column("user_id", Integer), column("quests", Integer),
+            column("battles", Integer), column("achievements", Integer),
+            name="deltas"
+        ).data([
+            (user_id, d.get("quests", 0), d.get("battles", 0), d.get("achievements", 0))
+            for user_id, d in deltas.items()
+        ])
+        source = select(
+            User.user_id,
+            null(),
+            ((User.level - 1) * XP_PER_LEVEL + User.current_xp),
+            User.gold,
+            batch.c.quests,
+            batch.c.battles,
+            batch.c.achievements
+        ).select_from(batch).join(User, User.user_id == batch.c.user_id)
+
+        stmt = insert(LeaderboardEntry).from_select(["user_id", "world_id", *ENTRY_STAT_COLUMNS], source)
+        return stmt.on_conflict_do_update(
+            index_elements=[LeaderboardEntry.user_id],
+            index_where=and_(LeaderboardEntry.world_id.is_(None), LeaderboardEntry.period_start.is_(None)),
+            set_={
+                "total_xp": stmt.excluded.total_xp,
+                "total_gold": stmt.excluded.total_gold,
+                "quests_completed": LeaderboardEntry.quests_completed + stmt.excluded.quests_completed,
+                "monsters_defeated": LeaderboardEntry.monsters_defeated + stmt.excluded.monsters_defeated,
+                "achievements_unlocked": LeaderboardEntry.achievements_unlocked + stmt.excluded.achievements_unlocked,
+                "last_updated": func.now()
+            }
+        ).returning(LeaderboardEntry.user_id, LeaderboardEntry.total_xp)
+
+    @staticmethod
+    def _world_upsert(deltas: Dict[Tuple[int, int], Dict[str, int]]):
+        """Per-world deltas keyed by quest; the world is resolved via quest -> zone in the same statement."""
+        batch = values(
+            column("user_id", Integer), column("quest_id", Integer), column("xp", Integer),
+            column("gold", Integer), column("quests", Integer), column("battles", Integer),
+            name="deltas"
+        ).data([
+            (user_id, quest_id, d.get("xp", 0), d.get("gold", 0), d.get("quests", 0), d.get("battles", 0))
+            for (user_id, quest_id), d in deltas.items()
+        ])
+        source = select(
+            batch.c.user_id,
+            Zone.world_id,
+            func.sum(batch.c.xp),
+            func.sum(batch.c.gold),
+            func.sum(batch.c.quests),
+            func.sum(batch.c.battles),
+            literal(0)
+        ).select_from(batch).join(
+            Quest, Quest.quest_id == batch.c.quest_id
+        ).join(
+            Zone, Zone.zone_id == Quest.zone_id
+        ).group_by(batch.c.user_id, Zone.world_id)
+
+        stmt = insert(LeaderboardEntry).from_select(["user_id", "world_id", *ENTRY_STAT_COLUMNS], source)
+        return stmt.on_conflict_do_update(
+            index_elements=[LeaderboardEntry.user_id, LeaderboardEntry.world_id],
+            index_where=and_(LeaderboardEntry.world_id.isnot(None), LeaderboardEntry.period_start.is_(None)),
+            set_={
+                **{c: getattr(LeaderboardEntry, c) + stmt.excluded[c] for c in ENTRY_STAT_COLUMNS},
+                "last_updated": func.now()
+            }
+        )
+
+    def flush(self) -> dict:
+        """Apply everything buffered so far. Failed batches are put back for the next flush."""
+        from app.database import SessionLocal  # Local import: the engine is only needed by the worker
+
+        with self._flush_lock:
+            with self._lock:
+                global_deltas, self._global = self._global, {}
+                world_deltas, self._world = self._world, {}
+            if not global_deltas and not world_deltas:
+                return {"global_rows": 0, "world_rows": 0}
+
+            started = time.perf_counter()
+            db = SessionLocal()
+            try:
+                totals = []
+                if global_deltas:
+                    totals = db.execute(self._global_upsert(global_deltas)).all()
+                world_rows = db.execute(self._world_upsert(world_deltas)).rowcount if world_deltas else 0
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                self.enqueue(global_deltas, world_deltas)
+                self.failures += 1
+                self.last_error = str(e)
+                raise
+            finally:
+                db.close()
+
+            if rank_index.ready:
+                for user_id, total_xp in totals:
+                    rank_index.set_score(user_id, total_xp)
+
+            self.flushes += 1
+            self.rows_upserted += len(totals) + world_rows
+            self.last_flush_ms = round((time.perf_counter() - started) * 1000, 2)
+            return {"global_rows": len(totals), "world_rows": world_rows}
+
+    def start(self) -> None:
+        self._task.start()
+
+    def stop(self) -> None:
+        """Stop the worker and apply whatever is still buffered."""
+        self._task.stop()
+        self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "running": self._task.running,
+            "flush_interval_ms": int(self.flush_interval * 1000),
+            "pending_keys": self.pending(),
+            "flushes": self.flushes,
+            "failures": self.failures,
+            "rows_upserted": self.rows_upserted,
+            "last_flush_ms": self.last_flush_ms,
+            "last_error": self.last_error,
+        }
+
+
+leaderboard_maintainer = LeaderboardMaintainer(settings.leaderboard_flush_interval_ms)
+
+
+def _pending(db: Session) -> dict:
+    return db.info.setdefault(PENDING_DELTAS_KEY, {"global": {}, "world": {}, "xp": {}})
+
+
+def stage_user_change(db: Session, user_id: int, xp: int = 0, quests: int = 0,
+                      battles: int = 0, achievements: int = 0) -> None:
+    """
+    Stage a change to a user's global entry; applied once db commits.
+    Global XP and gold totals are re-read from the users row, so any counter change only needs to mark the user.
+    """
+    pending = _pending(db)
+    LeaderboardMaintainer._merge(pending["global"], user_id, dict(quests=quests, battles=battles, achievements=achievements))
+    if xp:
+        pending["xp"][user_id] = pending["xp"].get(user_id, 0) + xp
+
+
+def stage_quest_progress(db: Session, user_id: int, quest_id: int, xp: int = 0, gold: int = 0,
+                         quests: int = 0, battles: int = 0) -> None:
+    """Stage XP/gold/completions earned in a quest's world; applied once db commits."""
+    LeaderboardMaintainer._merge(
+        _pending(db)["world"], (user_id, quest_id),
+        dict(xp=xp, gold=gold, quests=quests, battles=battles)
+    )
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_pending(session: Session) -> None:
+    pending = session.info.pop(PENDING_DELTAS_KEY, None)
+    if not pending:
+        return
+    # Ranks move immediately; the maintainer reconciles with stored totals on its next flush
+    if rank_index.ready:
+        for user_id, xp in pending["xp"].items():
+            rank_index.add_score(user_id, xp)
+    leaderboard_maintainer.enqueue(pending["global"], pending["world"])
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session: Session) -> None:
+    session.info.pop(PENDING_DELTAS_KEY, None)
+
+
+class LeaderboardService:
+    """Rank index maintenance and checks against leaderboard_entries."""
+
+    @staticmethod
+    def load_global_scores(db: Session) -> Dict[int, int]:
+        """total_xp of every all-time global leaderboard entry, by user."""
+        rows = db.query(LeaderboardEntry.user_id, LeaderboardEntry.total_xp).filter(
+            LeaderboardEntry.world_id == None,
+            LeaderboardEntry.period_start == None
+        ).all()
+        return {user_id: total_xp for user_id, total_xp in rows}
+
+    @staticmethod
+    def load_global_entries(db: Session, user_ids: List[int]) -> Dict[int, Tuple[LeaderboardEntry, User]]:
+        """Global entries with their users for a page of ranked user ids, in one query."""
+        if not user_ids:
+            return {}
+        rows = db.query(LeaderboardEntry, User).join(User).filter(
+            LeaderboardEntry.user_id.in_(user_ids),
+            LeaderboardEntry.world_id == None,
+            LeaderboardEntry.period_start == None
+        ).all()
+        return {entry.user_id: (entry, user) for entry, user in rows}
+
+    @staticmethod
+    def rebuild_rank_index(db: Session) -> dict:
+        """Reload the rank index from leaderboard_entries."""
+        scores = LeaderboardService.load_global_scores(db)
+        rank_index.load(scores)
+        return {"entries": len(scores), "built_at": rank_index.built_at}
+
+    @staticmethod
+    def check_rank_index(db: Session, sample_size: int = 20) -> dict:
+        """
+        Compare the rank index with leaderboard_entries.
+        Reports users missing on either side, XP mismatches, and stored rank_position
+        values that disagree with the index (rank_position is only as fresh as the last recalc).
+        """
+        stored = db.query(
+            LeaderboardEntry.user_id, LeaderboardEntry.total_xp, LeaderboardEntry.rank_position
+        ).filter(
+            LeaderboardEntry.world_id == None,
+            LeaderboardEntry.period_start == None
+        ).all()
+        indexed = rank_index.snapshot()
+
+        stored_ids = set()
+        missing_from_index, xp_mismatches, rank_mismatches = [], [], []
+        for user_id, total_xp, rank_position in stored:
+            stored_ids.add(user_id)
+            indexed_xp = indexed.get(user_id)
+            if indexed_xp is None:
+                missing_from_index.append(user_id)
+            elif indexed_xp != total_xp:
+                xp_mismatches.append({"user_id": user_id, "stored_xp": total_xp, "indexed_xp": indexed_xp})
+            elif rank_position is not None:
+                indexed_rank = rank_index.rank_for_score(indexed_xp)
+                if indexed_rank != rank_position:
+                    rank_mismatches.append({"user_id": user_id, "stored_rank": rank_position, "indexed_rank": indexed_rank})
+        missing_from_db = [user_id for user_id in indexed if user_id not in stored_ids]
+
+        return {
+            "ready": rank_index.ready,
+            "built_at": rank_index.built_at,
+            "indexed_entries": len(indexed),
+            "stored_entries": len(stored),
+            "consistent": not (missing_from_index or missing_from_db or xp_mismatches),
+            "missing_from_index": len(missing_from_index),
+            "missing_from_db": len(missing_from_db),
+            "xp_mismatches": len(xp_mismatches),
+            "rank_mismatches": len(rank_mismatches),
+            "samples": {
+                "missing_from_index": missing_from_index[:sample_size],
+                "missing_from_db": missing_from_db[:sample_size],
+                "xp_mismatches": xp_mismatches[:sample_size],
+                "rank_mismatches": rank_mismatches[:sample_size],
+            }
+        }
+
+    # ============ FULL RECALCULATION ============
+
+    @staticmethod
+    def _upsert_entries(source, world_scope: bool):
+        """INSERT ... SELECT ... ON CONFLICT into the all-time global or per-world entries."""
+        columns = ["user_id", "world_id", *ENTRY_STAT_COLUMNS]
+        stmt = insert(LeaderboardEntry).from_select(columns, source)
+
+        if world_scope:
+            index_elements = [LeaderboardEntry.user_id, LeaderboardEntry.world_id]
+            index_where = and_(LeaderboardEntry.world_id.isnot(None), LeaderboardEntry.period_start.is_(None))
+        else:
+            index_elements = [LeaderboardEntry.user_id]
+            index_where = and_(LeaderboardEntry.world_id.is_(None), LeaderboardEntry.period_start.is_(None))
+
+        return stmt.on_conflict_do_update(
+            index_elements=index_elements,
+            index_where=index_where,
+            set_={**{c: stmt.excluded[c] for c in ENTRY_STAT_COLUMNS}, "last_updated": func.now()},
+            # Leave rows that already hold the right totals untouched
+            where=or_(*(getattr(LeaderboardEntry, c).is_distinct_from(stmt.excluded[c]) for c in ENTRY_STAT_COLUMNS))
+        )
+
+    @staticmethod
+    def _global_source():
+        """Totals per user: lifetime XP, gold, completed quests, battles won, achievements."""
+        completed = select(
+            UserProgress.user_id, func.count().label("n")
+        ).where(UserProgress.is_completed == True).group_by(UserProgress.user_id).subquery()
+        battles = select(
+            UserActivity.user_id, func.count().label("n")
+        ).where(UserActivity.activity_type == ActivityType.BATTLE_WON.value).group_by(UserActivity.user_id).subquery()
+        unlocked = select(
+            UserAchievement.user_id, func.count().label("n")
+        ).group_by(UserAchievement.user_id).subquery()
+
+        return select(
+            User.user_id,
+            null().label("world_id"),
+            ((User.level - 1) * XP_PER_LEVEL + User.current_xp).label("total_xp"),
+            User.gold,
+            func.coalesce(completed.c.n, 0),
+            func.coalesce(battles.c.n, 0),
+            func.coalesce(unlocked.c.n, 0)
+        ).select_from(User).outerjoin(
+            completed, completed.c.user_id == User.user_id
+        ).outerjoin(
+            battles, battles.c.user_id == User.user_id
+        ).outerjoin(
+            unlocked, unlocked.c.user_id == User.user_id
+        )
+
+    @staticmethod
+    def _world_source():
+        """Totals per user per world from quest/battle activity and completed progress (quest -> zone -> world)."""
+        from_activity = select(
+            UserActivity.user_id.label("user_id"),
+            Zone.world_id.label("world_id"),
+            func.coalesce(UserActivity.xp_earned, 0).label("xp"),
+            func.coalesce(UserActivity.gold_earned, 0).label("gold"),
+            literal(0).label("quests"),
+            case((UserActivity.activity_type == ActivityType.BATTLE_WON.value, 1), else_=0).label("battles")
+        ).join(
+            Quest, Quest.quest_id == UserActivity.reference_id
+        ).join(
+            Zone, Zone.zone_id == Quest.zone_id
+        ).where(UserActivity.activity_type.in_(WORLD_ACTIVITY_TYPES))
+
+        from_progress = select(
+            UserProgress.user_id,
+            Zone.world_id,
+            literal(0),
+            literal(0),
+            literal(1),
+            literal(0)
+        ).join(
+            Quest, Quest.quest_id == UserProgress.quest_id
+        ).join(
+            Zone, Zone.zone_id == Quest.zone_id
+        ).where(UserProgress.is_completed == True)
+
+        combined = union_all(from_activity, from_progress).subquery()
+        return select(
+            combined.c.user_id,
+            combined.c.world_id,
+            func.sum(combined.c.xp),
+            func.sum(combined.c.gold),
+            func.sum(combined.c.quests),
+            func.sum(combined.c.battles),
+            literal(0)
+        ).group_by(combined.c.user_id, combined.c.world_id)
+
+    @staticmethod
+    def _rank_update():
+        """Set rank_position = RANK() OVER (PARTITION BY world_id ORDER BY total_xp DESC) on all-time boards."""
+        entries = LeaderboardEntry.__table__
+        ranked = select(
+            entries.c.entry_id,
+            func.rank().over(
+                partition_by=entries.c.world_id,
+                order_by=entries.c.total_xp.desc()
+            ).label("rank")
+        ).where(entries.c.period_start.is_(None)).subquery()
+
+        return update(entries).where(
+            entries.c.entry_id == ranked.c.entry_id,
+            entries.c.rank_position.is_distinct_from(ranked.c.rank)
+        ).values(rank_position=ranked.c.rank)
+
+    @staticmethod
+    def recalculate(db: Session) -> dict:
+        """
+        Recompute every all-time global and per-world entry and their ranks in three statements,
+        commit, and reload the rank index. Returns rows affected and timings per step.
+        """
+        steps = (
+            ("global_entries", LeaderboardService._upsert_entries(LeaderboardService._global_source(), world_scope=False)),
+            ("world_entries", LeaderboardService._upsert_entries(LeaderboardService._world_source(), world_scope=True)),
+            ("ranks", LeaderboardService._rank_update()),
+        )
+
+        started = time.perf_counter()
+        rows_affected, timings_ms = {}, {}
+        try:
+            for name, stmt in steps:
+                step_started = time.perf_counter()
+                rows_affected[name] = db.execute(stmt).rowcount
+                timings_ms[name] = round((time.perf_counter() - step_started) * 1000, 2)
+            commit_started = time.perf_counter()
+            db.commit()
+            timings_ms["commit"] = round((time.perf_counter() - commit_started) * 1000, 2)
+        except Exception:
+            db.rollback()
+            raise
+
+        index = LeaderboardService.rebuild_rank_index(db)
+
+        return {
+            "rows_affected": rows_affected,
+            "timings_ms": timings_ms,
+            "total_ms": round((time.perf_counter() - started) * 1000, 2),
+            "rank_index_entries": index["entries"]
+        }
@@ -0,0 +1,565 @@
+"""
+Notification Service - Personal, broadcast and bulk notifications.
+
+Announcements that are identical for a whole audience (e.g. new
+assignments) are broadcasts: one notifications row with user_id NULL and an
+audience predicate. Per-user state lives in notification_receipts (read /
+dismissed for one broadcast) and notification_markers (read-through and
+cleared-through watermarks for "mark all read" / "clear all"). Listings and
+unread counts merge personal rows and visible broadcasts in one query.
+
+Each user's unread personal notifications are counted in
+notification_markers.unread_count, kept in step by the same transaction that
+inserts, reads or deletes them (mapper events for ORM changes, explicit
+updates for bulk ones), so the unread count is a key lookup plus the few
+broadcasts newer than the user's read watermark. A repair job reconciles
+the counters with the table.
+
+A retention job keeps the table small: read personal notifications and old
+broadcasts are deleted in batches after their TTL, and piles of unread
+notifications of the same type are coalesced into one digest per user.
+
+Changes are published to notification_hub after their transaction commits
+(user topic for per-user changes, broadcast topic for new broadcasts), so
+streaming clients learn about new notifications without polling.
+"""
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from sqlalchemy import (
+    String, Boolean, and_, delete, event, exists, func, insert, inspect, literal, literal_column, not_, or_, select,
+    union_all, update
+)
+from sqlalchemy.dialects.postgresql import aggregate_order_by, insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.database import database_url
+from app.models.notification import Notification, NotificationMarker, NotificationReceipt
+from app.models.user import User
+from app.utils.background import PeriodicTask
+from app.utils.pubsub import PostgresNotifyBridge, PubSub
+
+settings = get_settings()
+
+# How often unread counters are reconciled with the notifications table
+COUNTER_REPAIR_INTERVAL_SECONDS = 3600
+
+# Rows deleted (or digests written) per statement by the retention job
+RETENTION_BATCH_SIZE = 5000
+
+# related_type of digest notifications; digests are never coalesced again
+DIGEST_TYPE = "digest"
+
+
+def assignment_audience(assignment_class: Optional[str], world_class: Optional[str]) -> Optional[str]:
+    """Avatar class an assignment announcement goes to (assignment restriction first), or None for everyone."""
+    for required_class in (assignment_class, world_class):
+        if required_class and required_class != "All":
+            return required_class
+    return None
+
+
+# Session.info key for notification events waiting for their transaction to commit
+PENDING_EVENTS_KEY = "notification_pending_events"
+
+# Pub/sub topics and the Postgres channel that carries them between workers
+BROADCAST_TOPIC = "notifications:broadcast"
+NOTIFY_CHANNEL = "quest_notifications"
+
+
+def user_topic(user_id: int) -> str:
+    return f"notifications:user:{user_id}"
+
+
+def _compact_event(event: dict) -> dict:
+    """An event without its notification body (for NOTIFY); _expand_event reads the body back."""
+    compact = {key: value for key, value in event.items() if key != "notification"}
+    if "notification" in event:
+        compact["notification_id"] = event["notification"]["notification_id"]
+    return compact
+
+
+def _expand_event(event: dict) -> Optional[dict]:
+    """Restore the notification body of a compacted event, or None if the notification is gone."""
+    if "notification_id" not in event:
+        return event
+    from app.database import SessionLocal  # Local import: runs outside the request session
+
+    db = SessionLocal()
+    try:
+        notification = db.query(Notification).filter(
+            Notification.notification_id == event["notification_id"]
+        ).first()
+        if notification is None:
+            return None
+        return dict(event, notification=NotificationService._payload(notification))
+    finally:
+        db.close()
+
+
+notification_hub = PubSub()
+notification_bridge = PostgresNotifyBridge(
+    notification_hub, database_url, NOTIFY_CHANNEL, compact=_compact_event, expand=_expand_event
+)
+
+
+def stage_event(db: Session, topic: str, payload: dict) -> None:
+    """Queue an event on the session; it is published only if the transaction commits."""
+    db.info.setdefault(PENDING_EVENTS_KEY, []).append((topic, payload))
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_events(session: Session) -> None:
+    for topic, payload in session.info.pop(PENDING_EVENTS_KEY, ()):
+        notification_hub.publish(topic, payload)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_events(session: Session) -> None:
+    session.info.pop(PENDING_EVENTS_KEY, None)
+
+
+def _unread_delta(user_id: int, delta: int):
+    """Upsert adding delta to a user's unread counter (never below zero)."""
+    stmt = pg_insert(NotificationMarker).values(user_id=user_id, unread_count=max(delta, 0))
+    return stmt.on_conflict_do_update(
+        index_elements=[NotificationMarker.user_id],
+        set_={"unread_count": func.greatest(0, NotificationMarker.unread_count + delta), "updated_at": func.now()}
+    )
+
+
+@event.listens_for(Notification, "after_insert")
+def _count_inserted(mapper, connection, target: Notification) -> None:
+    if target.user_id is not None and not target.is_read:
+        connection.execute(_unread_delta(target.user_id, 1))
+
+
+@event.listens_for(Notification, "after_update")
+def _count_updated(mapper, connection, target: Notification) -> None:
+    history = inspect(target).attrs.is_read.history
+    if target.user_id is None or not history.deleted:
+        return
+    was_read, is_read = bool(history.deleted[0]), bool(target.is_read)
+    if was_read != is_read:
+        connection.execute(_unread_delta(target.user_id, -1 if is_read else 1))
+
+
+@event.listens_for(Notification, "after_delete")
+def _count_deleted(mapper, connection, target: Notification) -> None:
+    if target.user_id is not None and not target.is_read:
+        connection.execute(_unread_delta(target.user_id, -1))
+
+
+def event_applies(payload: dict, user: User) -> bool:
+    """Whether a broadcast-topic event is meant for a user (user-topic events always are)."""
+    audience_class = payload.get("audience_class")
+    if audience_class and audience_class != user.avatar_class:
+        return False
+    return True
+
+
+# Columns shared by personal and broadcast rows in merged listings
+LISTING_COLUMNS = (
+    Notification.notification_id,
+    Notification.title,
+    Notification.message,
+    Notification.icon,
+    Notification.notification_type,
+    Notification.related_id,
+    Notification.related_type,
+    Notification.created_at,
+)
+
+
+class NotificationService:
+    """Reads and updates a user's notifications and creates broadcasts."""
+
+    # ============ BROADCASTS ============
+
+    @staticmethod
+    def create_broadcast(
+        db: Session,
+        title: str,
+        message: str,
+        icon: str = "📢",
+        notification_type: str = "general",
+        related_id: Optional[int] = None,
+        related_type: Optional[str] = None,
+        audience_class: Optional[str] = None,
+        world_id: Optional[int] = None
+    ) -> Notification:
+        """Add one broadcast notification for every user of audience_class (all users when None). Does not commit."""
+        notification = Notification(
+            user_id=None,
+            title=title,
+            message=message,
+            icon=icon,
+            notification_type=notification_type,
+            related_id=related_id,
+            related_type=related_type,
+            audience_class=audience_class,
+            world_id=world_id
+        )
+        db.add(notification)
+        db.flush()
+        stage_event(db, BROADCAST_TOPIC, {
+            "type": "notification",
+            "audience_class": audience_class,
+            # A new broadcast is unread for everyone it reaches
+            "unread_delta": 1,
+            "notification": NotificationService._payload(notification)
+        })
+        return notification
+
+    @staticmethod
+    def _payload(notification: Notification) -> dict:
+        """JSON-ready notification for streaming clients."""
+        return {
+            "notification_id": notification.notification_id,
+            "title": notification.title,
+            "message": notification.message,
+            "icon": notification.icon,
+            "notification_type": notification.notification_type,
+            "related_id": notification.related_id,
+            "related_type": notification.related_type,
+            "is_read": False,
+            "is_broadcast": notification.is_broadcast,
+            "created_at": (notification.created_at or datetime.utcnow()).isoformat()
+        }
+
+    @staticmethod
+    def _broadcast_read():
+        """Whether a broadcast is read by the user whose receipt / marker rows are outer-joined."""
+        return or_(
+            Notification.notification_id <= func.coalesce(NotificationMarker.broadcasts_read_through, 0),
+            NotificationReceipt.is_read.is_(True)
+        )
+
+    @staticmethod
+    def _visible_broadcasts(user: User, *columns):
+        """SELECT columns FROM broadcasts the user can see (audience matches, posted after they joined, not dismissed)."""
+        stmt = select(*columns).select_from(Notification).outerjoin(
+            NotificationReceipt,
+            and_(
+                NotificationReceipt.notification_id == Notification.notification_id,
+                NotificationReceipt.user_id == user.user_id
+            )
+        ).outerjoin(
+            NotificationMarker, NotificationMarker.user_id == user.user_id
+        ).where(
+            Notification.user_id.is_(None),
+            or_(Notification.audience_class.is_(None), Notification.audience_class == user.avatar_class),
+            Notification.notification_id > func.coalesce(NotificationMarker.broadcasts_cleared_through, 0),
+            NotificationReceipt.is_dismissed.isnot(True)
+        )
+        if user.created_at is not None:
+            stmt = stmt.where(Notification.created_at >= user.created_at)
+        return stmt
+
+    @staticmethod
+    def _upsert_receipt(db: Session, user_id: int, notification_id: int, **state: bool) -> None:
+        stmt = pg_insert(NotificationReceipt).values(user_id=user_id, notification_id=notification_id, **state)
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[NotificationReceipt.notification_id, NotificationReceipt.user_id],
+            set_={**state, "updated_at": func.now()}
+        ))
+
+    @staticmethod
+    def _advance_marker(db: Session, user_id: int, clear: bool = False) -> None:
+        """Move the user's read (and optionally cleared) watermark up to the newest broadcast."""
+        latest = db.query(func.max(Notification.notification_id)).filter(Notification.user_id.is_(None)).scalar()
+        if latest is None:
+            return
+        values = {"broadcasts_read_through": latest}
+        if clear:
+            values["broadcasts_cleared_through"] = latest
+
+        stmt = pg_insert(NotificationMarker).values(user_id=user_id, **values)
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[NotificationMarker.user_id],
+            set_={
+                **{column: func.greatest(getattr(NotificationMarker, column), value) for column, value in values.items()},
+                "updated_at": func.now()
+            }
+        ))
+
+    # ============ USER NOTIFICATIONS ============
+
+    @staticmethod
+    def list_for_user(db: Session, user: User, limit: int = 20) -> List[dict]:
+        """Newest personal and broadcast notifications for a user, merged in one query."""
+        personal = select(
+            *LISTING_COLUMNS,
+            func.coalesce(Notification.is_read, False).label("is_read"),
+            literal(False, Boolean).label("is_broadcast")
+        ).where(Notification.user_id == user.user_id)
+
+        broadcast = NotificationService._visible_broadcasts(
+            user,
+            *LISTING_COLUMNS,
+            NotificationService._broadcast_read().label("is_read"),
+            literal(True, Boolean).label("is_broadcast")
+        )
+
+        merged = union_all(personal, broadcast).subquery()
+        rows = db.execute(
+            select(merged).order_by(merged.c.created_at.desc(), merged.c.notification_id.desc()).limit(limit)
+        ).mappings().all()
+        return [dict(row, user_id=user.user_id) for row in rows]
+
+    @staticmethod
+    def unread_count(db: Session, user: User) -> int:
+        """Unread personal notifications (maintained counter) plus unread visible broadcasts, in one query."""
+        personal = select(NotificationMarker.unread_count).where(
+            NotificationMarker.user_id == user.user_id
+        ).scalar_subquery()
+        broadcast = NotificationService._visible_broadcasts(user, func.count()).where(
+            not_(NotificationService._broadcast_read())
+        ).scalar_subquery()
+        return db.execute(select(func.coalesce(personal, 0) + broadcast)).scalar()
+
+    @staticmethod
+    def _find(db: Session, user: User, notification_id: int) -> Optional[Notification]:
+        """A personal notification of the user's, or any broadcast, by id."""
+        return db.query(Notification).filter(
+            Notification.notification_id == notification_id,
+            or_(Notification.user_id == user.user_id, Notification.user_id.is_(None))
+        ).first()
+
+    @staticmethod
+    def mark_read(db: Session, user: User, notification_id: int) -> bool:
+        """Mark one notification read and commit. Returns False if it does not exist."""
+        notification = NotificationService._find(db, user, notification_id)
+        if not notification:
+            return False
+        if notification.is_broadcast:
+            NotificationService._upsert_receipt(db, user.user_id, notification_id, is_read=True)
+        else:
+            notification.is_read = True
+        stage_event(db, user_topic(user.user_id), {"type": "unread_changed"})
+        db.commit()
+        return True
+
+    @staticmethod
+    def mark_all_read(db: Session, user: User) -> None:
+        marked = db.query(Notification).filter(
+            Notification.user_id == user.user_id,
+            Notification.is_read == False
+        ).update({"is_read": True}, synchronize_session=False)
+        if marked:
+            db.execute(_unread_delta(user.user_id, -marked))
+        NotificationService._advance_marker(db, user.user_id)
+        stage_event(db, user_topic(user.user_id), {"type": "unread_changed"})
+        db.commit()
+
+    @staticmethod
+    def delete(db: Session, user: User, notification_id: int) -> bool:
+        """Delete a personal notification or dismiss a broadcast, and commit. Returns False if not found."""
+        notification = NotificationService._find(db, user, notification_id)
+        if not notification:
+            return False
+        if notification.is_broadcast:
+            NotificationService._upsert_receipt(db, user.user_id, notification_id, is_dismissed=True)
+        else:
+            db.delete(notification)
+        stage_event(db, user_topic(user.user_id), {"type": "unread_changed"})
+        db.commit()
+        return True
+
+    @staticmethod
+    def clear_all(db: Session, user: User) -> None:
+        deleted = db.execute(
+            delete(Notification).where(Notification.user_id == user.user_id).returning(Notification.is_read)
+        ).scalars().all()
+        unread = sum(1 for is_read in deleted if not is_read)
+        if unread:
+            db.execute(_unread_delta(user.user_id, -unread))
+        NotificationService._advance_marker(db, user.user_id, clear=True)
+        stage_event(db, user_topic(user.user_id), {"type": "unread_changed"})
+        db.commit()
+
+    # ============ COUNTER REPAIR ============
+
+    @staticmethod
+    def _reconcile_counters(db: Session, user_ids: Optional[List[int]] = None) -> Tuple[int, int]:
+        """Set unread counters (all, or only user_ids) to the actual unread count. Returns (corrected, reset)."""
+        scope = Notification.user_id.in_(user_ids) if user_ids is not None else Notification.user_id.isnot(None)
+        actual = select(
+            Notification.user_id,
+            func.count()
+        ).where(
+            scope,
+            Notification.is_read == False
+        ).group_by(Notification.user_id)
+
+        stmt = pg_insert(NotificationMarker).from_select(["user_id", "unread_count"], actual)
+        corrected = db.execute(stmt.on_conflict_do_update(
+            index_elements=[NotificationMarker.user_id],
+            set_={"unread_count": stmt.excluded.unread_count, "updated_at": func.now()},
+            where=NotificationMarker.unread_count != stmt.excluded.unread_count
+        )).rowcount
+
+        stale = update(NotificationMarker).where(
+            NotificationMarker.unread_count != 0,
+            ~exists().where(
+                Notification.user_id == NotificationMarker.user_id,
+                Notification.is_read == False
+            )
+        )
+        if user_ids is not None:
+            stale = stale.where(NotificationMarker.user_id.in_(user_ids))
+        reset = db.execute(stale.values(unread_count=0)).rowcount
+        return corrected, reset
+
+    @staticmethod
+    def repair_unread_counters(db: Session) -> dict:
+        """
+        Reconcile every unread counter with the notifications table and commit.
+        Returns how many counters were corrected or reset.
+        """
+        corrected, reset = NotificationService._reconcile_counters(db)
+        db.commit()
+        return {"counters_corrected": corrected, "counters_reset": reset}
+
+    @staticmethod
+    def run_counter_repair() -> dict:
+        """Counter repair with its own session (used by the background job)."""
+        from app.database import SessionLocal  # Local import: runs outside the request session
+
+        db = SessionLocal()
+        try:
+            return NotificationService.repair_unread_counters(db)
+        finally:
+            db.close()
+
+    # ============ RETENTION ============
+
+    @staticmethod
+    def _delete_in_batches(db: Session, *criteria) -> int:
+        """Delete notifications matching criteria, RETENTION_BATCH_SIZE rows per committed statement."""
+        total = 0
+        while True:
+            batch = select(Notification.notification_id).where(*criteria).limit(RETENTION_BATCH_SIZE)
+            deleted = db.execute(
+                delete(Notification).where(Notification.notification_id.in_(batch.scalar_subquery()))
+            ).rowcount
+            db.commit()
+            total += deleted
+            if deleted < RETENTION_BATCH_SIZE:
+                return total
+
+    @staticmethod
+    def prune(db: Session, read_before: datetime, broadcasts_before: datetime) -> dict:
+        """Delete read personal notifications and broadcasts past their TTL (receipts go with them)."""
+        read = NotificationService._delete_in_batches(
+            db,
+            Notification.user_id.isnot(None),
+            Notification.is_read == True,
+            Notification.created_at < read_before
+        )
+        broadcasts = NotificationService._delete_in_batches(
+            db,
+            Notification.user_id.is_(None),
+            Notification.created_at < broadcasts_before
+        )
+        return {"read_pruned": read, "broadcasts_pruned": broadcasts}
+
+    @staticmethod
+    def coalesce_bursts(db: Session, older_than: datetime, min_burst: int) -> dict:
+        """
+        Replace each user's unread personal notifications of one type created before older_than
+        with a single digest, when there are at least min_burst of them. Commits per batch.
+        """
+        def burst_rows(n):
+            return and_(
+                n.user_id.isnot(None),
+                n.is_read == False,
+                n.related_type.is_distinct_from(DIGEST_TYPE),
+                n.created_at < older_than
+            )
+
+        digests_created = coalesced = 0
+        while True:
+            count = func.count()
+            digests = insert(Notification).from_select(
+                ["user_id", "title", "message", "icon", "notification_type", "related_type", "is_read", "created_at"],
+                select(
+                    Notification.user_id,
+                    func.concat("📬 ", count, " new notifications"),
+                    func.left(func.string_agg(
+                        Notification.title, aggregate_order_by(literal_column("'; '"), Notification.created_at.desc())
+                    ), 1000),
+                    literal("📬", String),
+                    Notification.notification_type,
+                    literal(DIGEST_TYPE, String),
+                    literal(False, Boolean),
+                    func.max(Notification.created_at)
+                ).where(
+                    burst_rows(Notification)
+                ).group_by(
+                    Notification.user_id, Notification.notification_type
+                ).having(count >= min_burst).limit(RETENTION_BATCH_SIZE)
+            ).returning(Notification.notification_id, Notification.user_id)
+            created = db.execute(digests).all()
+            if not created:
+                db.rollback()
+                break
+
+            # Remove the notifications each digest replaced (same user and type, older id)
+            digest = Notification.__table__.alias("digest")
+            coalesced += db.execute(
+                delete(Notification).where(
+                    digest.c.notification_id.in_([digest_id for digest_id, _ in created]),
+                    Notification.user_id == digest.c.user_id,
+                    Notification.notification_type.is_not_distinct_from(digest.c.notification_type),
+                    Notification.notification_id < digest.c.notification_id,
+                    burst_rows(Notification)
+                )
+            ).rowcount
+
+            user_ids = sorted({user_id for _, user_id in created})
+            NotificationService._reconcile_counters(db, user_ids)
+            for user_id in user_ids:
+                stage_event(db, user_topic(user_id), {"type": "unread_changed"})
+            db.commit()
+
+            digests_created += len(created)
+            if len(created) < RETENTION_BATCH_SIZE:
+                break
+
+        return {"digests_created": digests_created, "notifications_coalesced": coalesced}
+
+    @staticmethod
+    def run_retention() -> dict:
+        """Prune and coalesce with the configured TTLs, in its own session (used by the background job)."""
+        from app.database import SessionLocal  # Local import: runs outside the request session
+
+        db = SessionLocal()
+        started = time.perf_counter()
+        try:
+            now = datetime.utcnow()
+            result = NotificationService.prune(
+                db,
+                read_before=now - timedelta(days=settings.notification_read_ttl_days),
+                broadcasts_before=now - timedelta(days=settings.notification_broadcast_ttl_days)
+            )
+            result.update(NotificationService.coalesce_bursts(
+                db,
+                older_than=now - timedelta(minutes=settings.notification_digest_after_minutes),
+                min_burst=settings.notification_digest_min_burst
+            ))
+        finally:
+            db.close()
+        result["total_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        return result
+
+
+notification_counter_repair = PeriodicTask(
+    "notification-counter-repair", COUNTER_REPAIR_INTERVAL_SECONDS, NotificationService.run_counter_repair
+)
+
+notification_retention = PeriodicTask(
+    "notification-retention", settings.notification_retention_interval_seconds, NotificationService.run_retention
+)
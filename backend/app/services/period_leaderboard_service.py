@@ -0,0 +1,288 @@
+"""
+Period Leaderboard Service - Weekly, monthly and season leaderboards.
+
+Every XP/gold gain is appended to xp_events (see CounterService). A
+background job consumes unprocessed events in batches and adds them to one
+leaderboard_entries row per user per open period (world_id NULL,
+period_start/period_end set), then re-ranks the open periods. Reading a
+period's top N is an index scan on (period_start, period_end, total_xp DESC).
+
+Once a period has been closed for ARCHIVE_GRACE_DAYS its rows are moved to
+leaderboard_archive with their final ranks, so the hot table only holds the
+periods that are still running.
+"""
+import time
+from datetime import date, timedelta
+from typing import Optional, Tuple
+
+from sqlalchemy import Date, and_, case, cast, delete, func, literal_column, select, union_all, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.models.leaderboard import LeaderboardArchive, LeaderboardEntry, XPEvent
+from app.models.user import User
+from app.utils.background import PeriodicTask
+
+settings = get_settings()
+
+# Period type -> (date_trunc unit, period length)
+PERIODS = {
+    "weekly": ("week", "1 week"),
+    "monthly": ("month", "1 month"),
+    "season": ("quarter", "3 months"),
+}
+
+# Closed periods stay hot this long so events committed around the boundary still count
+ARCHIVE_GRACE_DAYS = 1
+
+# Events consumed per rollup statement, and statements per job run
+ROLLUP_BATCH_SIZE = 50000
+ROLLUP_MAX_BATCHES = 20
+
+# Serializes rollups across API processes (pg_try_advisory_xact_lock key)
+ROLLUP_LOCK_ID = 7301
+
+# Rows of leaderboard_entries that belong to a period board
+PERIOD_ROWS = and_(LeaderboardEntry.world_id.is_(None), LeaderboardEntry.period_start.isnot(None))
+
+
+def period_bounds(period_type: str, day: date) -> Tuple[date, date]:
+    """First and last day of the period containing day (weeks start on Monday, seasons are quarters)."""
+    if period_type not in PERIODS:
+        raise ValueError(f"Unknown period type: {period_type}")
+    if period_type == "weekly":
+        start = day - timedelta(days=day.weekday())
+        return start, start + timedelta(days=6)
+
+    months = 1 if period_type == "monthly" else 3
+    start = day.replace(month=(day.month - 1) // months * months + 1, day=1)
+    years, month_index = divmod(start.month - 1 + months, 12)
+    return start, date(start.year + years, month_index + 1, 1) - timedelta(days=1)
+
+
+def period_type_of(period_start, period_end):
+    """SQL expression naming the period type of a (period_start, period_end) pair."""
+    length = period_end - period_start
+    return case((length == 6, "weekly"), (length <= 30, "monthly"), else_="season")
+
+
+class PeriodLeaderboardService:
+    """Rolls the XP event log up into period leaderboards and serves them."""
+
+    @staticmethod
+    def _rollup_batch(batch_size: int):
+        """
+        Mark up to batch_size pending events as rolled up and add them to every period they fall in:
+        WITH consumed AS (UPDATE xp_events ... RETURNING) INSERT ... SELECT ... GROUP BY ... ON CONFLICT.
+        """
+        pending = select(XPEvent.event_id).where(
+            XPEvent.rolled_up.is_(False)
+        ).order_by(XPEvent.event_id).limit(batch_size)
+
+        consumed = update(XPEvent).where(
+            XPEvent.event_id.in_(pending.scalar_subquery())
+        ).values(rolled_up=True).returning(
+            XPEvent.user_id, XPEvent.xp_amount, XPEvent.gold_amount, XPEvent.created_at
+        ).cte("consumed")
+
+        per_period = []
+        for unit, length in PERIODS.values():
+            start = func.date_trunc(unit, consumed.c.created_at)
+            per_period.append(select(
+                consumed.c.user_id,
+                cast(start, Date).label("period_start"),
+                (cast(start + literal_column(f"interval '{length}'"), Date) - 1).label("period_end"),
+                consumed.c.xp_amount,
+                consumed.c.gold_amount
+            ))
+        events = union_all(*per_period).subquery()
+
+        source = select(
+            events.c.user_id,
+            events.c.period_start,
+            events.c.period_end,
+            func.sum(events.c.xp_amount),
+            func.sum(events.c.gold_amount)
+        ).group_by(events.c.user_id, events.c.period_start, events.c.period_end)
+
+        stmt = insert(LeaderboardEntry).from_select(
+            ["user_id", "period_start", "period_end", "total_xp", "total_gold"], source
+        )
+        return stmt.on_conflict_do_update(
+            index_elements=[LeaderboardEntry.user_id, LeaderboardEntry.period_start, LeaderboardEntry.period_end],
+            index_where=PERIOD_ROWS,
+            set_={
+                "total_xp": LeaderboardEntry.total_xp + stmt.excluded.total_xp,
+                "total_gold": LeaderboardEntry.total_gold + stmt.excluded.total_gold,
+                "last_updated": func.now()
+            }
+        )
+
+    @staticmethod
+    def _rank_update():
+        """RANK() OVER (PARTITION BY period ORDER BY total_xp DESC) for every period row still in the hot table."""
+        entries = LeaderboardEntry.__table__
+        ranked = select(
+            entries.c.entry_id,
+            func.rank().over(
+                partition_by=(entries.c.period_start, entries.c.period_end),
+                order_by=entries.c.total_xp.desc()
+            ).label("rank")
+        ).where(entries.c.world_id.is_(None), entries.c.period_start.isnot(None)).subquery()
+
+        return update(entries).where(
+            entries.c.entry_id == ranked.c.entry_id,
+            entries.c.rank_position.is_distinct_from(ranked.c.rank)
+        ).values(rank_position=ranked.c.rank)
+
+    @staticmethod
+    def _archive_closed(cutoff: date):
+        """
+        Move period rows that ended before cutoff into leaderboard_archive (DELETE ... RETURNING feeding an INSERT).
+        Archived periods are frozen: anything arriving for them later is dropped.
+        """
+        moved = delete(LeaderboardEntry).where(
+            PERIOD_ROWS,
+            LeaderboardEntry.period_end < cutoff
+        ).returning(
+            LeaderboardEntry.user_id,
+            LeaderboardEntry.period_start,
+            LeaderboardEntry.period_end,
+            LeaderboardEntry.total_xp,
+            LeaderboardEntry.total_gold,
+            LeaderboardEntry.rank_position
+        ).cte("moved")
+
+        source = select(
+            moved.c.user_id,
+            period_type_of(moved.c.period_start, moved.c.period_end),
+            moved.c.period_start,
+            moved.c.period_end,
+            moved.c.total_xp,
+            moved.c.total_gold,
+            moved.c.rank_position
+        )
+        return insert(LeaderboardArchive).from_select(
+            ["user_id", "period_type", "period_start", "period_end", "total_xp", "total_gold", "rank_position"],
+            source
+        ).on_conflict_do_nothing(
+            index_elements=[LeaderboardArchive.user_id, LeaderboardArchive.period_start, LeaderboardArchive.period_end]
+        )
+
+    @staticmethod
+    def _prune_events(before: date, batch_size: int):
+        """Delete up to batch_size rolled-up events created before a date."""
+        old = select(XPEvent.event_id).where(
+            XPEvent.rolled_up.is_(True),
+            XPEvent.created_at < before
+        ).limit(batch_size)
+        return delete(XPEvent).where(XPEvent.event_id.in_(old.scalar_subquery()))
+
+    @staticmethod
+    def rollup(db: Session, today: Optional[date] = None) -> dict:
+        """
+        Roll pending XP events into the open periods, re-rank them, archive closed periods (with final ranks) and
+        prune old events, in one transaction. Skips if another process is already rolling up.
+        """
+        today = today or date.today()
+        started = time.perf_counter()
+        try:
+            if not db.execute(select(func.pg_try_advisory_xact_lock(ROLLUP_LOCK_ID))).scalar():
+                db.rollback()
+                return {"skipped": True}
+
+            entries_upserted = 0
+            for _ in range(ROLLUP_MAX_BATCHES):
+                rows = db.execute(PeriodLeaderboardService._rollup_batch(ROLLUP_BATCH_SIZE)).rowcount
+                if not rows:
+                    break
+                entries_upserted += rows
+
+            ranks = db.execute(PeriodLeaderboardService._rank_update()).rowcount
+            archived = db.execute(
+                PeriodLeaderboardService._archive_closed(today - timedelta(days=ARCHIVE_GRACE_DAYS))
+            ).rowcount
+            pruned = db.execute(PeriodLeaderboardService._prune_events(
+                today - timedelta(days=settings.xp_event_retention_days), ROLLUP_BATCH_SIZE
+            )).rowcount
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        return {
+            "skipped": False,
+            "entries_upserted": entries_upserted,
+            "ranks_updated": ranks,
+            "entries_archived": archived,
+            "events_pruned": pruned,
+            "total_ms": round((time.perf_counter() - started) * 1000, 2)
+        }
+
+    @staticmethod
+    def run_rollup() -> dict:
+        """Rollup with its own session (used by the background job)."""
+        from app.database import SessionLocal  # Local import: the engine is only needed by the worker
+
+        db = SessionLocal()
+        try:
+            return PeriodLeaderboardService.rollup(db)
+        finally:
+            db.close()
+
+    @staticmethod
+    def get_board(db: Session, period_type: str, day: Optional[date] = None,
+                  limit: int = 10, offset: int = 0) -> dict:
+        """
+        One page of the period containing day (default today), in XP order.
+        Open periods are read from leaderboard_entries, archived ones from leaderboard_archive.
+        """
+        period_start, period_end = period_bounds(period_type, day or date.today())
+
+        rows = db.query(
+            LeaderboardEntry.user_id, User.username, User.avatar_class,
+            LeaderboardEntry.total_xp, LeaderboardEntry.total_gold, LeaderboardEntry.rank_position
+        ).join(User, User.user_id == LeaderboardEntry.user_id).filter(
+            PERIOD_ROWS,
+            LeaderboardEntry.period_start == period_start,
+            LeaderboardEntry.period_end == period_end
+        ).order_by(
+            LeaderboardEntry.total_xp.desc(), LeaderboardEntry.user_id
+        ).offset(offset).limit(limit).all()
+
+        archived = False
+        if not rows and period_end < date.today():
+            archived = True
+            rows = db.query(
+                LeaderboardArchive.user_id, User.username, User.avatar_class,
+                LeaderboardArchive.total_xp, LeaderboardArchive.total_gold, LeaderboardArchive.rank_position
+            ).join(User, User.user_id == LeaderboardArchive.user_id).filter(
+                LeaderboardArchive.period_start == period_start,
+                LeaderboardArchive.period_end == period_end
+            ).order_by(
+                LeaderboardArchive.rank_position, LeaderboardArchive.user_id
+            ).offset(offset).limit(limit).all()
+
+        return {
+            "period_type": period_type,
+            "period_start": period_start,
+            "period_end": period_end,
+            "archived": archived,
+            "entries": [
+                {
+                    "user_id": user_id,
+                    "username": username,
+                    "avatar_class": avatar_class,
+                    "total_xp": total_xp,
+                    "total_gold": total_gold,
+                    "rank_position": rank_position
+                }
+                for user_id, username, avatar_class, total_xp, total_gold, rank_position in rows
+            ]
+        }
+
+
+leaderboard_rollup_job = PeriodicTask(
+    "leaderboard-rollup", settings.leaderboard_rollup_interval_seconds, PeriodLeaderboardService.run_rollup
+)
@@ -0,0 +1,139 @@
+"""
+Reward Pipeline - Unit of work for game rewards.
+
+A game action stages its XP, gold, HP changes, activity log entries and
+achievement counter changes on a RewardPipeline, then calls commit() once. Everything
+is flushed in a single transaction instead of one commit per reward.
+"""
+from typing import Dict, List
+
+from sqlalchemy.orm import Session
+
+from app.models.engagement import ActivityType
+from app.models.user import User
+from app.services.achievement_service import AchievementService
+from app.services.counter_service import CounterService, InsufficientGoldError
+from app.services.game_service import GameService
+from app.services.leaderboard_service import WORLD_ACTIVITY_TYPES, stage_quest_progress, stage_user_change
+from app.utils.cache import invalidate_dashboard
+
+
+class RewardPipeline:
+    """Stages reward side effects for one user and applies them in one transaction."""
+
+    def __init__(self, db: Session, user: User):
+        self.db = db
+        self.user = user
+        self.xp = 0
+        self.gold = 0
+        self.damage = 0
+        self.gold_required = 0
+        self.activities: List[dict] = []
+        self.stat_deltas: Dict[str, int] = {}
+
+    def add_xp(self, amount: int) -> "RewardPipeline":
+        self.xp += amount
+        return self
+
+    def add_gold(self, amount: int) -> "RewardPipeline":
+        """Stage a gold change; negative amounts are charges (e.g. entry costs)."""
+        self.gold += amount
+        return self
+
+    def charge_gold(self, cost: int) -> "RewardPipeline":
+        """Stage a gold charge that commit() only applies if the user still has enough gold."""
+        self.gold -= cost
+        self.gold_required += cost
+        return self
+
+    def deal_damage(self, amount: int) -> "RewardPipeline":
+        self.damage += amount
+        return self
+
+    def log_activity(self, activity_type, title: str, description: str = None,
+                     xp: int = 0, gold: int = 0, ref_id: int = None) -> "RewardPipeline":
+        """Stage an activity entry (also advances streak and weekly goals)."""
+        self.activities.append(dict(
+            activity_type=activity_type,
+            title=title,
+            description=description,
+            xp=xp,
+            gold=gold,
+            ref_id=ref_id
+        ))
+        return self
+
+    def count_stats(self, **deltas: int) -> "RewardPipeline":
+        """Stage achievement counter changes, e.g. count_stats(quests_completed=1)."""
+        for metric, amount in deltas.items():
+            self.stat_deltas[metric] = self.stat_deltas.get(metric, 0) + amount
+        return self
+
+    def _stage_leaderboard(self) -> None:
+        """Stage completion counts for the global entry and per-world progress for quest/battle activity."""
+        quests = self.stat_deltas.get("quests_completed", 0)
+        battles = 0
+        for activity in self.activities:
+            activity_type = activity["activity_type"]
+            activity_type = str(getattr(activity_type, "value", activity_type))
+            if activity_type not in WORLD_ACTIVITY_TYPES or not activity["ref_id"]:
+                continue
+            won = int(activity_type == ActivityType.BATTLE_WON.value)
+            battles += won
+            stage_quest_progress(
+                self.db, self.user.user_id, activity["ref_id"],
+                xp=activity["xp"], gold=activity["gold"], quests=quests, battles=won
+            )
+            quests = 0  # attributed to the first quest's world only
+        stage_user_change(
+            self.db, self.user.user_id,
+            quests=self.stat_deltas.get("quests_completed", 0), battles=battles
+        )
+
+    def commit(self) -> dict:
+        """
+        Apply everything staged, then commit once.
+        XP, gold and damage are applied by a single atomic counter UPDATE.
+        Returns a reward summary: xp/gold earned, level-up state, totals and new achievements.
+        Raises InsufficientGoldError (after rolling back) if a charge_gold() guard fails.
+        """
+        db, user = self.db, self.user
+        start_level = user.level
+        stat_changes = {}
+
+        if self.xp > 0 or self.gold or self.damage > 0:
+            counters = CounterService.apply(
+                db, user,
+                xp=max(self.xp, 0),
+                gold=self.gold,
+                damage=max(self.damage, 0),
+                min_gold=self.gold_required or None
+            )
+            if counters is None:
+                db.rollback()
+                raise InsufficientGoldError(f"Need {self.gold_required} gold")
+            start_level = counters["level"] - counters["levels_gained"]
+            if self.gold > 0:
+                stat_changes["gold"] = (counters["gold"] - self.gold, counters["gold"])
+
+        for activity in self.activities:
+            GameService.record_activity(db, user.user_id, **activity)
+
+        # Only thresholds crossed by this event's counter changes are checked
+        stat_changes.update(AchievementService.record(db, user.user_id, **self.stat_deltas))
+        new_achievements = AchievementService.evaluate(db, user, stat_changes)
+
+        self._stage_leaderboard()
+
+        db.commit()
+        invalidate_dashboard(user.user_id)
+
+        return {
+            "xp_earned": self.xp,
+            "gold_earned": self.gold,
+            "leveled_up": user.level > start_level,
+            "new_level": user.level,
+            "total_xp": user.current_xp,
+            "total_gold": user.gold,
+            "new_achievements": new_achievements
+        }
@@ -0,0 +1,160 @@
+"""
+Submission Service - Grading many submissions at once.
+
+Bulk grading loads every submission with its assignment and owning teacher
+in one joined query, so ownership is checked once per assignment. The
+grades go out as one UPDATE ... FROM (VALUES ...) and the XP/gold of newly
+approved submissions as one counter UPDATE, all committed together.
+
+Re-running AI grading queues a job for every pending submission of an
+assignment in one INSERT ... SELECT; the grading worker pool works through
+them at its configured concurrency.
+"""
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+from sqlalchemy import Integer, String, Text, and_, cast, column, exists, insert, literal, select, update, values
+from sqlalchemy.orm import Session
+
+from app.models.ai_grading import GradingJob
+from app.models.assignment import Assignment
+from app.models.quest import Quest
+from app.models.submission import Submission, SubmissionStatus
+from app.models.world import World
+from app.models.zone import Zone
+from app.services.achievement_service import AchievementService
+from app.services.counter_service import CounterService
+from app.utils.cache import invalidate_dashboard
+
+
+def assignment_rewards(grade: int, max_score: int, xp_reward: int, gold_reward: int) -> Tuple[int, int]:
+    """XP and gold earned for a grade, proportional to the score."""
+    grade_percent = grade / max_score
+    return int(xp_reward * grade_percent), int(gold_reward * grade_percent)
+
+
+class SubmissionService:
+    """Set-based grading operations for teachers."""
+
+    @staticmethod
+    def load_for_grading(db: Session, submission_ids: List[int]) -> Dict[int, dict]:
+        """
+        Submissions by id with what grading needs: owner, current status, assignment rewards and teacher.
+        The submission rows stay locked until the transaction ends, so a concurrent grader (the AI worker,
+        a single grade or another bulk request) cannot approve them in between and be paid twice.
+        """
+        rows = db.query(
+            Submission.submission_id,
+            Submission.user_id,
+            Submission.status,
+            Assignment.assignment_id,
+            Assignment.max_score,
+            Assignment.xp_reward,
+            Assignment.gold_reward,
+            World.teacher_id
+        ).join(
+            Assignment, Assignment.assignment_id == Submission.assignment_id
+        ).join(
+            Quest, Quest.quest_id == Assignment.quest_id
+        ).join(
+            Zone, Zone.zone_id == Quest.zone_id
+        ).join(
+            World, World.world_id == Zone.world_id
+        ).filter(
+            Submission.submission_id.in_(submission_ids)
+        ).with_for_update(of=Submission).all()
+        return {row.submission_id: row._asdict() for row in rows}
+
+    @staticmethod
+    def grade_many(db: Session, submissions: Dict[int, dict], grades: List[dict]) -> dict:
+        """
+        Apply grades ({submission_id, status, grade_awarded, teacher_feedback}) to submissions loaded by
+        load_for_grading, award XP/gold for submissions that become approved, and commit once.
+        """
+        graded_at = datetime.utcnow()
+        batch = values(
+            column("submission_id", Integer), column("status", String), column("grade_awarded", Integer),
+            column("teacher_feedback", Text),
+            name="grades"
+        ).data([
+            (g["submission_id"], SubmissionStatus(g["status"]).name, g["grade_awarded"], g["teacher_feedback"])
+            for g in grades
+        ])
+        db.execute(
+            update(Submission).where(
+                Submission.submission_id == batch.c.submission_id
+            ).values(
+                status=cast(batch.c.status, Submission.status.type),
+                grade_awarded=batch.c.grade_awarded,
+                teacher_feedback=batch.c.teacher_feedback,
+                graded_at=graded_at
+            ).execution_options(synchronize_session=False)
+        )
+
+        # Rewards only for submissions that were not already approved, summed per student
+        rewards: Dict[int, Tuple[int, int]] = {}
+        approved = 0
+        for g in grades:
+            if SubmissionStatus(g["status"]) != SubmissionStatus.APPROVED:
+                continue
+            approved += 1
+            row = submissions[g["submission_id"]]
+            if row["status"] == SubmissionStatus.APPROVED:
+                continue
+            xp, gold = assignment_rewards(g["grade_awarded"], row["max_score"], row["xp_reward"], row["gold_reward"])
+            total_xp, total_gold = rewards.get(row["user_id"], (0, 0))
+            rewards[row["user_id"]] = (total_xp + max(xp, 0), total_gold + max(gold, 0))
+
+        gold_changes = CounterService.apply_many(db, rewards)
+        # Gold thresholds crossed by the rewards, as RewardPipeline.commit checks for single grades
+        unlocked = AchievementService.evaluate_many(
+            db, {user_id: {"gold": change} for user_id, change in gold_changes.items()}
+        )
+        db.commit()
+
+        for user_id in rewards:
+            invalidate_dashboard(user_id)
+
+        return {
+            "graded": len(grades),
+            "approved": approved,
+            "rewarded_users": len(gold_changes),
+            "xp_awarded": sum(xp for xp, _ in rewards.values()),
+            "gold_awarded": sum(gold for _, gold in rewards.values()),
+            "achievements_unlocked": sum(len(achievements) for achievements in unlocked.values())
+        }
+
+    @staticmethod
+    def requeue_pending(db: Session, assignment_id: int) -> int:
+        """
+        Queue AI grading for every pending submission of an assignment that has no queued or running job,
+        clearing graded_at left by an earlier provider failure so the worker grades them again. Commits.
+        Returns the number of jobs queued.
+        """
+        pending = and_(
+            Submission.assignment_id == assignment_id,
+            Submission.status == SubmissionStatus.PENDING
+        )
+        db.execute(
+            update(Submission).where(pending, Submission.graded_at.isnot(None)).values(
+                graded_at=None
+            ).execution_options(synchronize_session=False)
+        )
+        queued = db.execute(
+            insert(GradingJob).from_select(
+                ["submission_id", "status", "attempts"],
+                select(
+                    Submission.submission_id,
+                    literal("queued", String),
+                    literal(0, Integer)
+                ).where(
+                    pending,
+                    ~exists().where(
+                        GradingJob.submission_id == Submission.submission_id,
+                        GradingJob.status.in_(("queued", "running"))
+                    )
+                )
+            )
+        ).rowcount
+        db.commit()
+        return queued
@@ -0,0 +1,405 @@
+"""
+Upload Service - Streaming, content-addressed file uploads.
+
+Uploads arrive as a stream of chunks and are written to disk as they come,
+with file I/O in the thread pool so a large upload never blocks the event
+loop. The size limit is enforced chunk by chunk and the content type is
+checked against the declared type and the file's leading bytes as soon as
+the first chunk arrives, so rejected uploads stop early. The sha256 of the
+content is computed on the way through. Each upload reports its size,
+checksum and throughput; totals are kept for metrics.
+
+Files are stored by content: ab/cd/<sha256><ext> under the upload dir, one
+upload_blobs row each, so uploading a file that is already stored returns
+the existing URL. Blob reference counts follow the submission, avatar and
+monster image URLs that point at them (kept by mapper events and
+reconciled by the garbage collector), and blobs left unreferenced for
+upload_gc_grace_hours are deleted with their files.
+"""
+import hashlib
+import os
+import re
+import secrets
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import AsyncIterator, Optional, Tuple
+from urllib.parse import unquote, urlsplit
+
+from sqlalchemy import case, delete, event, func, inspect, literal, select, union_all, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.config import get_settings
+from app.models.monster import Monster
+from app.models.submission import Submission
+from app.models.upload import UploadBlob
+from app.models.user import User
+from app.utils.background import PeriodicTask
+
+settings = get_settings()
+
+# Where uploads are stored and the URL path they are served under
+UPLOAD_DIR = Path("static/uploads")
+UPLOAD_URL_PREFIX = "/static/uploads/"
+
+# Longest storage path an upload URL may name (a sharded blob path is well under it)
+MAX_UPLOAD_PATH_CHARS = 255
+
+# Bytes read from an upload at a time
+UPLOAD_CHUNK_BYTES = 256 * 1024
+
+# Extensions kept on stored files (so they are served with the right type); anything else is dropped
+EXTENSION_PATTERN = re.compile(r"^\.[a-z0-9]{1,10}$")
+
+# Columns holding upload URLs; each one pointing at a blob is a reference to it
+REFERENCING_COLUMNS = (
+    (Submission, "submission_url"),
+    (User, "avatar_url"),
+    (Monster, "monster_image_url"),
+)
+
+# Blobs deleted per statement by the garbage collector, and how often it runs
+GC_BATCH_SIZE = 500
+GC_INTERVAL_SECONDS = 3600
+
+# Leading bytes collected before the content is checked against its type (the longest signature check reads 12)
+CONTENT_SNIFF_BYTES = 16
+
+# Binary types accepted, with the leading bytes their content must start with
+BINARY_SIGNATURES = {
+    "image/png": (b"\x89PNG\r\n\x1a\n",),
+    "image/jpeg": (b"\xff\xd8\xff",),
+    "image/gif": (b"GIF87a", b"GIF89a"),
+    "image/webp": (b"RIFF",),
+    "application/pdf": (b"%PDF-",),
+    "application/zip": (b"PK\x03\x04", b"PK\x05\x06"),
+    "application/x-zip-compressed": (b"PK\x03\x04", b"PK\x05\x06"),
+}
+
+# Non text/* types accepted as text (source code and data files)
+TEXT_TYPES = {
+    "application/json", "application/javascript", "application/x-javascript", "application/sql",
+    "application/x-python-code", "application/x-sh", "application/xml", "application/x-yaml",
+}
+
+# Generic types browsers send for files they do not recognise (e.g. .java, .cpp); accepted when the content is text
+GENERIC_TYPES = {"", "application/octet-stream"}
+
+# Extensions never stored: served from /static they would run as active content in the browser
+BLOCKED_EXTENSIONS = {".html", ".htm", ".xhtml", ".svg", ".svgz"}
+
+
+class UploadTooLargeError(Exception):
+    """Raised when an upload exceeds upload_max_bytes."""
+
+
+class UnsupportedUploadError(Exception):
+    """Raised when an upload's type or content is not accepted."""
+
+
+class UploadStats:
+    """Totals across uploads in this worker."""
+
+    def __init__(self):
+        self.uploads = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self.bytes = 0
+        self.bytes_deduplicated = 0
+        self.seconds = 0.0
+        self.inflight = 0
+
+    def stats(self) -> dict:
+        return {
+            "uploads": self.uploads,
+            "duplicates": self.duplicates,
+            "rejected": self.rejected,
+            "inflight": self.inflight,
+            "bytes": self.bytes,
+            "bytes_deduplicated": self.bytes_deduplicated,
+            "average_bytes_per_second": round(self.bytes / self.seconds) if self.seconds else None,
+        }
+
+
+upload_stats = UploadStats()
+
+
+def upload_path(url: Optional[str]) -> Optional[str]:
+    """Storage path (relative to UPLOAD_DIR) behind an upload URL, absolute or relative, or None."""
+    if not url:
+        return None
+    path = unquote(urlsplit(url.strip()).path)
+    if not path.startswith(UPLOAD_URL_PREFIX):
+        return None
+    path = path[len(UPLOAD_URL_PREFIX):]
+    if not path or "\x00" in path or len(path) > MAX_UPLOAD_PATH_CHARS:
+        return None
+    return path
+
+
+def blob_path(sha256: str, extension: str) -> str:
+    """Sharded storage path for content: ab/cd/<sha256><ext>."""
+    return f"{sha256[:2]}/{sha256[2:4]}/{sha256}{extension}"
+
+
+def check_content_type(content_type: Optional[str], extension: str, head: bytes) -> None:
+    """Raise UnsupportedUploadError unless the declared type is accepted and the leading bytes match it."""
+    if extension.lower() in BLOCKED_EXTENSIONS:
+        raise UnsupportedUploadError(f"Files of type {extension} are not allowed")
+    declared = (content_type or "").split(";")[0].strip().lower()
+
+    if declared in BINARY_SIGNATURES:
+        if not head.startswith(BINARY_SIGNATURES[declared]):
+            raise UnsupportedUploadError(f"File content does not match {declared}")
+        if declared == "image/webp" and head[8:12] != b"WEBP":
+            raise UnsupportedUploadError("File content does not match image/webp")
+        return
+    if declared.startswith("text/") or declared in TEXT_TYPES or declared in GENERIC_TYPES:
+        if b"\x00" in head:
+            raise UnsupportedUploadError("Binary files of this type are not allowed")
+        return
+    raise UnsupportedUploadError(f"Files of type {declared} are not allowed")
+
+
+def _ref_delta(path: str, delta: int):
+    """UPDATE adding delta to a blob's reference count (never below zero), marking when it became unreferenced."""
+    count = func.greatest(UploadBlob.ref_count + delta, 0)
+    return update(UploadBlob).where(UploadBlob.path == path).values(
+        ref_count=count,
+        unreferenced_since=case(
+            (count > 0, None),
+            else_=func.coalesce(UploadBlob.unreferenced_since, datetime.utcnow())
+        )
+    )
+
+
+def _track_references(model, attr: str) -> None:
+    """Keep blob reference counts in step with one URL column."""
+
+    # Load the old URL when it is replaced on an expired object, so after_update sees what it was
+    @event.listens_for(getattr(model, attr), "set", active_history=True)
+    def _load_previous(target, value, oldvalue, initiator) -> None:
+        pass
+
+    @event.listens_for(model, "after_insert")
+    def _referenced(mapper, connection, target) -> None:
+        path = upload_path(getattr(target, attr))
+        if path:
+            connection.execute(_ref_delta(path, 1))
+
+    @event.listens_for(model, "after_update")
+    def _rereferenced(mapper, connection, target) -> None:
+        history = inspect(target).attrs[attr].history
+        if not history.deleted:
+            return
+        old, new = upload_path(history.deleted[0]), upload_path(getattr(target, attr))
+        if old == new:
+            return
+        if old:
+            connection.execute(_ref_delta(old, -1))
+        if new:
+            connection.execute(_ref_delta(new, 1))
+
+    @event.listens_for(model, "after_delete")
+    def _dereferenced(mapper, connection, target) -> None:
+        path = upload_path(getattr(target, attr))
+        if path:
+            connection.execute(_ref_delta(path, -1))
+
+
+for _model, _attr in REFERENCING_COLUMNS:
+    _track_references(_model, _attr)
+
+
+class UploadService:
+    """Streams uploads into the content-addressed store and collects unreferenced blobs."""
+
+    @staticmethod
+    def _register(db: Session, sha256: str, extension: str, size: int, content_type: Optional[str],
+                  part_path: Path) -> Tuple[str, bool]:
+        """
+        Record a blob (or claim the existing one for the same content, restarting its grace period)
+        and put the written file in place unless it is already stored. Commits.
+        Returns (storage path, whether the content was already stored).
+        """
+        now = datetime.utcnow()
+        stmt = insert(UploadBlob).values(
+            sha256=sha256, path=blob_path(sha256, extension), size=size, content_type=content_type,
+            ref_count=0, unreferenced_since=now, created_at=now
+        )
+        path = db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[UploadBlob.sha256],
+                set_={"unreferenced_since": case((UploadBlob.ref_count > 0, None), else_=literal(now))}
+            ).returning(UploadBlob.path)
+        ).scalar_one()
+        db.commit()
+
+        target = UPLOAD_DIR / path
+        if target.is_file():
+            part_path.unlink(missing_ok=True)
+            return path, True
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(part_path, target)
+        return path, False
+
+    @staticmethod
+    async def store(db: Session, chunks: AsyncIterator[bytes], filename: Optional[str],
+                    content_type: Optional[str]) -> dict:
+        """
+        Stream an upload to disk, chunk by chunk, and store it by content.
+        An upload of content that is already stored returns the existing URL.
+        Raises UploadTooLargeError / UnsupportedUploadError (nothing is kept).
+        Returns {url, filename, size, sha256, content_type, duplicate, seconds, bytes_per_second}.
+        """
+        extension = os.path.splitext(filename or "")[1].lower()
+        part_path = UPLOAD_DIR / f".{secrets.token_hex(8)}.part"
+
+        digest = hashlib.sha256()
+        size = 0
+        head = b""  # Leading bytes until they have been checked, then None
+        started = time.perf_counter()
+        upload_stats.inflight += 1
+        out = await run_in_threadpool(part_path.open, "wb")
+        try:
+            async for chunk in chunks:
+                if not chunk:
+                    continue
+                # Clients may send the first bytes in tiny chunks; check once enough have arrived
+                if head is not None:
+                    head += chunk
+                    if len(head) >= CONTENT_SNIFF_BYTES:
+                        check_content_type(content_type, extension, head)
+                        head = None
+                size += len(chunk)
+                if size > settings.upload_max_bytes:
+                    raise UploadTooLargeError(f"File is larger than {settings.upload_max_bytes} bytes")
+                digest.update(chunk)
+                await run_in_threadpool(out.write, chunk)
+            if size == 0:
+                raise UnsupportedUploadError("File is empty")
+            if head is not None:
+                check_content_type(content_type, extension, head)
+            await run_in_threadpool(out.close)
+            sha256 = digest.hexdigest()
+            path, duplicate = await run_in_threadpool(
+                UploadService._register, db, sha256,
+                extension if EXTENSION_PATTERN.match(extension) else "", size, content_type, part_path
+            )
+        except BaseException as e:
+            await run_in_threadpool(out.close)
+            await run_in_threadpool(part_path.unlink, True)
+            if isinstance(e, (UploadTooLargeError, UnsupportedUploadError)):
+                upload_stats.rejected += 1
+            raise
+        finally:
+            upload_stats.inflight -= 1
+
+        seconds = time.perf_counter() - started
+        upload_stats.uploads += 1
+        upload_stats.bytes += size
+        upload_stats.seconds += seconds
+        if duplicate:
+            upload_stats.duplicates += 1
+            upload_stats.bytes_deduplicated += size
+        return {
+            "url": f"{UPLOAD_URL_PREFIX}{path}",
+            "filename": os.path.basename(path),
+            "size": size,
+            "sha256": sha256,
+            "content_type": content_type,
+            "duplicate": duplicate,
+            "seconds": round(seconds, 4),
+            "bytes_per_second": round(size / seconds) if seconds else None,
+        }
+
+    @staticmethod
+    def reconcile_references(db: Session) -> int:
+        """
+        Recount every blob's references from the URL columns, fixing counts missed by bulk statements
+        that bypass the mapper events. Commits. Returns the number of blobs corrected.
+        """
+        refs = union_all(*(
+            select(func.split_part(getattr(model, attr), UPLOAD_URL_PREFIX, 2).label("path")).where(
+                getattr(model, attr).contains(UPLOAD_URL_PREFIX)
+            )
+            for model, attr in REFERENCING_COLUMNS
+        )).subquery("refs")
+        counts = select(
+            UploadBlob.path, func.count(refs.c.path).label("refs")
+        ).select_from(UploadBlob).outerjoin(
+            refs, refs.c.path == UploadBlob.path
+        ).group_by(UploadBlob.path).subquery("counts")
+
+        corrected = db.execute(
+            update(UploadBlob).where(
+                UploadBlob.path == counts.c.path,
+                UploadBlob.ref_count != counts.c.refs
+            ).values(
+                ref_count=counts.c.refs,
+                unreferenced_since=case(
+                    (counts.c.refs > 0, None),
+                    else_=func.coalesce(UploadBlob.unreferenced_since, datetime.utcnow())
+                )
+            ).execution_options(synchronize_session=False)
+        ).rowcount
+        db.commit()
+        return corrected
+
+    @staticmethod
+    def collect_garbage(db: Session) -> dict:
+        """
+        Reconcile reference counts, then delete blobs unreferenced for upload_gc_grace_hours with their files,
+        and abandoned partial uploads. Returns counts of what was removed.
+        """
+        corrected = UploadService.reconcile_references(db)
+        cutoff = datetime.utcnow() - timedelta(hours=settings.upload_gc_grace_hours)
+        collectable = (UploadBlob.ref_count == 0, UploadBlob.unreferenced_since <= cutoff)
+
+        blobs = freed = 0
+        while True:
+            batch = select(UploadBlob.sha256).where(*collectable).limit(GC_BATCH_SIZE)
+            deleted = db.execute(
+                delete(UploadBlob).where(
+                    UploadBlob.sha256.in_(batch.scalar_subquery()), *collectable
+                ).returning(UploadBlob.path, UploadBlob.size)
+            ).all()
+            db.commit()
+
+            # Content uploaded again since the delete has a new row for the same path; leave its file alone
+            paths = [row.path for row in deleted]
+            recreated = set(
+                db.execute(select(UploadBlob.path).where(UploadBlob.path.in_(paths))).scalars()
+            ) if paths else set()
+            for row in deleted:
+                if row.path not in recreated:
+                    (UPLOAD_DIR / row.path).unlink(missing_ok=True)
+                    blobs += 1
+                    freed += row.size
+            if len(deleted) < GC_BATCH_SIZE:
+                break
+
+        parts = 0
+        stale = time.time() - settings.upload_gc_grace_hours * 3600
+        for part_path in UPLOAD_DIR.glob(".*.part"):
+            if part_path.stat().st_mtime < stale:
+                part_path.unlink(missing_ok=True)
+                parts += 1
+
+        return {"corrected_refcounts": corrected, "deleted_blobs": blobs, "freed_bytes": freed, "deleted_parts": parts}
+
+    @staticmethod
+    def run_garbage_collection() -> dict:
+        """Collect garbage with its own session (used by the background job)."""
+        from app.database import SessionLocal  # Local import: runs outside the request session
+
+        db = SessionLocal()
+        try:
+            return UploadService.collect_garbage(db)
+        finally:
+            db.close()
+
+
+upload_gc = PeriodicTask("upload-gc", GC_INTERVAL_SECONDS, UploadService.run_garbage_collection)
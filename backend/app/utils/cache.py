@@ -0,0 +1,149 @@
+"""
+In-process snapshot caches with pluggable storage backends.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Dict, Hashable, Optional
+
+from app.config import get_settings
+
+settings = get_settings()
+
+# All SnapshotCache instances, for metrics
+_registry: Dict[str, "SnapshotCache"] = {}
+
+
+class CacheBackend:
+    """Storage interface for SnapshotCache. Implement this to plug in a shared store."""
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        raise NotImplementedError
+
+    def set(self, key: Hashable, value: Any, ttl: float) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: Hashable) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+
+class LRUCacheBackend(CacheBackend):
+    """Thread-safe LRU with per-entry expiry, bounded to max_entries."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SnapshotCache:
+    """
+    Keyed snapshot cache with hit/miss/invalidation counters.
+    Entries are dropped explicitly by invalidate() when the underlying data changes,
+    and expire after ttl seconds as a safety net (e.g. writes from other workers).
+    """
+
+    def __init__(self, name: str, backend: CacheBackend, ttl: float):
+        self.name = name
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        _registry[name] = self
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        value = self.backend.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self.backend.set(key, value, self.ttl)
+
+    def invalidate(self, key: Hashable) -> None:
+        self.invalidations += 1
+        self.backend.delete(key)
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        stats = {
+            "name": self.name,
+            "size": len(self.backend),
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
+        if isinstance(self.backend, LRUCacheBackend):
+            stats["max_entries"] = self.backend.max_entries
+            stats["evictions"] = self.backend.evictions
+        return stats
+
+
+def get_cache_stats() -> list:
+    """Hit/miss counters for every registered cache."""
+    return [cache.stats() for cache in _registry.values()]
+
+
+# Per-user dashboard snapshots, keyed by (user_id, day)
+dashboard_cache = SnapshotCache(
+    "dashboard",
+    LRUCacheBackend(settings.dashboard_cache_max_entries),
+    settings.dashboard_cache_ttl_seconds
+)
+
+
+def dashboard_cache_key(user_id: int, day: date = None) -> tuple:
+    """Snapshots are per user per day, so daily quests and streaks roll over at midnight."""
+    return (user_id, day or date.today())
+
+
+def invalidate_dashboard(user_id: int) -> None:
+    """Drop a user's dashboard snapshot after an event that changes it."""
+    dashboard_cache.invalidate(dashboard_cache_key(user_id))
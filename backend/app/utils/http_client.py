@@ -0,0 +1,144 @@
+"""
+Shared outbound HTTP client.
+
+One httpx.AsyncClient per process keeps connections to a provider alive
+across calls instead of paying a TLS handshake per request. The pool is
+bounded, requests to one host are capped by a semaphore, and 429/5xx
+responses or transport errors are retried with jittered exponential backoff
+(honouring Retry-After). Latency and in-flight counts are kept for metrics.
+"""
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+# Responses worth retrying: rate limited or a transient server error
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Latency samples kept for percentiles
+LATENCY_SAMPLES = 500
+
+
+class ManagedHTTPClient:
+    """A process-wide AsyncClient with per-host concurrency limits, retries and metrics."""
+
+    def __init__(self, max_connections: int, max_keepalive: int, per_host_limit: int, timeout: float,
+                 max_retries: int, backoff_base: float = 0.5, backoff_max: float = 8.0):
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self.per_host_limit = per_host_limit
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+        self._latencies: deque = deque(maxlen=LATENCY_SAMPLES)
+        self.inflight = 0
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.status_counts: Dict[str, int] = {}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """The shared client, created on first use if start() was not called."""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive
+                ),
+                timeout=self.timeout
+            )
+        return self._client
+
+    def start(self) -> None:
+        """Open the pool now (at app startup) rather than on the first request."""
+        self.client
+
+    async def aclose(self) -> None:
+        """Close pooled connections (at app shutdown)."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        self._host_limits.clear()
+
+    def _host_limit(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.per_host_limit)
+        return self._host_limits[host]
+
+    def _backoff(self, attempt: int, response: Optional[httpx.Response]) -> float:
+        """Full-jitter exponential backoff, or the server's Retry-After when it sends one."""
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                return min(float(retry_after), self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """
+        Send a request through the shared pool, retrying 429/5xx and transport errors up to max_retries times.
+        Returns the last response; raises the last transport error if no response was ever received.
+        """
+        host_limit = self._host_limit(url)
+        for attempt in range(self.max_retries + 1):
+            response = None
+            error: Optional[Exception] = None
+            async with host_limit:
+                self.inflight += 1
+                self.requests += 1
+                started = time.perf_counter()
+                try:
+                    response = await self.client.request(method, url, **kwargs)
+                except httpx.TransportError as e:
+                    error = e
+                finally:
+                    self.inflight -= 1
+                    self._latencies.append((time.perf_counter() - started) * 1000)
+
+            key = str(response.status_code) if response is not None else type(error).__name__
+            self.status_counts[key] = self.status_counts.get(key, 0) + 1
+
+            retryable = error is not None or response.status_code in RETRY_STATUSES
+            if not retryable or attempt == self.max_retries:
+                break
+            # Back off without holding the host slot
+            self.retries += 1
+            await asyncio.sleep(self._backoff(attempt, response))
+
+        if error is not None:
+            self.failures += 1
+            raise error
+        if response.status_code >= 400:
+            self.failures += 1
+        return response
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    def stats(self) -> dict:
+        latencies = sorted(self._latencies)
+
+        def percentile(p: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))], 2)
+
+        return {
+            "open": self._client is not None and not self._client.is_closed,
+            "max_connections": self.max_connections,
+            "per_host_limit": self.per_host_limit,
+            "inflight": self.inflight,
+            "requests": self.requests,
+            "retries": self.retries,
+            "failures": self.failures,
+            "status_counts": dict(self.status_counts),
+            "latency_ms": {"p50": percentile(0.5), "p95": percentile(0.95), "p99": percentile(0.99)},
+        }
@@ -0,0 +1,257 @@
+"""
+In-process publish/subscribe for pushing events to streaming clients.
+
+Subscribers are asyncio queues owned by the event loop serving the stream;
+publishers may run on any thread. With the Postgres bridge attached, every
+publish goes out as NOTIFY and each worker's listener thread delivers it
+locally, so clients connected to any worker see events from all of them.
+An event too large for a NOTIFY payload is sent compacted (e.g. without a
+notification body) and expanded again by each worker's listener.
+"""
+import asyncio
+import json
+import logging
+import select
+import threading
+from typing import Callable, Dict, Iterable, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Postgres rejects NOTIFY payloads of 8000 bytes or more
+NOTIFY_MAX_PAYLOAD_BYTES = 7999
+
+
+class Subscription:
+    """A bounded event queue for one streaming client. Oldest events are dropped when it is full."""
+
+    def __init__(self, hub: "PubSub", topics: Iterable[str], max_queue: int):
+        self.hub = hub
+        self.topics = tuple(topics)
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(max_queue)
+
+    def _deliver(self, event: dict) -> None:
+        # Runs on the subscriber's event loop
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.hub.dropped += 1
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout: float) -> Optional[dict]:
+        """Next event, or None if nothing arrived within timeout seconds."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def drain(self) -> list:
+        """Events already queued, without waiting."""
+        events = []
+        while not self.queue.empty():
+            events.append(self.queue.get_nowait())
+        return events
+
+    def close(self) -> None:
+        self.hub.unsubscribe(self)
+
+
+class PubSub:
+    """Topic-based fan-out to subscriptions in this process, optionally bridged across processes."""
+
+    def __init__(self, max_queue: int = 100):
+        self.max_queue = max_queue
+        self._lock = threading.Lock()
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self.bridge: Optional["PostgresNotifyBridge"] = None
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    def subscribe(self, *topics: str) -> Subscription:
+        """Subscribe to topics; must be called from the event loop that will consume the events."""
+        subscription = Subscription(self, topics, self.max_queue)
+        with self._lock:
+            for topic in topics:
+                self._subscribers.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            for topic in subscription.topics:
+                subscribers = self._subscribers.get(topic)
+                if subscribers:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[topic]
+
+    def publish(self, topic: str, event: dict) -> None:
+        """Publish from any thread: through the bridge when attached, otherwise to local subscribers."""
+        self.published += 1
+        if self.bridge is not None:
+            self.bridge.send(topic, event)
+        else:
+            self.deliver_local(topic, event)
+
+    def deliver_local(self, topic: str, event: dict) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers.get(topic, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription._deliver, event)
+                self.delivered += 1
+            except RuntimeError:
+                # The subscriber's loop has closed; its stream is gone
+                self.unsubscribe(subscription)
+
+    def stats(self) -> dict:
+        with self._lock:
+            topics = len(self._subscribers)
+            subscriptions = len({s for subs in self._subscribers.values() for s in subs})
+        return {
+            "backend": "postgres" if self.bridge is not None else "local",
+            "topics": topics,
+            "subscriptions": subscriptions,
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "bridge": self.bridge.stats() if self.bridge is not None else None,
+        }
+
+
+class PostgresNotifyBridge:
+    """
+    Carries PubSub events between processes with Postgres LISTEN/NOTIFY.
+    Sends use one autocommit connection; a listener thread holds another and
+    hands every notification on the channel to the local hub.
+
+    compact(event) returns a smaller event to send when the full one does not
+    fit in a NOTIFY payload; expand(event) runs on each listener to restore it
+    (returning None drops the event).
+    """
+
+    def __init__(self, hub: PubSub, dsn: str, channel: str,
+                 compact: Optional[Callable[[dict], dict]] = None,
+                 expand: Optional[Callable[[dict], Optional[dict]]] = None):
+        self.hub = hub
+        self.dsn = dsn
+        self.channel = channel
+        self.compact = compact
+        self.expand = expand
+        self._send_lock = threading.Lock()
+        self._send_conn = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.sent = 0
+        self.received = 0
+        self.compacted = 0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+
+    def _connect(self):
+        import psycopg2  # Local import: only needed when the bridge is enabled
+
+        conn = psycopg2.connect(self.dsn)
+        conn.autocommit = True
+        return conn
+
+    def _encode(self, topic: str, event: dict) -> Optional[str]:
+        """The NOTIFY payload for an event, compacted if needed; None if it cannot be made to fit."""
+        payload = json.dumps({"topic": topic, "event": event}, default=str)
+        if len(payload.encode()) <= NOTIFY_MAX_PAYLOAD_BYTES:
+            return payload
+        if self.compact is not None:
+            payload = json.dumps({"topic": topic, "event": self.compact(event), "compact": True}, default=str)
+            if len(payload.encode()) <= NOTIFY_MAX_PAYLOAD_BYTES:
+                self.compacted += 1
+                return payload
+        return None
+
+    def send(self, topic: str, event: dict) -> None:
+        payload = self._encode(topic, event)
+        if payload is None:
+            self.errors += 1
+            self.last_error = f"Event on {topic} is larger than {NOTIFY_MAX_PAYLOAD_BYTES} bytes"
+            logger.error("Event bridge dropped an event on %s: too large for NOTIFY", topic)
+            return
+        with self._send_lock:
+            for attempt in range(2):  # One reconnect
+                try:
+                    if self._send_conn is None or self._send_conn.closed:
+                        self._send_conn = self._connect()
+                    with self._send_conn.cursor() as cursor:
+                        cursor.execute("SELECT pg_notify(%s, %s)", (self.channel, payload))
+                    self.sent += 1
+                    return
+                except Exception as e:
+                    self.errors += 1
+                    self.last_error = str(e)
+                    self._send_conn = None
+                    if attempt == 1:
+                        logger.exception("Event bridge could not publish to %s", self.channel)
+
+    def _receive(self, payload: str) -> None:
+        message = json.loads(payload)
+        self.received += 1
+        event = message["event"]
+        if message.get("compact") and self.expand is not None:
+            try:
+                event = self.expand(event)
+            except Exception:
+                self.errors += 1
+                logger.exception("Event bridge could not expand an event on %s", message["topic"])
+                return
+            if event is None:
+                return
+        self.hub.deliver_local(message["topic"], event)
+
+    def _listen(self) -> None:
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = self._connect()
+                with conn.cursor() as cursor:
+                    cursor.execute(f'LISTEN "{self.channel}"')
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], 1.0) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self._receive(conn.notifies.pop(0).payload)
+            except Exception as e:
+                self.errors += 1
+                self.last_error = str(e)
+                logger.exception("Event bridge listener error, reconnecting")
+                self._stop.wait(2)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._listen, name="event-bridge", daemon=True)
+        self._thread.start()
+        self.hub.bridge = self
+
+    def stop(self) -> None:
+        self.hub.bridge = None
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        with self._send_lock:
+            if self._send_conn is not None:
+                self._send_conn.close()
+                self._send_conn = None
+
+    def stats(self) -> dict:
+        return {
+            "channel": self.channel,
+            "listening": bool(self._thread and self._thread.is_alive()),
+            "sent": self.sent,
+            "received": self.received,
+            "compacted": self.compacted,
+            "errors": self.errors,
+            "last_error": self.last_error,
+        }
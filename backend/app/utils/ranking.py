@@ -0,0 +1,134 @@
+"""
+Order-statistic containers for ranking.
+"""
+import random
+from typing import Any, Iterator, List
+
+
+class _Infinity:
+    """Sentinel key that sorts after every other key."""
+
+    def __lt__(self, other): return False
+    def __le__(self, other): return other is self
+    def __gt__(self, other): return other is not self
+    def __ge__(self, other): return True
+    def __repr__(self): return "INF"
+
+
+_INF = _Infinity()
+
+
+class _Node:
+    __slots__ = ("key", "next", "width")
+
+    def __init__(self, key, next_nodes: List["_Node"], widths: List[int]):
+        self.key = key
+        self.next = next_nodes
+        self.width = widths
+
+
+_NIL = _Node(_INF, [], [])
+
+
+class IndexableSkipList:
+    """
+    Sorted multiset with positional access (indexable skip list).
+    Each forward link stores how many elements it skips, so insert, remove,
+    count_less (rank) and positional lookup are all O(log n) expected.
+    """
+
+    def __init__(self, max_levels: int = 24):
+        self.max_levels = max_levels
+        self._head = _Node("HEAD", [_NIL] * max_levels, [1] * max_levels)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _random_level(self) -> int:
+        level = 1
+        while level < self.max_levels and random.random() < 0.5:
+            level += 1
+        return level
+
+    def insert(self, key: Any) -> None:
+        chain = [None] * self.max_levels
+        steps_at_level = [0] * self.max_levels
+        node = self._head
+        for level in reversed(range(self.max_levels)):
+            while node.next[level].key <= key:
+                steps_at_level[level] += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+
+        height = self._random_level()
+        new_node = _Node(key, [None] * height, [None] * height)
+        steps = 0
+        for level in range(height):
+            prev = chain[level]
+            new_node.next[level] = prev.next[level]
+            prev.next[level] = new_node
+            new_node.width[level] = prev.width[level] - steps
+            prev.width[level] = steps + 1
+            steps += steps_at_level[level]
+        for level in range(height, self.max_levels):
+            chain[level].width[level] += 1
+        self._size += 1
+
+    def remove(self, key: Any) -> None:
+        chain = [None] * self.max_levels
+        node = self._head
+        for level in reversed(range(self.max_levels)):
+            while node.next[level].key < key:
+                node = node.next[level]
+            chain[level] = node
+
+        target = chain[0].next[0]
+        if target is _NIL or target.key != key:
+            raise KeyError(key)
+
+        for level in range(len(target.next)):
+            prev = chain[level]
+            prev.width[level] += target.width[level] - 1
+            prev.next[level] = target.next[level]
+        for level in range(len(target.next), self.max_levels):
+            chain[level].width[level] -= 1
+        self._size -= 1
+
+    def count_less(self, key: Any) -> int:
+        """Number of elements strictly less than key."""
+        position = 0
+        node = self._head
+        for level in reversed(range(self.max_levels)):
+            while node.next[level].key < key:
+                position += node.width[level]
+                node = node.next[level]
+        return position
+
+    def _node_at(self, index: int) -> _Node:
+        if not 0 <= index < self._size:
+            raise IndexError(index)
+        node = self._head
+        remaining = index + 1
+        for level in reversed(range(self.max_levels)):
+            while node.width[level] <= remaining:
+                remaining -= node.width[level]
+                node = node.next[level]
+        return node
+
+    def __getitem__(self, index: int) -> Any:
+        if index < 0:
+            index += self._size
+        return self._node_at(index).key
+
+    def iter_from(self, index: int) -> Iterator[Any]:
+        """Iterate keys in order starting at a position."""
+        if index >= self._size:
+            return
+        node = self._node_at(max(index, 0))
+        while node is not _NIL:
+            yield node.key
+            node = node.next[0]
+
+    def __iter__(self) -> Iterator[Any]:
+        return self.iter_from(0)
@@ -0,0 +1,188 @@
+"""
+Admission control for calls to external providers.
+
+CircuitBreaker tracks outcomes and latencies over a rolling time window and
+opens when too many calls fail or are slow, so callers fail fast instead of
+waiting out timeouts. After a cool-down it lets a few trial calls through
+(half-open) and closes again if they succeed.
+
+TokenBucket spaces calls to match a provider's rate quota.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Optional
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """Rolling-window circuit breaker on failure ratio and slow-call ratio."""
+
+    def __init__(self, name: str, window_seconds: float, min_calls: int, failure_ratio: float,
+                 slow_call_seconds: float, slow_ratio: float, open_seconds: float, half_open_calls: int = 1):
+        self.name = name
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.failure_ratio = failure_ratio
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_ratio = slow_ratio
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self._calls: deque = deque()  # (finished_at, ok, slow)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._trials = 0
+        self._trial_started = 0.0
+        self.times_opened = 0
+        self.rejected = 0
+        self.successes = 0
+        self.failures = 0
+        self.slow_calls = 0
+        self.last_failure: Optional[str] = None
+
+    def _trim(self, now: float) -> None:
+        while self._calls and self._calls[0][0] < now - self.window_seconds:
+            self._calls.popleft()
+
+    def _open(self, now: float) -> None:
+        self._state = OPEN
+        self._opened_at = now
+        self._trials = 0
+        self.times_opened += 1
+        logger.warning("Circuit %s opened", self.name)
+
+    @property
+    def state(self) -> str:
+        now = time.monotonic()
+        if self._state == OPEN and now - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._trials = 0
+        elif self._state == HALF_OPEN and self._trials and now - self._trial_started >= self.open_seconds:
+            # A trial that never reported back must not keep the circuit shut for good
+            self._trials = 0
+        return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may proceed. In half-open state this takes one of the trial slots."""
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and self._trials < self.half_open_calls:
+            self._trials += 1
+            self._trial_started = time.monotonic()
+            return True
+        self.rejected += 1
+        return False
+
+    def cancel(self) -> None:
+        """Give back a slot taken by allow() for a call that was never made."""
+        if self._state == HALF_OPEN and self._trials > 0:
+            self._trials -= 1
+
+    def record(self, ok: bool, seconds: float, error: Optional[str] = None) -> None:
+        """Record the outcome of a call allowed by allow()."""
+        now = time.monotonic()
+        slow = seconds >= self.slow_call_seconds
+        if ok:
+            self.successes += 1
+        else:
+            self.failures += 1
+            self.last_failure = error
+        self.slow_calls += slow
+
+        if self._state == HALF_OPEN:
+            if ok and not slow:
+                self._state = CLOSED
+                self._calls.clear()
+                logger.info("Circuit %s closed", self.name)
+            else:
+                self._open(now)
+            return
+        if self._state == OPEN:
+            return
+
+        self._calls.append((now, ok, slow))
+        self._trim(now)
+        calls = len(self._calls)
+        if calls < self.min_calls:
+            return
+        failed = sum(1 for _, call_ok, _ in self._calls if not call_ok)
+        slowed = sum(1 for _, _, call_slow in self._calls if call_slow)
+        if failed / calls >= self.failure_ratio or slowed / calls >= self.slow_ratio:
+            self._open(now)
+
+    def stats(self) -> dict:
+        state = self.state
+        self._trim(time.monotonic())
+        calls = len(self._calls)
+        failed = sum(1 for _, ok, _ in self._calls if not ok)
+        slowed = sum(1 for _, _, slow in self._calls if slow)
+        return {
+            "name": self.name,
+            "state": state,
+            "window_calls": calls,
+            "window_failure_ratio": round(failed / calls, 4) if calls else 0.0,
+            "window_slow_ratio": round(slowed / calls, 4) if calls else 0.0,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+            "successes": self.successes,
+            "failures": self.failures,
+            "slow_calls": self.slow_calls,
+            "last_failure": self.last_failure,
+        }
+
+
+class TokenBucket:
+    """Token bucket refilled at rate tokens per second, holding at most capacity."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self.granted = 0
+        self.throttled = 0
+        self.waited_seconds = 0.0
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _take(self) -> float:
+        """Take a token if one is available; otherwise return how long until one will be."""
+        self._refill(time.monotonic())
+        if self._tokens >= 1:
+            self._tokens -= 1
+            self.granted += 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    async def acquire(self, timeout: float) -> bool:
+        """Wait up to timeout seconds for a token. Returns False (throttled) if none became available."""
+        started = time.monotonic()
+        while True:
+            wait = self._take()
+            if wait == 0.0:
+                self.waited_seconds += time.monotonic() - started
+                return True
+            if time.monotonic() - started + wait > timeout:
+                self.throttled += 1
+                return False
+            await asyncio.sleep(wait)
+
+    def stats(self) -> dict:
+        self._refill(time.monotonic())
+        return {
+            "rate_per_second": self.rate,
+            "capacity": self.capacity,
+            "tokens": round(self._tokens, 2),
+            "granted": self.granted,
+            "throttled": self.throttled,
+            "waited_seconds": round(self.waited_seconds, 2),
+        }
@@ -1,7 +1,21 @@
+import logging
+import re
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.config import get_settings
+from app.database import SessionLocal
+from app.services.leaderboard_service import LeaderboardService, leaderboard_maintainer
+from app.services.ai_grader import ai_http_client
+from app.services.grading_cache import grading_cache_pruner
+from app.services.grading_queue import grading_workers
+from app.services.upload_service import upload_gc
+from app.services.period_leaderboard_service import leaderboard_rollup_job
+from app.services.notification_service import (
+    notification_bridge, notification_counter_repair, notification_retention
+)
 from app.routers import (
     auth,
     users,
@@ -31,6 +45,61 @@ os.makedirs("static", exist_ok=True)
 
 settings = get_settings()
 
+# Application loggers (app.*) to stderr alongside uvicorn's
+logging.basicConfig(level=logging.INFO, format="%(levelname)s:     %(name)s - %(message)s")
+# httpx logs every outbound request at INFO; the AI client's own metrics cover that
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+
+class RedactTokenFilter(logging.Filter):
+    """Mask ?token= in access log lines: the notification stream carries its token in the URL."""
+
+    def filter(self, record):
+        # uvicorn.access args: (client_addr, method, full_path, http_version, status_code)
+        if isinstance(record.args, tuple) and len(record.args) == 5 and "token=" in str(record.args[2]):
+            args = list(record.args)
+            args[2] = re.sub(r"(token=)[^&]*", r"\1[redacted]", args[2])
+            record.args = tuple(args)
+        return True
+
+
+logging.getLogger("uvicorn.access").addFilter(RedactTokenFilter())
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Load in-process indexes and start background workers; flush them on shutdown."""
+    db = SessionLocal()
+    try:
+        result = LeaderboardService.rebuild_rank_index(db)
+        print(f"Leaderboard rank index loaded ({result['entries']} entries)")
+    except Exception as e:
+        # Leaderboard endpoints fall back to database ranking until a rebuild succeeds
+        print(f"Leaderboard rank index not loaded: {e}")
+    finally:
+        db.close()
+    leaderboard_maintainer.start()
+    leaderboard_rollup_job.start()
+    notification_counter_repair.start()
+    notification_retention.start()
+    if settings.notification_pubsub_backend == "postgres":
+        notification_bridge.start()
+    grading_cache_pruner.start()
+    upload_gc.start()
+    ai_http_client.start()
+    grading_workers.start()
+    yield
+    await grading_workers.stop()
+    await ai_http_client.aclose()
+    upload_gc.stop()
+    grading_cache_pruner.stop()
+    notification_bridge.stop()
+    notification_retention.stop()
+    notification_counter_repair.stop()
+    leaderboard_rollup_job.stop()
+    leaderboard_maintainer.stop()
+
+
 # Create FastAPI app
 app = FastAPI(
     title=settings.app_name,
@@ -58,7 +127,8 @@ app = FastAPI(
     """,
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -68,6 +138,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Include routers
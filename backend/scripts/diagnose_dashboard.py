@@ -6,9 +6,30 @@ from datetime import date
 # Add parent directory
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from app.database import SessionLocal
+from sqlalchemy import event
+
+from app.database import SessionLocal, engine
 from app.models import User, DailyQuest, UserDailyQuest, UserStreak, UserActivity, WeeklyGoal
-from app.routers.engagement import get_or_create_streak, get_or_create_weekly_goal
+from app.services.dashboard_service import DashboardService
+
+# Max statements a warm dashboard load may issue, regardless of data size
+DASHBOARD_QUERY_BUDGET = 5
+
+
+def count_queries(fn, *args, **kwargs):
+    """Run fn and return (result, list of SQL statements executed)."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        result = fn(*args, **kwargs)
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    return result, statements
+
 
 def test_dashboard_queries():
     db = SessionLocal()
@@ -25,21 +46,14 @@ def test_dashboard_queries():
         dqs = db.query(DailyQuest).all()
         print(f"✅ Daily Quests found: {len(dqs)}")
 
-        # 2. Streak
-        print("Testing Streak...")
+        # 2. Streak + 3. Weekly Goals (read-only)
+        print("Testing Streak & Weekly Goals...")
         try:
-            streak = get_or_create_streak(db, user.user_id)
+            streak, weekly = DashboardService.get_streak_and_weekly_goals(db, user.user_id, date.today())
             print(f"✅ Streak: {streak.current_streak}")
-        except Exception as e:
-            print(f"❌ Streak failed: {e}")
-
-        # 3. Weekly Goals
-        print("Testing Weekly Goals...")
-        try:
-            weekly = get_or_create_weekly_goal(db, user.user_id)
             print(f"✅ Weekly Goal XP: {weekly.xp_earned}")
         except Exception as e:
-            print(f"❌ Weekly Goals failed: {e}")
+            print(f"❌ Streak/Weekly Goals failed: {e}")
 
         # 4. Skills
         print("Testing Skills...")
@@ -61,6 +75,22 @@ def test_dashboard_queries():
         except Exception as e:
              print(f"❌ Continue Journey failed: {e}")
 
+        # 6. Query Budget
+        print("Testing Dashboard Query Budget...")
+        try:
+            DashboardService.get_dashboard(db, user)  # warm up the cache and connection
+            _, statements = count_queries(DashboardService.get_dashboard, db, user, use_cache=False)
+            query_count = len(statements)
+            assert query_count <= DASHBOARD_QUERY_BUDGET, (
+                f"Dashboard issued {query_count} queries (budget {DASHBOARD_QUERY_BUDGET})"
+            )
+            writes = [s for s in statements if not s.lstrip().upper().startswith("SELECT")]
+            assert not writes, f"Dashboard read issued writes: {writes}"
+            print(f"✅ Dashboard loaded in {query_count} queries")
+        except AssertionError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+
     except Exception as e:
         print(f"❌ General Database Error: {e}")
     finally:
@@ -0,0 +1,103 @@
+import sys
+import os
+from datetime import datetime, timedelta
+
+# Add parent directory
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+
+from app.database import SessionLocal, get_db
+from app.models import Assignment, Quest, User, World, Zone
+from app.services.assignment_service import AssignmentService
+from app.utils.dependencies import get_current_user
+from diagnose_dashboard import count_queries
+from main import app
+
+# Statements one page of a student's pending assignments may issue, with or without a cursor
+PENDING_PAGE_QUERY_BUDGET = 1
+
+# Small pages so the walk crosses dated rows, a due-date tie and the undated tail
+PAGE_SIZE = 2
+
+
+def add_fixture_assignments(db):
+    """Add a published world with dated, tied and undated assignments for a new student. Nothing is committed."""
+    stamp = datetime.now().strftime("%Y%m%d%H%M%S%f")
+    user = User(username=f"pending_check_{stamp}", email=f"pending_check_{stamp}@test.com", password_hash="x")
+    world = World(title="Pending Check World", is_published=True, required_class="All")
+    db.add_all([user, world])
+    db.flush()
+    zone = Zone(world_id=world.world_id, title="Pending Check Zone")
+    db.add(zone)
+    db.flush()
+    quest = Quest(zone_id=zone.zone_id, title="Pending Check Quest")
+    db.add(quest)
+    db.flush()
+
+    soon = datetime.now().replace(microsecond=0) + timedelta(days=1)
+    due_dates = [soon, soon, soon + timedelta(days=1), None, None, None, soon - timedelta(days=2)]
+    db.add_all([
+        Assignment(quest_id=quest.quest_id, title=f"Pending Check {i}", due_date=due_date)
+        for i, due_date in enumerate(due_dates)
+    ])
+    db.flush()
+    return user
+
+
+def test_pending_assignment_pages():
+    db = SessionLocal()
+    try:
+        user = add_fixture_assignments(db)
+
+        print("Testing unpaged listing...")
+        (expected, next_cursor), statements = count_queries(AssignmentService.pending_for_user, db, user)
+        assert len(statements) == PENDING_PAGE_QUERY_BUDGET, (
+            f"Unpaged listing issued {len(statements)} queries (budget {PENDING_PAGE_QUERY_BUDGET})"
+        )
+        assert next_cursor is None, "Unpaged listing returned a cursor"
+        expected_ids = [a["assignment_id"] for a in expected]
+        undated = [a["assignment_id"] for a in expected if a["due_date"] is None]
+        assert len(undated) >= 3 and expected_ids[-len(undated):] == undated, "Undated assignments are not last"
+        print(f"✅ {len(expected_ids)} assignments ({len(undated)} undated) in 1 query")
+
+        print("Testing X-Next-Cursor pagination...")
+        app.dependency_overrides[get_db] = lambda: db
+        app.dependency_overrides[get_current_user] = lambda: user
+        client = TestClient(app)
+        visited = []
+        cursor = None
+        pages = 0
+        while True:
+            params = {"limit": PAGE_SIZE}
+            if cursor:
+                params["cursor"] = cursor
+            response, statements = count_queries(client.get, "/api/assignments/user/pending", params=params)
+            assert response.status_code == 200, f"Page {pages + 1} failed: {response.status_code} {response.text}"
+            assert len(statements) == PENDING_PAGE_QUERY_BUDGET, (
+                f"Page {pages + 1} ({'with' if cursor else 'without'} cursor) issued {len(statements)} queries "
+                f"(budget {PENDING_PAGE_QUERY_BUDGET})"
+            )
+            visited.extend(a["assignment_id"] for a in response.json())
+            pages += 1
+            cursor = response.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+
+        duplicates = sorted({i for i in visited if visited.count(i) > 1})
+        assert not duplicates, f"Assignments visited more than once: {duplicates}"
+        missing = sorted(set(expected_ids) - set(visited))
+        assert not missing, f"Assignments never visited: {missing}"
+        assert visited == expected_ids, "Pages are not in the unpaged order"
+        print(f"✅ {pages} pages of {PAGE_SIZE}, 1 query each, every assignment visited once")
+    except AssertionError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    finally:
+        app.dependency_overrides.clear()
+        db.rollback()
+        db.close()
+
+
+if __name__ == "__main__":
+    test_pending_assignment_pages()
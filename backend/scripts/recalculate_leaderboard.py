@@ -0,0 +1,34 @@
+import sys
+import os
+import json
+
+# Add parent directory
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import SessionLocal
+from app.services.leaderboard_service import LeaderboardService
+
+
+def recalculate_leaderboard():
+    """Run the set-based leaderboard recalculation (same as POST /api/admin/leaderboard/recalculate)."""
+    db = SessionLocal()
+    try:
+        print("🏆 Recalculating leaderboard...")
+        result = LeaderboardService.recalculate(db)
+        print(json.dumps(result, indent=2))
+
+        check = LeaderboardService.check_rank_index(db)
+        if check["consistent"]:
+            print(f"✅ Done in {result['total_ms']} ms, rank index consistent ({check['indexed_entries']} entries)")
+        else:
+            print(f"⚠️ Done in {result['total_ms']} ms, but rank index check failed: {json.dumps(check, default=str)}")
+            sys.exit(1)
+    except Exception as e:
+        print(f"❌ Recalculation failed: {e}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    recalculate_leaderboard()
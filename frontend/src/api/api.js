@@ -168,6 +168,7 @@ export const submissionsAPI = {
     getMy: () => api.get('/submissions/my'),
     getByAssignment: (assignmentId) => api.get(`/submissions/assignment/${assignmentId}`),
     create: (data) => api.post('/submissions/', data),
+    gradingStatus: (submissionId) => api.get(`/submissions/${submissionId}/grading`),
     grade: (submissionId, data) => api.put(`/submissions/${submissionId}/grade`, data),
 };
 
@@ -176,7 +177,7 @@ export const assignmentsAPI = {
     getOne: (id) => api.get(`/assignments/${id}`),
     getQuest: (questId) => api.get(`/assignments/quest/${questId}`),
     // Teacher endpoints
-    getTeacherAssignments: () => api.get('/assignments/teacher/all'),
+    getTeacherAssignments: (params = {}) => api.get('/assignments/teacher/all', { params }),
     // User endpoints  
     getUserPending: () => api.get('/assignments/user/pending'),
 };
@@ -250,6 +251,12 @@ export const notificationsAPI = {
     markAllAsRead: () => api.put('/notifications/read-all'),
     delete: (id) => api.delete(`/notifications/${id}`),
     clearAll: () => api.delete('/notifications/'),
+    // Server-sent events; EventSource cannot send headers, so a short-lived stream token
+    // (never the login token) goes in the query string
+    streamUrl: async () => {
+        const response = await api.post('/notifications/stream-token');
+        return `${API_BASE_URL}/notifications/stream?token=${encodeURIComponent(response.data.token)}`;
+    },
 };
 
 export default api;
@@ -14,9 +14,70 @@ function NotificationDropdown() {
 
     useEffect(() => {
         loadUnreadCount();
-        // Poll for new notifications every 30 seconds
-        const interval = setInterval(loadUnreadCount, 30000);
-        return () => clearInterval(interval);
+
+        // Poll for new notifications every 30 seconds if streaming is unavailable
+        let interval = null;
+        const startPolling = () => {
+            if (!interval) {
+                interval = setInterval(loadUnreadCount, 30000);
+            }
+        };
+
+        if (typeof EventSource === 'undefined') {
+            startPolling();
+            return () => clearInterval(interval);
+        }
+
+        // Pushed unread counts and new notifications
+        let source = null;
+        let reconnectTimer = null;
+        let closed = false;
+        const connect = async () => {
+            let url;
+            try {
+                url = await notificationsAPI.streamUrl();
+            } catch {
+                // No stream token: keep polling
+                startPolling();
+                return;
+            }
+            if (closed) return;
+            source = new EventSource(url);
+            source.addEventListener('unread_count', (event) => {
+                setUnreadCount(JSON.parse(event.data).unread_count);
+            });
+            source.addEventListener('notification', (event) => {
+                const notification = JSON.parse(event.data);
+                if (notification.notification_id) {
+                    setNotifications(prev =>
+                        prev.some(n => n.notification_id === notification.notification_id)
+                            ? prev
+                            : [notification, ...prev]
+                    );
+                }
+            });
+            source.onerror = () => {
+                // EventSource retries on its own; poll until it reconnects
+                startPolling();
+                // A retry with an expired stream token is refused and not retried again: fetch a new one
+                if (source.readyState === EventSource.CLOSED && !closed) {
+                    clearTimeout(reconnectTimer);
+                    reconnectTimer = setTimeout(connect, 5000);
+                }
+            };
+            source.onopen = () => {
+                clearInterval(interval);
+                interval = null;
+            };
+        };
+        connect();
+
+        return () => {
+            closed = true;
+            if (source) source.close();
+            clearTimeout(reconnectTimer);
+            clearInterval(interval);
+        };
     }, []);
 
     useEffect(() => {
@@ -23,6 +23,7 @@ function TeacherDashboard() {
     // Assignments State
     const [assignments, setAssignments] = useState([]);
     const [assignmentsLoading, setAssignmentsLoading] = useState(false);
+    const [assignmentsCursor, setAssignmentsCursor] = useState(null);
     const [showAssignmentModal, setShowAssignmentModal] = useState(false);
     const [selectedAssignment, setSelectedAssignment] = useState(null);
     const [submissions, setSubmissions] = useState([]);
@@ -85,11 +86,12 @@ function TeacherDashboard() {
         setLoading(false);
     };
 
-    const loadAssignments = async () => {
+    const loadAssignments = async (cursor = null) => {
         setAssignmentsLoading(true);
         try {
-            const res = await assignmentsAPI.getTeacherAssignments();
-            setAssignments(res.data);
+            const res = await assignmentsAPI.getTeacherAssignments(cursor ? { cursor } : {});
+            setAssignments(prev => cursor ? [...prev, ...res.data] : res.data);
+            setAssignmentsCursor(res.headers['x-next-cursor'] || null);
         } catch (error) {
             console.error("Failed to load assignments", error);
         }
@@ -309,6 +311,7 @@ function TeacherDashboard() {
                                                 <th>XP Reward</th>
                                                 <th>Gold</th>
                                                 <th>Due Date</th>
+                                                <th>Submissions</th>
                                                 <th>Actions</th>
                                             </tr>
                                         </thead>
@@ -327,6 +330,9 @@ function TeacherDashboard() {
                                                             : 'No deadline'
                                                         }
                                                     </td>
+                                                    <td>
+                                                        ⏳ {assignment.pending_submissions} · ✅ {assignment.approved_submissions} · ❌ {assignment.rejected_submissions}
+                                                    </td>
                                                     <td>
                                                         <button
                                                             className="btn btn-sm btn-primary"
@@ -340,6 +346,15 @@ function TeacherDashboard() {
                                         </tbody>
                                     </table>
                                 )}
+                                {assignmentsCursor && (
+                                    <button
+                                        className="btn btn-sm btn-secondary"
+                                        disabled={assignmentsLoading}
+                                        onClick={() => loadAssignments(assignmentsCursor)}
+                                    >
+                                        Load More
+                                    </button>
+                                )}
                             </div>
                         )}
                     </motion.div>
@@ -0,0 +1,167 @@
+"""
+Test ManagedHTTPClient (the AI grader's outbound client) against a local stand-in server:
+retries on 5xx, Retry-After on 429, the per-host concurrency limit and connection reuse.
+Needs no AI provider or database: python scripts/test_ai_http_client.py
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add the backend directory to path
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+from app.utils.http_client import ManagedHTTPClient
+
+
+class StandInState:
+    """What the stand-in server has seen, shared with its handler threads."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hits = {}
+        self.connections = set()
+        self.active = 0
+        self.max_active = 0
+
+
+state = StandInState()
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so the client can keep the connection alive between requests
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, body=b"{}", headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        with state.lock:
+            hits = state.hits[self.path] = state.hits.get(self.path, 0) + 1
+            state.connections.add(self.client_address)
+
+        if self.path == "/flaky":
+            # Two transient failures, then success
+            self._reply(503 if hits <= 2 else 200)
+        elif self.path == "/rate-limited":
+            if hits == 1:
+                self._reply(429, headers={"Retry-After": "1"})
+            else:
+                self._reply(200)
+        elif self.path == "/broken":
+            self._reply(500)
+        elif self.path == "/slow":
+            with state.lock:
+                state.active += 1
+                state.max_active = max(state.max_active, state.active)
+            time.sleep(0.2)
+            with state.lock:
+                state.active -= 1
+            self._reply(200)
+        else:
+            self._reply(404)
+
+
+def start_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def make_client(**overrides):
+    options = dict(max_connections=10, max_keepalive=5, per_host_limit=2, timeout=5.0,
+                   max_retries=3, backoff_base=0.05, backoff_max=2.0)
+    options.update(overrides)
+    return ManagedHTTPClient(**options)
+
+
+async def test_retries_5xx(base_url):
+    client = make_client()
+    try:
+        response = await client.post(f"{base_url}/flaky", json={})
+        stats = client.stats()
+        print(f"Flaky: status {response.status_code}, retries {stats['retries']}, counts {stats['status_counts']}")
+        assert response.status_code == 200
+        assert stats["retries"] == 2 and stats["status_counts"] == {"503": 2, "200": 1}
+    finally:
+        await client.aclose()
+
+
+async def test_gives_up(base_url):
+    client = make_client(max_retries=2)
+    try:
+        response = await client.post(f"{base_url}/broken", json={})
+        stats = client.stats()
+        print(f"Broken: status {response.status_code}, requests {stats['requests']}, failures {stats['failures']}")
+        assert response.status_code == 500
+        assert stats["requests"] == 3 and stats["failures"] == 1
+    finally:
+        await client.aclose()
+
+
+async def test_retry_after(base_url):
+    client = make_client()
+    try:
+        started = time.monotonic()
+        response = await client.post(f"{base_url}/rate-limited", json={})
+        waited = time.monotonic() - started
+        print(f"Rate limited: status {response.status_code} after {waited:.2f}s")
+        assert response.status_code == 200
+        # Backoff alone would be at most 0.05s; Retry-After asks for 1s
+        assert waited >= 1.0
+    finally:
+        await client.aclose()
+
+
+async def test_per_host_limit(base_url):
+    client = make_client(per_host_limit=2)
+    try:
+        responses = await asyncio.gather(*(client.post(f"{base_url}/slow", json={}) for _ in range(6)))
+        print(f"Per-host limit: {len(responses)} requests, at most {state.max_active} at once")
+        assert all(r.status_code == 200 for r in responses)
+        assert state.max_active == 2
+    finally:
+        await client.aclose()
+
+
+async def test_connection_reuse(base_url):
+    client = make_client()
+    try:
+        with state.lock:
+            state.connections.clear()
+        for _ in range(5):
+            response = await client.post(f"{base_url}/flaky", json={})
+            assert response.status_code == 200
+        print(f"Connection reuse: 5 sequential requests over {len(state.connections)} connection(s)")
+        assert len(state.connections) == 1
+    finally:
+        await client.aclose()
+
+
+async def run_all():
+    server, base_url = start_server()
+    try:
+        await test_retries_5xx(base_url)
+        await test_gives_up(base_url)
+        await test_retry_after(base_url)
+        await test_per_host_limit(base_url)
+        await test_connection_reuse(base_url)
+        print("All HTTP client checks passed.")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(run_all())